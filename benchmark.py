@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from math import comb
+
+import numpy as np
+
+from mintmark_core import (
+    DEFAULT_PATHS, DataPaths, convert_json_to_csv, filter_dominated_mintmarks, filter_zero_requirements,
+    find_initial_combinations, initial_filtering, load_catalog_mintmark_table, load_mintmark_list,
+    validate_combinations, ATTRIBUTES
+)
+
+
+# 基准测试使用的代表性查询，参数与 run_query 相同；名称用于和基线结果对应。
+# 给出 "engine" 时该查询固定使用这个搜索引擎，否则使用命令行指定的引擎
+BENCHMARK_QUERIES = [
+    # 当前数据中 43 速（129）与双防为 0 无法同时满足，这里用速度下限 110
+    ("高速双防0", {
+        "attribute_targets": {4: (110, float('inf')), 1: (0, 0), 3: (0, 0)},
+        "filter_low_values": True, "use_only1": True, "keep_dominated": True,
+    }),
+    ("对称物攻", {
+        "attribute_targets": {0: (120, float('inf')), 4: (115, float('inf'))},
+        "quality_filter": ["5"], "total_sum_filter": [">220"], "filter_low_values": True,
+        "symmetric": True, "use_only1": True, "keep_dominated": True,
+    }),
+    ("专属刻印+限1", {
+        "attribute_targets": {2: (120, float('inf')), 4: (125, float('inf')), 5: (300, float('inf'))},
+        "monster_id_filter": "2167 2800", "quality_filter": ["5", "4"], "total_sum_filter": [">220"],
+        "filter_low_values": True, "use_only1": True, "keep_dominated": True,
+    }),
+    ("双下限-不提升效率", {
+        "attribute_targets": {0: (115, float('inf')), 4: (127, float('inf'))},
+        "quality_filter": ["5"], "total_sum_filter": [">220"], "filter_low_values": True,
+        "improve_efficiency": False, "use_only1": True, "keep_dominated": True,
+    }),
+    ("双下限-提升效率", {
+        "attribute_targets": {0: (115, float('inf')), 4: (127, float('inf'))},
+        "quality_filter": ["5"], "total_sum_filter": [">220"], "filter_low_values": True,
+        "improve_efficiency": True, "top_n": 200, "use_only1": True, "keep_dominated": True,
+    }),
+    ("双下限-分支定界", {
+        "attribute_targets": {0: (115, float('inf')), 4: (127, float('inf'))},
+        "quality_filter": ["5"], "total_sum_filter": [">220"], "filter_low_values": True,
+        "use_only1": True, "keep_dominated": True, "engine": "branch_bound",
+    }),
+]
+
+# 各阶段的名称，顺序与 run_query 一致
+STAGES = ["load", "initial_filtering", "filter_zero_requirements", "filter_dominated_mintmarks",
+          "find_initial_combinations", "validate_combinations"]
+
+# 耗时低于该值（秒）的阶段不参与回归判断，避免计时噪声
+MIN_COMPARE_SECONDS = 0.005
+
+
+# 按倍数扩充刻印数据：第 k 份副本的 ID 加上 k * 1000000，非零属性随机浮动 ±2，其余字段不变
+def scale_mintmark_list(mintmark_list, factor, seed=0):
+    rng = np.random.default_rng(seed)
+    scaled = list(mintmark_list)
+    for copy_index in range(1, factor):
+        for row in mintmark_list:
+            values = [int(num) for num in row["total_attr_value"].split()]
+            values = [max(value + int(rng.integers(-2, 3)), 1) if value > 0 else value for value in values]
+            scaled.append(dict(
+                row,
+                id=str(int(row["id"]) + copy_index * 1000000),
+                description=f"{row['description']}#{copy_index}",
+                total_attr_value=" ".join(str(value) for value in values),
+                total_sum=str(sum(values)),
+            ))
+    return scaled
+
+
+# 将刻印列表写成 folder 中与下载数据相同格式的 JSON，再用 convert_json_to_csv 生成 CSV 和二进制刻印目录，
+# 用于测量读取阶段；返回该文件夹的 DataPaths
+def write_mintmark_data(mintmark_list, folder):
+    paths = DataPaths(folder)
+    os.makedirs(folder, exist_ok=True)
+    entries = []
+    for row in mintmark_list:
+        entry = {"ID": int(row["id"]), "Type": 3, "Quality": int(row["quality"]), "Des": row["description"],
+                 "MaxAttriValue": row["total_attr_value"]}
+        if row["monster_id"]:
+            entry["MonsterID"] = row["monster_id"]
+        if row["mintmark_class"]:
+            entry["MintmarkClass"] = int(row["mintmark_class"])
+        entries.append(entry)
+    with open(paths.json_file, 'w', encoding='utf-8') as f:
+        json.dump({"MintMarks": {"MintMark": entries}}, f, ensure_ascii=False)
+    convert_json_to_csv(paths)
+    return paths
+
+
+# 按 run_query 的顺序逐阶段执行一次查询，返回 {阶段: {"seconds", "in", "out"}}；读取阶段与界面和查询服务相同，
+# 读取二进制刻印目录并构建刻印表，各过滤阶段只传递刻印下标；
+# trace_memory 为 True 时用 tracemalloc 记录每个阶段的峰值内存（字节）
+def run_stages(paths, query, engine, trace_memory=False):
+    stages = {}
+
+    def measure(stage, function, count_in):
+        if trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        output = function()
+        stages[stage] = {"seconds": time.perf_counter() - start, "in": count_in, "out": len(output)}
+        if trace_memory:
+            stages[stage]["peak_bytes"] = tracemalloc.get_traced_memory()[1] - baseline
+        return output
+
+    table = measure("load", lambda: load_catalog_mintmark_table(paths), 0)
+    filtered = measure("initial_filtering", lambda: initial_filtering(
+        table, monster_id_filter=query.get("monster_id_filter"), quality_filter=query.get("quality_filter"),
+        filter_low_values=query.get("filter_low_values", False), total_sum_filter=query.get("total_sum_filter"),
+        attribute_targets=query["attribute_targets"], improve_efficiency=query.get("improve_efficiency", False),
+        top_n=query.get("top_n", 200)), len(table))
+    filtered = measure("filter_zero_requirements",
+                       lambda: filter_zero_requirements(table, filtered, query["attribute_targets"]), len(filtered))
+    if query.get("keep_dominated", True):
+        stages["filter_dominated_mintmarks"] = {"seconds": 0.0, "in": len(filtered), "out": len(filtered)}
+    else:
+        filtered = measure("filter_dominated_mintmarks", lambda: filter_dominated_mintmarks(
+            table, filtered, query["attribute_targets"], use_only1=query.get("use_only1", False)), len(filtered))
+    # 组合搜索阶段的输入为参与搜索的刻印数；theoretical_triples 是可重复选取的三元组总数（理论上限），
+    # 引擎实际生成的候选数因剪枝而远小于它
+    results = measure("find_initial_combinations", lambda: find_initial_combinations(
+        table.subset(filtered), query["attribute_targets"], symmetric=query.get("symmetric", False),
+        use_only1=query.get("use_only1", False), engine=query.get("engine", engine)), len(filtered))
+    stages["find_initial_combinations"]["theoretical_triples"] = comb(len(filtered) + 2, 3)
+    measure("validate_combinations",
+            lambda: validate_combinations(results, query["attribute_targets"], ATTRIBUTES), len(results))
+    return stages
+
+
+# 对每个规模的刻印数据和每条查询执行基准测试：耗时取 repeat 次中的最小值，峰值内存另外单独测一次
+def run_benchmarks(scales, queries, engine="pair_index", repeat=3, paths=DEFAULT_PATHS, log=print):
+    base_list = load_mintmark_list(paths.data_file)
+    records = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for scale in scales:
+            if scale == 1:
+                scaled_paths = paths
+            else:
+                scaled_paths = write_mintmark_data(scale_mintmark_list(base_list, scale),
+                                                   os.path.join(temp_dir, f"x{scale}"))
+            # 预先读取一次，二进制目录过期时在计时之外重新生成
+            load_catalog_mintmark_table(scaled_paths)
+
+            for name, query in queries:
+                runs = [run_stages(scaled_paths, query, engine) for _ in range(repeat)]
+                tracemalloc.start()
+                try:
+                    memory_run = run_stages(scaled_paths, query, engine, trace_memory=True)
+                finally:
+                    tracemalloc.stop()
+
+                stages = {}
+                for stage in STAGES:
+                    stages[stage] = dict(
+                        runs[0][stage],
+                        seconds=round(min(run[stage]["seconds"] for run in runs), 6),
+                        peak_bytes=memory_run[stage].get("peak_bytes", 0),
+                    )
+                record = {
+                    "scale": scale,
+                    "query": name,
+                    "engine": query.get("engine", engine),
+                    "rows": stages["validate_combinations"]["out"],
+                    "total_seconds": round(sum(stage["seconds"] for stage in stages.values()), 6),
+                    "stages": stages,
+                }
+                records.append(record)
+                if log:
+                    log(f"x{scale:<3} {name:<12} {record['rows']:>9} 行  {record['total_seconds']:.4f} 秒  " +
+                        "  ".join(f"{stage}={stages[stage]['seconds']:.4f}" for stage in STAGES))
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": records,
+    }
+
+
+# 与基线比较：结果行数不同视为错误；某阶段耗时或峰值内存超过基线的 (1 + threshold) 倍视为性能回退。
+# 返回问题描述的列表，为空表示没有回退
+def compare_with_baseline(report, baseline, threshold=0.2):
+    baseline_records = {(record["scale"], record["query"]): record for record in baseline["results"]}
+    problems = []
+    for record in report["results"]:
+        key = (record["scale"], record["query"])
+        previous = baseline_records.get(key)
+        if previous is None:
+            continue
+        label = f"x{record['scale']} {record['query']}"
+        if record["rows"] != previous["rows"]:
+            problems.append(f"{label}: 结果行数 {record['rows']} 与基线 {previous['rows']} 不同")
+        for stage in STAGES:
+            current, old = record["stages"][stage], previous["stages"].get(stage)
+            if old is None:
+                continue
+            if old["seconds"] >= MIN_COMPARE_SECONDS and current["seconds"] > old["seconds"] * (1 + threshold):
+                problems.append(f"{label} {stage}: 耗时 {current['seconds']:.4f} 秒，基线 {old['seconds']:.4f} 秒")
+            if old.get("peak_bytes") and current["peak_bytes"] > old["peak_bytes"] * (1 + threshold):
+                problems.append(f"{label} {stage}: 峰值内存 {current['peak_bytes']} 字节，基线 {old['peak_bytes']} 字节")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="刻印筛选流程的基准测试")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 5, 10], help="刻印数据的扩充倍数")
+    parser.add_argument("--queries", nargs="+", help="只运行这些名称的查询")
+    parser.add_argument("--engine", default="pair_index", choices=["pair_index", "branch_bound", "numpy", "python"])
+    parser.add_argument("--repeat", type=int, default=3, help="每条查询计时的重复次数")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果文件（JSON）")
+    parser.add_argument("--baseline", help="与该基线结果文件比较；文件不存在时把本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对回退比例")
+    parser.add_argument("--save-baseline", action="store_true", help="同时把本次结果保存为 --baseline 指定的文件")
+    args = parser.parse_args(argv)
+
+    queries = [(name, query) for name, query in BENCHMARK_QUERIES if not args.queries or name in args.queries]
+    report = run_benchmarks(args.scales, queries, engine=args.engine, repeat=args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到文件 {args.output}")
+
+    if not args.baseline:
+        return 0
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到文件 {args.baseline}")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    problems = compare_with_baseline(report, baseline, args.threshold)
+    for problem in problems:
+        print(problem)
+    print(f"与基线相比发现 {len(problems)} 处回退" if problems else "与基线相比没有回退")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
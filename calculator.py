@@ -1,474 +1,247 @@
 from functools import partial
-import csv
-import urllib.request
-import json
-from urllib.parse import urljoin
-from itertools import combinations_with_replacement
-
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QFormLayout,
-    QLineEdit, QPushButton, QTableWidget, QTableWidgetItem, QLabel, QCheckBox, QHBoxLayout,
-    QMessageBox, QSpacerItem, QSizePolicy
+    QLineEdit, QPushButton, QTableView, QLabel, QCheckBox, QHBoxLayout,
+    QMessageBox, QSpacerItem, QSizePolicy, QProgressBar
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, QAbstractTableModel, QModelIndex, pyqtSignal, pyqtSlot
+import re
+import time
 import sys
-import pandas as pd
+import numpy as np
 import os
 
-
-# 定义用于存储刻印数据的文件路径
-FOLDER_PATH = "data"
-DATA_FILE = os.path.join(FOLDER_PATH, "mintmark_data.csv")
-JSON_FILE = os.path.join(FOLDER_PATH, "mintmark_data.json")
-COMBINATIONS_FILE = os.path.join(FOLDER_PATH, "combinations_data.csv")
-ONLY1_MINTMARK_CLASS_FILE = os.path.join(FOLDER_PATH, "only1_mintmark_class.txt")
-ONLY1_MINTMARK_IDS_FILE = os.path.join(FOLDER_PATH, "only1_mintmark_ids.txt")
-
-MISSING_MINTMARK_IDS_FILE = os.path.join(FOLDER_PATH, "missing_mintmark_ids.txt") # 用户没有这个刻印
-PROCESS_FILE = os.path.join(FOLDER_PATH, "process.csv")
-
-excel_file = "结果.xlsx"
-
-# 创建数据文件夹
-os.makedirs(FOLDER_PATH, exist_ok=True)
-
-# 限1刻印的系列id，例如65是"精灵王誓约"
-content = [
-    "57", "61", "65", "66", "67", "74", "75", "78", "80", "83", "84", "85"
-]
-
-# 将内容写入txt文件，每个数字占一行
-def write_content_to_file(file_path, content):
-    if not os.path.exists(file_path):
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.write("\n".join(content) + "\n")
-        print(f"文件 '{file_path}' 创建成功并写入内容。")
-    else:
-        print(f"文件 '{file_path}' 已存在，未修改。")
-
-write_content_to_file(ONLY1_MINTMARK_CLASS_FILE, content)
-
-# 读取 `only1_mintmark_class.txt` 中的系列 id
-def load_only1_mintmark_class():
-    try:
-        with open(ONLY1_MINTMARK_CLASS_FILE, 'r', encoding='utf-8-sig') as f:
-            only1_mintmark_class = set(line.strip() for line in f if line.strip())
-        return only1_mintmark_class
-    except FileNotFoundError:
-        return set()
-
-# 加载限1刻印的系列 id
-only1_mintmark_class = load_only1_mintmark_class()
-
-# 加载用户没有的刻印 id
-def load_missing_mintmark_ids():
-    try:
-        with open(MISSING_MINTMARK_IDS_FILE, 'r', encoding='utf-8-sig') as f:
-            return set(line.strip() for line in f if line.strip())
-    except FileNotFoundError:
-        return set()  # 如果文件不存在，返回一个空集合
-
-
-# 下载并保存 JSON 数据的方法
-def download_and_store_json():
-    try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        version_url = "http://seerh5.61.com/version/version.json"
-        req = urllib.request.Request(version_url, headers=headers)
-        response = urllib.request.urlopen(req, timeout=10)
-        version_data = json.load(response)
-
-        files = version_data.get("files", {})
-        resource = files.get("resource", {})
-        config = resource.get("config", {})
-        xml = config.get("xml", {})
-
-        mintmark_url = urljoin("http://seerh5.61.com/resource/config/xml/", xml.get("mintmark.json", ""))
-
-        req = urllib.request.Request(mintmark_url, headers=headers)
-        response = urllib.request.urlopen(req, timeout=10)
-        mintmark_data = json.load(response)
-
-        with open(JSON_FILE, 'w', encoding='utf-8-sig') as f:
-            json.dump(mintmark_data, f, ensure_ascii=False, indent=4)
-        print(f"MintMark JSON 数据已保存到文件 {JSON_FILE}")
-    except urllib.error.URLError as e:
-        print(f"网络错误：{e}")
-    except json.JSONDecodeError as e:
-        print(f"JSON 解析错误：{e}")
-    except Exception as e:
-        print(f"发生未知错误: {e}")
-
-# 更新 JSON 数据为 CSV 文件的方法
-# 更新 JSON 数据为 CSV 文件的方法
-def convert_json_to_csv():
-    try:
-        # 加载用户缺失的刻印 ID
-        missing_mintmark_ids = load_missing_mintmark_ids()  # 加载缺失的刻印 ID
-
-        # 打开 JSON 文件读取数据
-        with open(JSON_FILE, 'r', encoding='utf-8-sig') as f:
-            mintmark_data = json.load(f)
-
-        MintMarks = mintmark_data.get("MintMarks", {})
-        MintMark = MintMarks.get("MintMark", [])
-
-        # 写入到 CSV 文件
-        with open(DATA_FILE, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            fieldnames = ["id", "quality", "description", "total_attr_value", "total_sum", "monster_id",
-                          "mintmark_class"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for mintmark in MintMark:
-                try:
-                    if mintmark.get("Type", 0) != 3:
-                        continue
-
-                    # 获取刻印的 ID
-                    id = mintmark.get("ID", 0)
-                    id_str = str(id)
-                    # 如果该刻印在缺失 ID 列表中，跳过
-                    if id_str in missing_mintmark_ids:
-                        continue
-                    quality = mintmark.get("Quality", 0)
-                    description = mintmark.get("Des", "")
-                    monster_id = mintmark.get("MonsterID", "")
-                    mintmark_class = mintmark.get("MintmarkClass", "")
-
-                    max_attr_value = mintmark.get("MaxAttriValue", "")
-                    extra_attr_value = mintmark.get("ExtraAttriValue", "")
-                    max_values = [int(num) for num in max_attr_value.split()]
-                    extra_values = [int(num) for num in extra_attr_value.split()] if extra_attr_value else [0] * len(
-                        max_values)
-                    total_values = [max_val + extra_val for max_val, extra_val in zip(max_values, extra_values)]
-                    total_attr_value = " ".join(map(str, total_values))
-                    total_sum = sum(total_values)
-
-                    writer.writerow({
-                        "id": id,
-                        "quality": quality,
-                        "description": description,
-                        "total_attr_value": total_attr_value,
-                        "total_sum": total_sum,
-                        "monster_id": monster_id,
-                        "mintmark_class": mintmark_class
-                    })
-                except (KeyError, ValueError):
-                    continue
-
-        print(f"MintMark 数据已保存到文件 {DATA_FILE}")
-    except Exception as e:
-        print(f"转换 JSON 数据到 CSV 时发生错误: {e}")
-
-def ensure_data_prepared():
-    """
-    确保 JSON 数据已经下载并且成功转换为 CSV。
-    """
-    # 检查 JSON 文件是否存在，如果不存在则下载数据
-    if not os.path.exists(JSON_FILE):
-        print("JSON 文件不存在，正在下载 JSON 数据...")
-        download_and_store_json()
-
-    # 检查 CSV 文件是否存在，如果 JSON 已存在但 CSV 未生成，则生成 CSV
-    if os.path.exists(JSON_FILE) and not os.path.exists(DATA_FILE):
-        print("CSV 文件不存在，从 JSON 生成 CSV 文件...")
-        convert_json_to_csv()
-
-
-
-# 加载限1刻印的 id
-def load_only1_mintmark_ids():
-    # 确保数据已经被下载和准备
-    ensure_data_prepared()
-
-    try:
-        with open(ONLY1_MINTMARK_IDS_FILE, 'r', encoding='utf-8-sig') as f:
-            return [line.strip() for line in f if line.strip()]
-    except FileNotFoundError:
-        return []
-
-
-# 读取 csv 文件并生成限1刻印的 id 文件
-def generate_only1_mintmark_ids():
-    # 确保数据已经被下载和准备
-    ensure_data_prepared()
-
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            filtered_rows = []
-
-            # 过滤 mintmark_class 在限1刻印系列中的行
-            for row in reader:
-                if row['mintmark_class'] in load_only1_mintmark_class():
-                    filtered_rows.append(row['id'])
-
-            # 写入到新的 txt 文件，每行一个 id
-            if filtered_rows:
-                if not os.path.exists(ONLY1_MINTMARK_IDS_FILE):
-                    with open(ONLY1_MINTMARK_IDS_FILE, 'w', newline='', encoding='utf-8-sig') as txtfile:
-                        for row_id in filtered_rows:
-                            txtfile.write(row_id + "\n")
-                    print(f"文件 '{ONLY1_MINTMARK_IDS_FILE}' 创建成功并写入限1刻印的 id 数据。")
-                else:
-                    print(f"文件 '{ONLY1_MINTMARK_IDS_FILE}' 已存在，未修改。")
-            else:
-                print("没有匹配到任何限1刻印的数据。")
-    else:
-        print(f"文件 '{DATA_FILE}' 不存在，请检查路径。")
-
-# 创建缺失的刻印 ID 文件
-def create_missing_mintmark_ids_file():
-    if not os.path.exists(MISSING_MINTMARK_IDS_FILE):
-        with open(MISSING_MINTMARK_IDS_FILE, 'w', encoding='utf-8') as file:
-            file.write("# 请输入您没有（或者不想用）的刻印 ID，每个 ID 占一行。并且在输入之后点击“更新刻印文件”按钮。\n")
-        print(f"文件 '{MISSING_MINTMARK_IDS_FILE}' 已创建。")
-    else:
-        print(f"文件 '{MISSING_MINTMARK_IDS_FILE}' 已存在，未修改。")
-
-
-
-
-# 实现添加总和列的功能
-# 在此阶段排除来自同一系列的三个刻印组合，并且确保only1系列的刻印最多只有一个
-def find_initial_combinations(filtered_mintmark_list, attribute_targets, symmetric=False, use_only1=False):
-    ids, descriptions, mintmark_classes, attr_values_list = [], [], [], []
-
-    only1_ids = []
-    # 加载限制的系列id
-    if use_only1:
-        only1_ids = load_only1_mintmark_ids()  # 加载`only1`系列的ID集，用于后续判断
-        only1_ids = set(int(x) for x in only1_ids)  # 将 only1_ids 中的所有元素转换为整数
+from mintmark_core import (
+    ATTRIBUTES, DEFAULT_PATHS, PROGRESS_INTERVAL, QUERY_CACHE_DISK_MAX_ROWS, RESULT_COLUMNS, RESULT_DTYPE,
+    STREAM_PREVIEW_ROWS, DataPaths, QueryCache, QueryMetrics, QuerySession, SearchCancelled, build_arg_parser,
+    convert_json_to_csv, catalog_version, download_and_store_json, excel_file, export_results,
+    load_catalog_mintmark_table, parse_weights, prepare_data, profile_call, query_count, query_feasibility,
+    run_headless, write_metrics_log
+)
 
 
-    # 遍历 filtered_mintmark_list 提取每个刻印的属性
-    for mintmark in filtered_mintmark_list:
+# 在后台线程中执行查询的工作对象，通过信号报告进度、分批推送结果，支持取消
+class SearchWorker(QObject):
+    progress = pyqtSignal(int, int, int)  # 已处理的第一枚刻印数、总数、已找到的组合数
+    batch = pyqtSignal(object)  # 新找到的部分结果（未排序）
+    finished = pyqtSignal(object, object)  # 最终结果数组、统计信息
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, query, session, profile_path=None):
+        super().__init__()
+        self.query = query
+        self.session = session
+        self.profile_path = profile_path
+        self._cancelled = False
+        self._found = 0
+        self._pending = []
+        self._batches_sent = 0
+        self._last_emit = 0.0
+
+    def cancel(self):
+        self._cancelled = True
+
+    @pyqtSlot()
+    def run(self):
         try:
-            total_attr_values = [int(num) for num in mintmark["total_attr_value"].split()]
-            if len(total_attr_values) != 6:
-                continue
-        except ValueError:
-            continue
-
-        attr_values_list.append(total_attr_values)
-        ids.append(int(mintmark["id"]))  # 将ID存储为整数类型，便于后续排序
-        descriptions.append(mintmark["description"])
-        mintmark_classes.append(mintmark["mintmark_class"])
-
-    candidates = list(range(len(ids)))
-    initial_combinations = []  # 使用列表来存储组合，便于后续排序
-    data_to_save = []
-
-    for combination in combinations_with_replacement(candidates, 3):
-        class_counts = {mintmark_classes[i]: combination.count(i) for i in combination}
-
-        # 确保最多只有两个刻印来自于同一系列
-        if any(count > 2 for count in class_counts.values()):
-            continue
-
-        # 确保没有三个刻印来自于同一系列
-        if len(set([mintmark_classes[i] for i in combination])) == 1:
-            continue
-
-        # 如果需要对称性，确保组合中恰好有两个相同的元素
-        if symmetric:
-            if len(set(combination)) > 2:
-                continue
-            if not any(count == 2 for count in class_counts.values()):
-                continue
-
-        # 检查组合中的刻印ID是否有重复
-        ids_in_combination = [ids[i] for i in combination]
-        unique_ids = set(ids_in_combination)
-
-        if len(unique_ids) < len(ids_in_combination):
-            # 如果有重复ID，检查是否属于限1系列
-            for i in combination:
-                if ids_in_combination.count(ids[i]) > 1:
-                    if ids[i] in only1_ids:
-                        # 如果限1系列的刻印有重复ID，跳过这个组合
-                        valid_combination = False
-                        break
+            if self.profile_path:
+                results, stats = profile_call(self.profile_path, self.session.run, self.query,
+                                              progress_callback=self._on_progress)
             else:
-                valid_combination = True
-
-            if not valid_combination:
-                continue
-
-        # **对组合的刻印ID从大到小排序**
-        sorted_combination = sorted(combination, key=lambda i: ids[i], reverse=True)
-
-        # 添加到初步组合列表
-        initial_combinations.append(tuple(sorted_combination))
-
-    # 对所有组合进行排序，优先比较第一个刻印的ID，如果相同则比较第二个，以此类推
-    initial_combinations = sorted(initial_combinations, key=lambda comb: tuple(ids[i] for i in comb), reverse=True)
-
-    # 检查属性目标是否符合要求，并准备数据保存到文件
-    for combination in initial_combinations:
-        valid_combination = all(
-            target_min <= sum(attr_values_list[i][attr_index] for i in combination) <= target_max
-            for attr_index, (target_min, target_max) in attribute_targets.items()
-        )
-        if valid_combination:
-            attr_values_sum = [
-                sum(attr_values_list[i][attr_index] for i in combination) for attr_index in range(6)
-            ]
-            total_sum = sum(attr_values_sum[attr_index] for attr_index in attribute_targets if
-                            attribute_targets[attr_index] != (0, 0))
-            data_to_save.append([descriptions[i] for i in combination] + attr_values_sum + [total_sum])
-
-    # 将初步组合保存到文件，增加"总和"列
-    columns = ["刻印1", "刻印2", "刻印3", "攻击", "防御", "特攻", "特防", "速度", "体力", "选项总和"]
-    df = pd.DataFrame(data_to_save, columns=columns)
-    df.to_csv(COMBINATIONS_FILE, index=False, encoding='utf-8-sig')
-
-    return initial_combinations
-
-
-# 初步过滤刻印数据的方法
-def initial_filtering(mintmark_list, monster_id_filter=None, quality_filter=None, filter_low_values=False,
-                      total_sum_filter=None, attribute_targets=None, improve_efficiency=False, top_n=200):
-    filtered_mintmark_list = []
-    used_monster_ids = set()  # 用于记录已经使用过的专属刻印
-
-    for row in mintmark_list:
-        # 获取当前刻印的 monster_id
-        monster_id = row.get("monster_id")
-
-        # 如果这个刻印是专属刻印
-        if monster_id:
-            # 如果用户没有输入monster_id，跳过
-            if monster_id_filter is None:
-                continue
-            # 如果刻印的 monster_id 与用户输入不匹配，跳过
-            if monster_id != monster_id_filter:
-                continue
-            # 如果该 monster_id 已经被使用过，跳过
-            if monster_id in used_monster_ids:
-                continue
-            # 记录使用过的专属刻印
-            used_monster_ids.add(monster_id)
-
-
-
-        if row['quality'] == '5' and total_sum_filter:
-            try:
-                total_sum = int(row['total_sum'])
-                if not any([
-                    ('>220' in total_sum_filter and total_sum > 220),
-                    ('=220' in total_sum_filter and total_sum == 220),
-                    ('<220' in total_sum_filter and total_sum < 220)
-                ]):
-                    continue
-            except ValueError:
-                continue
-
-        # 质量过滤
-        if quality_filter and row["quality"] not in quality_filter:
-            continue
-
-        # 过滤低属性值的刻印
-        if filter_low_values:
-            try:
-                total_attr_values = [int(num) for num in row["total_attr_value"].split()]
-                if any(value < 0 for value in total_attr_values):
-                    continue
-            except ValueError:
-                continue
-
-        # 将符合条件的刻印加入列表
-        filtered_mintmark_list.append(row)
-
-    # 如果用户在两个或更多属性上设定了下限，且勾选了提高效率选项，则先进行排序并只保留前 top_n 个
-    if improve_efficiency and attribute_targets:
-        relevant_indices = [index for index, (min_value, max_value) in attribute_targets.items() if min_value > 0]
-        if len(relevant_indices) >= 2:
-            filtered_mintmark_list.sort(
-                key=lambda x: sum(int(x["total_attr_value"].split()[i]) for i in relevant_indices),
-                reverse=True
-            )
-            filtered_mintmark_list = filtered_mintmark_list[:top_n]
-
-    return filtered_mintmark_list
-
-
-# 进一步过滤刻印，基于“特定属性必须为 0”
-def filter_zero_requirements(mintmark_list, attribute_targets):
-    filtered_list = []
-    for mintmark in mintmark_list:
+                results, stats = self.session.run(self.query, progress_callback=self._on_progress)
+        except SearchCancelled:
+            self.cancelled.emit()
+            return
+        except FileNotFoundError:
+            self.failed.emit(f"文件 {self.session.paths.data_file} 未找到，请先下载数据。")
+            return
+        except Exception as e:
+            self.failed.emit(f"搜索时发生错误: {e}")
+            return
+        self.finished.emit(results, stats)
+
+    def _on_progress(self, done, total, partial_results):
+        if self._cancelled:
+            raise SearchCancelled()
+
+        if len(partial_results):
+            self._found += len(partial_results)
+            self._pending.append(partial_results)
+
+        # 限制推送频率，第一批结果立即推送
+        now = time.monotonic()
+        first_batch = self._pending and self._batches_sent == 0
+        if first_batch or done == total or now - self._last_emit >= PROGRESS_INTERVAL:
+            self._last_emit = now
+            self.progress.emit(done, total, self._found)
+            if self._pending:
+                self.batch.emit(np.concatenate(self._pending))
+                self._pending = []
+                self._batches_sent += 1
+
+
+# 在后台线程中导出结果的工作对象，通过信号报告进度
+class ExportWorker(QObject):
+    progress = pyqtSignal(int, int)  # 已写入的行数、需要写入的总行数
+    finished = pyqtSignal(object)  # 导出各阶段的计时
+    failed = pyqtSignal(str)
+
+    def __init__(self, results, paths):
+        super().__init__()
+        self.results = results
+        self.paths = paths
+        self._last_emit = 0.0
+
+    @pyqtSlot()
+    def run(self):
+        metrics = QueryMetrics()
         try:
-            total_attr_values = [int(num) for num in mintmark["total_attr_value"].split()]
-            if len(total_attr_values) != 6:
-                continue
-        except ValueError:
-            continue
-
-        valid = True
-        for attr_index, target_range in attribute_targets.items():
-            target_min, target_max = target_range
-            if target_min == 0 and target_max == 0 and total_attr_values[attr_index] != 0:
-                valid = False
-                break
-
-        if valid:
-            filtered_list.append(mintmark)
-    return filtered_list
-
-# 验证刻印组合是否符合所有条件（从文件中读取）
-def validate_combinations(attribute_targets, attributes):
-    valid_combinations = []
-
-    # 尝试读取 combinations_file，如果文件不存在则返回空列表
-    try:
-        df = pd.read_csv(COMBINATIONS_FILE, encoding='utf-8-sig')
-    except FileNotFoundError:
-        return valid_combinations
-
-    # 打开 process 文件以追加数据
-    with open(PROCESS_FILE, mode='a', newline='', encoding='utf-8-sig') as file:
-        writer = csv.writer(file)
-
-        # 检查文件是否为空，如果为空则写入头部
-        file.seek(0, 2)  # 移动到文件末尾
-        if file.tell() == 0:  # 如果文件为空，则写入头部
-            writer.writerow(["刻印1", "刻印2", "刻印3", "攻击", "防御", "特攻", "特防", "速度", "体力", "选项总和"])
-
-        for _, row in df.iterrows():
-            valid = True
-
-            # 确保最多只有两个刻印来自于同一个系列
-            class_counts = {}
-            for col in ["刻印1", "刻印2", "刻印3"]:
-                mintmark_class = row[col]
-                if mintmark_class not in class_counts:
-                    class_counts[mintmark_class] = 0
-                class_counts[mintmark_class] += 1
-
-            if any(count > 2 for count in class_counts.values()):
-                continue
-
-            for attr_index, (target_min, target_max) in attribute_targets.items():
-                total_value = row[attributes[attr_index]]
-                if not (target_min <= total_value <= target_max):
-                    valid = False
-                    break
-
-            if valid:
-                combination_data = [row[col] for col in ["刻印1", "刻印2", "刻印3", "攻击", "防御", "特攻", "特防", "速度", "体力", "选项总和"]]
-                valid_combinations.append(combination_data)
-                # 将有效的组合数据写入 result.csv 文件
-                writer.writerow(combination_data)
-
-    # 读取 CSV 文件，确保使用正确的编码
-    df = pd.read_csv(COMBINATIONS_FILE, encoding='utf-8-sig')
-
-
+            export_results(self.results, csv_path=self.paths.combinations_file, process_path=self.paths.process_file,
+                           metrics=metrics, progress_callback=self._on_progress)
+        except Exception as e:
+            self.failed.emit(f"导出时发生错误: {e}")
+            return
+        self.finished.emit(metrics)
+
+    def _on_progress(self, done, total):
+        now = time.monotonic()
+        if done == total or now - self._last_emit >= PROGRESS_INTERVAL:
+            self._last_emit = now
+            self.progress.emit(done, total)
+
+
+# 结果筛选条件中的数值条件，例如 "速度>=129"
+RESULT_CONDITION_PATTERN = re.compile(r'^(' + '|'.join(RESULT_COLUMNS[3:]) + r')(>=|<=|>|<|=)(-?\d+)$')
+
+
+# 解析结果筛选文本，返回结果数组上的布尔掩码；条件用空格分隔且需同时满足，
+# 数值条件如 "速度>=129"，其余的词在 3 个刻印的名称中查找。无法解析时抛出 ValueError
+def result_filter_mask(results, text):
+    mask = np.ones(len(results), dtype=bool)
+    for term in text.split():
+        match = RESULT_CONDITION_PATTERN.match(term)
+        if match:
+            column, operator, value = match.group(1), match.group(2), int(match.group(3))
+            values = results[column]
+            if operator == ">=":
+                mask &= values >= value
+            elif operator == "<=":
+                mask &= values <= value
+            elif operator == ">":
+                mask &= values > value
+            elif operator == "<":
+                mask &= values < value
+            else:
+                mask &= values == value
+        elif any(symbol in term for symbol in "<>="):
+            raise ValueError(f"无法识别的条件：{term}")
+        else:
+            # 刻印名称的种类远少于结果行数，先在不重复的名称中查找，再映射回各行
+            term_mask = np.zeros(len(results), dtype=bool)
+            for column in RESULT_COLUMNS[:3]:
+                names, inverse = np.unique(results[column].astype(str), return_inverse=True)
+                term_mask |= np.array([term in name for name in names], dtype=bool)[inverse]
+            mask &= term_mask
+    return mask
+
+
+# 结果表格的数据模型：直接引用结果数组，表格只在显示某一行时才读取该行的数据。
+# 排序和筛选只生成行号数组（np.argsort / 布尔掩码），不复制结果数组
+class ResultTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results = np.empty(0, dtype=RESULT_DTYPE)
+        self._sorted = np.arange(0)  # 按当前排序列排列的全部行号
+        self._mask = np.ones(0, dtype=bool)  # 当前筛选条件下保留的行
+        self._rows = np.arange(0)  # 表格中各行对应的结果行号
+        self._sort_column, self._sort_order = -1, Qt.AscendingOrder
+        self._filter_text = ""
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(RESULT_COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return str(self.results[RESULT_COLUMNS[index.column()]][self._rows[index.row()]])
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter  # 设置文本居中
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return RESULT_COLUMNS[section]
+        return str(section + 1)
+
+    # 显示新的结果数组，保留当前的排序列和筛选条件
+    def set_results(self, results):
+        self.beginResetModel()
+        self.results = results
+        self._mask = self._build_mask()
+        self._sorted = self._build_order()
+        self._rows = self._sorted[self._mask[self._sorted]]
+        self.endResetModel()
+
+    # 在末尾追加结果（搜索过程中分批显示），不重新排序
+    def append_results(self, results):
+        if len(results) == 0:
+            return
+        start = len(self.results)
+        mask = result_filter_mask(results, self._filter_text) if self._filter_text else np.ones(len(results), bool)
+        new_rows = np.flatnonzero(mask) + start
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(new_rows) - 1)
+        self.results = np.concatenate([self.results, results])
+        self._mask = np.concatenate([self._mask, mask])
+        self._sorted = np.concatenate([self._sorted, np.arange(start, len(self.results))])
+        self._rows = np.concatenate([self._rows, new_rows])
+        self.endInsertRows()
+
+    def clear(self):
+        self.set_results(np.empty(0, dtype=RESULT_DTYPE))
+
+    # 按列排序；column 为 -1 时恢复结果数组原来的顺序
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column, self._sort_order = column, order
+        self.layoutAboutToBeChanged.emit()
+        self._sorted = self._build_order()
+        self._rows = self._sorted[self._mask[self._sorted]]
+        self.layoutChanged.emit()
+
+    # 设置筛选文本，条件无法识别时抛出 ValueError 且不改变当前显示
+    def set_filter(self, text):
+        text = text.strip()
+        mask = result_filter_mask(self.results, text)
+        self.beginResetModel()
+        self._filter_text = text
+        self._mask = mask
+        self._rows = self._sorted[self._mask[self._sorted]]
+        self.endResetModel()
+
+    def total_count(self):
+        return len(self.results)
+
+    def _build_mask(self):
+        return result_filter_mask(self.results, self._filter_text)
+
+    def _build_order(self):
+        if self._sort_column < 0:
+            return np.arange(len(self.results))
+        values = self.results[RESULT_COLUMNS[self._sort_column]]
+        if values.dtype == object:
+            values = values.astype(str)  # 转为定长字符串后在 numpy 中排序
+        if self._sort_order == Qt.DescendingOrder:
+            # 按名次取负后稳定排序，值相同的行保持原来的先后顺序
+            _, ranks = np.unique(values, return_inverse=True)
+            return np.argsort(-ranks.reshape(-1), kind="stable")
+        return np.argsort(values, kind="stable")
 
-    # 将 DataFrame 保存为 Excel 文件
-    df.to_excel(excel_file, index=False, engine='openpyxl')
-    return valid_combinations
 
 #
 # # 生成组合并写入 CSV 文件
@@ -500,8 +273,8 @@ def validate_combinations(attribute_targets, attributes):
 # # 处理并保存 JSON 文件
 # process_and_write_json(DATA_FILE, JSON_FILE)
 
-# 创建 GUI
-def create_gui():
+# 创建 GUI；数据文件从 paths 读写，给出 metrics_log 时每次查询和导出的计时和计数追加到该 JSON Lines 文件
+def create_gui(metrics_log=None, paths=DEFAULT_PATHS):
     app = QApplication(sys.argv)
     window = QWidget()
     window.setWindowTitle('刻印筛选工具 ——By 摩尔曼斯克')
@@ -510,7 +283,8 @@ def create_gui():
 
     form_layout = QFormLayout()
     input_fields = {}
-    attributes = ['攻击', '防御', '特攻', '特防', '速度', '体力']
+    range_labels = {}
+    attributes = ATTRIBUTES
 
     for index, attr in enumerate(attributes):
         row_layout = QHBoxLayout()
@@ -536,6 +310,12 @@ def create_gui():
         row_layout.addWidget(reset_button)
         row_layout.addWidget(clear_button)
 
+        # 当前条件下三枚刻印该项属性之和可以达到的范围
+        range_label = QLabel()
+        range_label.setMinimumWidth(130)
+        row_layout.addWidget(range_label)
+        range_labels[index] = range_label
+
         form_layout.addRow(row_layout)
         input_fields[index] = (min_field, max_field)
 
@@ -549,26 +329,76 @@ def create_gui():
     only1_checkbox.setChecked(True)
     form_layout.addRow(only1_checkbox)
 
+    # 精确剪枝：结果与完整枚举一致，只是更快
+    branch_bound_layout = QHBoxLayout()
+    branch_bound_checkbox = QCheckBox("提升效率（精确剪枝，不会缺失刻印）")
+    branch_bound_checkbox.setChecked(True)
+    branch_bound_layout.addWidget(branch_bound_checkbox)
+
+    workers_field = QLineEdit()
+    workers_field.setText("1")
+    workers_field.setFixedWidth(50)
+    branch_bound_layout.addWidget(QLabel("并行进程数"))
+    branch_bound_layout.addWidget(workers_field)
+    branch_bound_layout.addItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
+    form_layout.addRow(branch_bound_layout)
+
     improve_efficiency_layout = QHBoxLayout()
-    improve_efficiency_checkbox = QCheckBox("提升效率【可能会缺失刻印】")
-    improve_efficiency_checkbox.setChecked(True)
+    improve_efficiency_checkbox = QCheckBox("只选择5项总和位次前")
+    improve_efficiency_checkbox.setChecked(False)
     improve_efficiency_layout.addWidget(improve_efficiency_checkbox)
 
     top_n_field = QLineEdit()
     top_n_field.setText("200")
     top_n_field.setFixedWidth(50)
-    improve_efficiency_layout.addWidget(QLabel("只选择5项总和位次前"))
     improve_efficiency_layout.addWidget(top_n_field)
-    improve_efficiency_layout.addWidget(QLabel("的刻印"))
+    improve_efficiency_layout.addWidget(QLabel("的刻印【可能会缺失刻印】"))
 
     spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
     improve_efficiency_layout.addItem(spacer)
     form_layout.addRow(improve_efficiency_layout)
 
+    # 前 K 名模式：只保留得分最高的 K 个组合，得分默认为“选项总和”
+    top_k_layout = QHBoxLayout()
+    top_k_layout.addWidget(QLabel("只显示得分最高的"))
+    top_k_field = QLineEdit()
+    top_k_field.setFixedWidth(60)
+    top_k_field.setPlaceholderText("全部")
+    top_k_layout.addWidget(top_k_field)
+    top_k_layout.addWidget(QLabel("个组合，权重"))
+    weights_field = QLineEdit()
+    weights_field.setPlaceholderText("留空按选项总和，例如 速度=2 体力=0.5")
+    top_k_layout.addWidget(weights_field)
+    form_layout.addRow(top_k_layout)
+
+    # Pareto 前沿模式：只保留在所选属性上不被其他组合全面压制的组合
+    pareto_layout = QHBoxLayout()
+    pareto_checkbox = QCheckBox("只保留不被其他组合全面压制的组合，比较属性:")
+    pareto_layout.addWidget(pareto_checkbox)
+    pareto_attr_checkboxes = {}
+    for index, attr in enumerate(ATTRIBUTES):
+        checkbox = QCheckBox(attr)
+        pareto_layout.addWidget(checkbox)
+        pareto_attr_checkboxes[index] = checkbox
+    pareto_layout.addItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
+    form_layout.addRow(pareto_layout)
+
     filter_low_values_checkbox = QCheckBox("去除属性值过低的刻印（低于目标值的五分之一）")
     filter_low_values_checkbox.setChecked(True)
     form_layout.addRow(filter_low_values_checkbox)
 
+    keep_dominated_checkbox = QCheckBox("保留被同系列刻印完全压制的刻印（默认不保留，只给出未被压制的组合；勾选得到完整列表，计算更慢）")
+    keep_dominated_checkbox.setChecked(False)
+    form_layout.addRow(keep_dominated_checkbox)
+
+    disk_cache_checkbox = QCheckBox(f"在磁盘上缓存查询结果（重启后仍可复用，只保存不超过 {QUERY_CACHE_DISK_MAX_ROWS} 行的结果）")
+    disk_cache_checkbox.setChecked(False)
+    form_layout.addRow(disk_cache_checkbox)
+
+    profile_checkbox = QCheckBox("性能分析下一次查询（cProfile，结果保存到 data 文件夹）")
+    profile_checkbox.setChecked(False)
+    form_layout.addRow(profile_checkbox)
+
     quality_checkboxes = {}
     qualities = {'5角': '5', '4角': '4', '3角': '3', '2角': '2'}
     quality_row_layout = QHBoxLayout()
@@ -592,15 +422,53 @@ def create_gui():
     form_layout.addRow(QLabel('5项总和条件（仅对5角刻印）:'), total_sum_row_layout)
 
     filter_button = QPushButton('筛选刻印组合')
+    count_button = QPushButton('统计结果数')
+    cancel_button = QPushButton('取消')
+    cancel_button.setEnabled(False)
+    export_button = QPushButton('导出结果')
     download_button = QPushButton('下载刻印数据')
     update_button = QPushButton('更新刻印文件')
-    result_table = QTableWidget()
-    result_table.setColumnCount(10)
-    result_table.setHorizontalHeaderLabels(
-        ["刻印1", "刻印2", "刻印3", "攻击", "防御", "特攻", "特防", "速度", "体力", "选项总和"]
-    )
+    candidate_label = QLabel()
+    progress_bar = QProgressBar()
+    progress_bar.setRange(0, 100)
+    status_label = QLabel()
+    # 结果表格：数据由 ResultTableModel 按需提供，单击表头排序
+    result_model = ResultTableModel()
+    result_table = QTableView()
+    result_table.setModel(result_model)
+    result_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+    result_table.setSortingEnabled(True)
+    result_table.verticalHeader().setDefaultSectionSize(24)
+    # 在已得到的结果中筛选，不重新搜索
+    result_filter_field = QLineEdit()
+    result_filter_field.setPlaceholderText("在结果中筛选：刻印名称关键字，或如 速度>=129 体力>300（空格分隔，需同时满足），回车生效")
+    result_count_label = QLabel()
+    # 表格下方的状态栏：最近一次查询或导出的各阶段耗时和淘汰计数
+    metrics_label = QLabel()
+    metrics_label.setWordWrap(True)
+
+    # 最近一次查询的结果，供“导出结果”按钮使用
+    last_results = [None]
+    # 正在运行的后台搜索线程和工作对象
+    search_state = {"thread": None, "worker": None}
+    # 正在运行的后台导出线程和工作对象
+    export_state = {"thread": None, "worker": None, "rows": 0}
+    # 查询结果缓存，重复的查询直接返回上次的结果；只收紧属性范围时在上次的结果中筛选。
+    # 默认只缓存在内存中，勾选后才同时写入磁盘缓存
+    query_session = QuerySession(cache=QueryCache(), paths=paths, metrics_log=metrics_log)
+
+    def on_disk_cache_toggled(checked):
+        query_session.cache.disk_dir = paths.query_cache_dir if checked else None
+
+    disk_cache_checkbox.toggled.connect(on_disk_cache_toggled)
+
+    # 从界面读取查询参数；输入无效时返回 None，show_errors 为 True 时弹出提示
+    def read_query(show_errors=True):
+        def fail(message):
+            if show_errors:
+                QMessageBox.warning(window, "输入错误", message)
+            return None
 
-    def on_filter_button_clicked():
         attribute_targets = {}
         for index, (min_field, max_field) in input_fields.items():
             min_value = min_field.text().strip()
@@ -613,73 +481,304 @@ def create_gui():
                 elif min_value and max_value:
                     min_value, max_value = int(min_value), int(max_value)
                     if min_value > max_value:
-                        QMessageBox.warning(window, "输入错误", f"{attributes[index]} 的最小值不能大于最大值。")
-                        return
+                        return fail(f"{attributes[index]} 的最小值不能大于最大值。")
                     attribute_targets[index] = (min_value, max_value)
             except ValueError:
-                QMessageBox.warning(window, "输入错误", f"{attributes[index]} 的值无效，请输入整数。")
-                return
+                return fail(f"{attributes[index]} 的值无效，请输入整数。")
 
         monster_id = monster_id_field.text().strip()
         symmetric = symmetric_checkbox.isChecked()
         use_only1 = only1_checkbox.isChecked()
         improve_efficiency = improve_efficiency_checkbox.isChecked()
+        engine = "branch_bound" if branch_bound_checkbox.isChecked() else "numpy"
         filter_low_values = filter_low_values_checkbox.isChecked()
+        keep_dominated = keep_dominated_checkbox.isChecked()
         quality_filter = [value for value, checkbox in quality_checkboxes.items() if checkbox.isChecked()]
         total_sum_filter = [value for value, checkbox in total_sum_checkboxes.items() if checkbox.isChecked()]
         try:
             top_n = int(top_n_field.text().strip())
         except ValueError:
-            QMessageBox.warning(window, "输入错误", "请在提升效率选项中输入有效的整数值。")
-            return
+            return fail("请在提升效率选项中输入有效的整数值。")
+        try:
+            workers = max(1, int(workers_field.text().strip()))
+        except ValueError:
+            return fail("请输入有效的并行进程数。")
 
+        query = dict(attribute_targets=attribute_targets, monster_id_filter=monster_id, quality_filter=quality_filter,
+                     filter_low_values=filter_low_values, total_sum_filter=total_sum_filter,
+                     improve_efficiency=improve_efficiency, top_n=top_n, symmetric=symmetric, use_only1=use_only1,
+                     keep_dominated=keep_dominated, engine=engine, workers=workers)
+        if top_k_field.text().strip():
+            try:
+                query["top_k"] = int(top_k_field.text().strip())
+            except ValueError:
+                return fail("请输入有效的组合个数。")
+            try:
+                query["weights"] = parse_weights(weights_field.text()) or None
+            except ValueError as e:
+                return fail(str(e))
+        if pareto_checkbox.isChecked():
+            query["pareto_attrs"] = [index for index, checkbox in pareto_attr_checkboxes.items() if checkbox.isChecked()]
+            if not query["pareto_attrs"]:
+                return fail("请至少选择一项用于比较的属性。")
+        return query
+
+    # 可行性预检查：根据当前输入计算各属性可达的范围，显示在输入框右侧，无法达到的范围标红
+    catalog_state = {"version": None, "mintmark_table": None}
+
+    # 预检查和结果数统计用的刻印表，数据版本变化时重新读取；读取失败时返回 None
+    def current_mintmark_table():
         try:
-            mintmark_list = []
-            with open(DATA_FILE, 'r', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    mintmark_list.append(row)
-        except FileNotFoundError:
-            QMessageBox.critical(window, "错误", f"文件 {DATA_FILE} 未找到，请先下载数据。")
+            version = catalog_version(paths)
+            if catalog_state["version"] != version:
+                catalog_state["mintmark_table"] = load_catalog_mintmark_table(paths)
+                catalog_state["version"] = version
+        except (FileNotFoundError, OSError):
+            return None
+        return catalog_state["mintmark_table"]
+
+    def update_feasibility():
+        query = read_query(show_errors=False)
+        if current_mintmark_table() is None:
+            query = None
+        if query is None:
+            for range_label in range_labels.values():
+                range_label.clear()
+            return
+
+        feasible, ranges = query_feasibility(catalog_state["mintmark_table"], query)
+        for index, range_label in range_labels.items():
+            if ranges[index] is None:
+                range_label.setText("无法满足")
+                range_label.setStyleSheet("color: red")
+                continue
+            low, high = ranges[index]
+            target_min, target_max = query["attribute_targets"].get(index, (float('-inf'), float('inf')))
+            range_label.setText(f"可达 {low} - {high}")
+            range_label.setStyleSheet("" if feasible and target_min <= high and target_max >= low else "color: red")
+
+    feasibility_timer = QTimer(window)
+    feasibility_timer.setSingleShot(True)
+    feasibility_timer.setInterval(300)
+    feasibility_timer.timeout.connect(update_feasibility)
+
+    def schedule_feasibility(*args):
+        feasibility_timer.start()
+
+    def on_filter_button_clicked():
+        query = read_query()
+        if query is None:
             return
+        start_search(query)
 
-        # 调用初步过滤和验证的方法，这些可以根据需要进一步完善
-        filtered_mintmark_list = initial_filtering(mintmark_list, monster_id_filter=monster_id,
-                                                   quality_filter=quality_filter, filter_low_values=filter_low_values,
-                                                   total_sum_filter=total_sum_filter, attribute_targets=attribute_targets,
-                                                   improve_efficiency=improve_efficiency, top_n=top_n)
-        filtered_mintmark_list = filter_zero_requirements(filtered_mintmark_list, attribute_targets)
-        find_initial_combinations(filtered_mintmark_list, attribute_targets, symmetric=symmetric, use_only1=use_only1)
-        valid_combinations = validate_combinations(attribute_targets, attributes)
-
-        if valid_combinations:
-            result_table.setRowCount(len(valid_combinations))
-            for row_idx, combination in enumerate(valid_combinations):
-                for col_idx, value in enumerate(combination):
-                    item = QTableWidgetItem(str(value))
-                    item.setTextAlignment(Qt.AlignCenter)  # 设置文本居中
-                    result_table.setItem(row_idx, col_idx, item)
+    # 统计当前条件下的结果数，不进行搜索：能精确计数时给出精确值，否则给出抽样估计和误差
+    def on_count_button_clicked():
+        query = read_query()
+        if query is None:
+            return
+        mintmark_table = current_mintmark_table()
+        if mintmark_table is None:
+            QMessageBox.critical(window, "错误", "无法读取刻印数据，请先下载并更新刻印文件。")
+            return
+        start = time.perf_counter()
+        count = query_count(mintmark_table, query, paths=paths)
+        elapsed = time.perf_counter() - start
+        candidate_label.setText(f"候选刻印 {count['candidates']} 个")
+        if count["exact"]:
+            status_label.setText(f"预计共 {count['count']} 个组合（精确统计，用时 {elapsed:.2f} 秒）")
         else:
-            result_table.setRowCount(0)
+            status_label.setText(f"预计约 {count['count']} 个组合（抽样估计，误差约 ±{count['error']:.0f}，"
+                                 f"用时 {elapsed:.2f} 秒）")
+
+    # 在后台线程中启动搜索，结果分批显示在表格中
+    def start_search(query):
+        result_model.clear()
+        result_count_label.clear()
+        last_results[0] = None
+        progress_bar.setValue(0)
+        status_label.setText("正在搜索...")
+        candidate_label.clear()
+        metrics_label.clear()
+        filter_button.setEnabled(False)
+        count_button.setEnabled(False)
+        cancel_button.setEnabled(True)
+
+        profile_path = None
+        if profile_checkbox.isChecked():
+            profile_path = os.path.join(paths.folder, f"profile_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+            profile_checkbox.setChecked(False)
+
+        thread = QThread()
+        worker = SearchWorker(query, query_session, profile_path=profile_path)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(on_search_progress)
+        worker.batch.connect(on_search_batch)
+        worker.finished.connect(on_search_finished)
+        worker.failed.connect(on_search_failed)
+        worker.cancelled.connect(on_search_cancelled)
+        for signal in (worker.finished, worker.failed, worker.cancelled):
+            signal.connect(thread.quit)
+        thread.finished.connect(on_thread_finished)
+        search_state["thread"], search_state["worker"] = thread, worker
+        thread.start()
+
+    def on_search_progress(done, total, found):
+        progress_bar.setValue(int(done * 100 / total) if total else 100)
+        status_label.setText(f"搜索中：第一枚刻印 {done}/{total}，已找到 {found} 个组合")
+
+    def on_search_batch(partial_results):
+        remaining = STREAM_PREVIEW_ROWS - result_model.total_count()
+        if remaining > 0:
+            result_model.append_results(partial_results[:remaining])
+
+    def on_search_finished(valid_combinations, stats):
+        last_results[0] = valid_combinations
+        if keep_dominated_checkbox.isChecked():
+            candidate_label.setText(f"候选刻印 {stats['candidates']} 个（保留被压制的刻印）")
+        else:
+            candidate_label.setText(f"候选刻印 {stats['candidates']} 个（默认去除被压制的刻印 {stats['removed']} 个，"
+                                    f"需要完整列表请勾选“保留被同系列刻印完全压制的刻印”）")
+        progress_bar.setValue(100)
+        cached_text = "（来自缓存）" if stats.get("cached") else "（在上次结果中筛选）" if stats.get("refined") else ""
+        status_label.setText(f"搜索完成，共 {len(valid_combinations)} 个组合{cached_text}")
+        metrics_label.setText(stats["metrics"].summary())
+
+        result_model.set_results(valid_combinations)
+        update_result_count()
+        if not len(valid_combinations) and stats.get("feasible") is False:
+            update_feasibility()
+            QMessageBox.information(window, "结果", "当前的属性范围无法同时满足，请参考输入框右侧的可达范围调整。")
+        elif not len(valid_combinations):
             QMessageBox.information(window, "结果", "未找到符合条件的刻印组合。")
 
+    def on_search_failed(message):
+        status_label.setText("搜索失败")
+        QMessageBox.critical(window, "错误", message)
+
+    def on_search_cancelled():
+        status_label.setText(f"搜索已取消，已显示 {result_model.total_count()} 个部分结果")
+        update_result_count()
+
+    def update_result_count():
+        if result_model.rowCount() != result_model.total_count():
+            result_count_label.setText(f"显示 {result_model.rowCount()} / {result_model.total_count()} 个组合")
+        else:
+            result_count_label.clear()
+
+    def on_result_filter_changed():
+        try:
+            result_model.set_filter(result_filter_field.text())
+        except ValueError as e:
+            QMessageBox.warning(window, "输入错误", str(e))
+            return
+        update_result_count()
+
+    def on_thread_finished():
+        search_state["thread"], search_state["worker"] = None, None
+        filter_button.setEnabled(True)
+        count_button.setEnabled(True)
+        cancel_button.setEnabled(False)
+
+    def on_cancel_button_clicked():
+        if search_state["worker"] is not None:
+            search_state["worker"].cancel()
+            status_label.setText("正在取消...")
+
+    # 在后台线程中导出结果，进度显示在进度条中
+    def on_export_button_clicked():
+        if last_results[0] is None or len(last_results[0]) == 0:
+            QMessageBox.information(window, "导出", "没有可以导出的结果，请先筛选刻印组合。")
+            return
+        export_button.setEnabled(False)
+        progress_bar.setValue(0)
+        status_label.setText("正在导出...")
+
+        thread = QThread()
+        worker = ExportWorker(last_results[0], paths)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(on_export_progress)
+        worker.finished.connect(on_export_finished)
+        worker.failed.connect(on_export_failed)
+        for signal in (worker.finished, worker.failed):
+            signal.connect(thread.quit)
+        thread.finished.connect(on_export_thread_finished)
+        export_state["thread"], export_state["worker"] = thread, worker
+        export_state["rows"] = len(last_results[0])
+        thread.start()
+
+    def on_export_progress(done, total):
+        progress_bar.setValue(int(done * 100 / total) if total else 100)
+        status_label.setText(f"正在导出：{done}/{total} 行")
+
+    def on_export_finished(metrics):
+        exported = export_state["rows"]
+        progress_bar.setValue(100)
+        status_label.setText(f"已导出 {exported} 条结果")
+        metrics_label.setText(metrics.summary())
+        if metrics_log:
+            write_metrics_log(metrics_log, {}, {"exported": exported}, metrics)
+        QMessageBox.information(window, "导出", f"已导出 {exported} 条结果到 {excel_file}。")
+
+    def on_export_failed(message):
+        status_label.setText("导出失败")
+        QMessageBox.critical(window, "错误", message)
+
+    def on_export_thread_finished():
+        export_state["thread"], export_state["worker"] = None, None
+        export_button.setEnabled(True)
+
     filter_button.clicked.connect(on_filter_button_clicked)
-    download_button.clicked.connect(download_and_store_json)
-    update_button.clicked.connect(convert_json_to_csv)
+    count_button.clicked.connect(on_count_button_clicked)
+    cancel_button.clicked.connect(on_cancel_button_clicked)
+    export_button.clicked.connect(on_export_button_clicked)
+    result_filter_field.returnPressed.connect(on_result_filter_changed)
+    # 影响候选刻印或属性范围的输入变化后，稍等片刻再更新可达范围
+    for min_field, max_field in input_fields.values():
+        min_field.textChanged.connect(schedule_feasibility)
+        max_field.textChanged.connect(schedule_feasibility)
+    for field in (monster_id_field, top_n_field):
+        field.textChanged.connect(schedule_feasibility)
+    for checkbox in (list(quality_checkboxes.values()) + list(total_sum_checkboxes.values()) +
+                     [filter_low_values_checkbox, improve_efficiency_checkbox]):
+        checkbox.stateChanged.connect(schedule_feasibility)
+    feasibility_timer.start()
+    download_button.clicked.connect(lambda: download_and_store_json(paths))
+    update_button.clicked.connect(lambda: convert_json_to_csv(paths))
 
     layout.addLayout(form_layout)
-    layout.addWidget(filter_button)
+    search_row_layout = QHBoxLayout()
+    search_row_layout.addWidget(filter_button)
+    search_row_layout.addWidget(count_button)
+    search_row_layout.addWidget(cancel_button)
+    layout.addLayout(search_row_layout)
+    layout.addWidget(export_button)
     layout.addWidget(download_button)
     layout.addWidget(update_button)
+    layout.addWidget(candidate_label)
+    layout.addWidget(progress_bar)
+    layout.addWidget(status_label)
+    result_filter_layout = QHBoxLayout()
+    result_filter_layout.addWidget(result_filter_field)
+    result_filter_layout.addWidget(result_count_label)
+    layout.addLayout(result_filter_layout)
     layout.addWidget(result_table)
+    layout.addWidget(metrics_label)
 
     window.setLayout(layout)
     window.show()
     sys.exit(app.exec_())
 
 
+# 命令行入口：默认启动界面，给出 --batch 时直接执行批量查询，给出 --serve 时启动查询服务
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    paths = DataPaths(args.data_dir)
+    if not run_headless(args, paths):
+        prepare_data(paths)  # 准备数据文件夹、刻印数据和限1刻印 ID 文件
+        create_gui(metrics_log=args.metrics_log, paths=paths)  # 启动 GUI 应用程序
+
+
 if __name__ == "__main__":
-    ensure_data_prepared()  # 确保 JSON 和 CSV 数据已准备好
-    create_missing_mintmark_ids_file()  # 创建缺失刻印 ID 文件
-    generate_only1_mintmark_ids()  # 生成限1刻印的 ID 文件
-    create_gui()  # 启动 GUI 应用程序
+    main()
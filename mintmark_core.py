@@ -0,0 +1,3051 @@
+# 刻印组合计算的核心逻辑：数据准备、过滤、组合搜索、缓存、批量查询和查询服务。
+# 不依赖 PyQt5，导入时不读写任何文件；openpyxl 等较重的依赖只在需要时才导入
+from bisect import bisect_left
+from itertools import product
+from functools import partial
+from contextlib import contextmanager, nullcontext
+from math import comb
+import argparse
+import csv
+import hashlib
+import json
+from urllib.parse import urljoin
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import os
+
+
+# 定义用于存储刻印数据的文件路径
+FOLDER_PATH = "data"
+DATA_FILE = os.path.join(FOLDER_PATH, "mintmark_data.csv")
+JSON_FILE = os.path.join(FOLDER_PATH, "mintmark_data.json")
+COMBINATIONS_FILE = os.path.join(FOLDER_PATH, "combinations_data.csv")
+ONLY1_MINTMARK_CLASS_FILE = os.path.join(FOLDER_PATH, "only1_mintmark_class.txt")
+ONLY1_MINTMARK_IDS_FILE = os.path.join(FOLDER_PATH, "only1_mintmark_ids.txt")
+
+MISSING_MINTMARK_IDS_FILE = os.path.join(FOLDER_PATH, "missing_mintmark_ids.txt") # 用户没有这个刻印
+CATALOG_FILE = os.path.join(FOLDER_PATH, "mintmark_catalog.npz")  # 二进制刻印目录，由 convert_json_to_csv 生成
+QUERY_CACHE_DIR = os.path.join(FOLDER_PATH, "query_cache")  # 查询结果的磁盘缓存
+PROCESS_FILE = os.path.join(FOLDER_PATH, "process.csv")
+
+excel_file = "结果.xlsx"
+
+
+# 数据文件的路径集合：所有读写数据文件的函数都通过它取得路径，默认使用 data 文件夹
+class DataPaths:
+    def __init__(self, folder=FOLDER_PATH):
+        self.folder = folder
+        self.data_file = os.path.join(folder, "mintmark_data.csv")
+        self.json_file = os.path.join(folder, "mintmark_data.json")
+        self.combinations_file = os.path.join(folder, "combinations_data.csv")
+        self.only1_class_file = os.path.join(folder, "only1_mintmark_class.txt")
+        self.only1_ids_file = os.path.join(folder, "only1_mintmark_ids.txt")
+        self.missing_ids_file = os.path.join(folder, "missing_mintmark_ids.txt")
+        self.catalog_file = os.path.join(folder, "mintmark_catalog.npz")
+        self.query_cache_dir = os.path.join(folder, "query_cache")
+        self.process_file = os.path.join(folder, "process.csv")
+        self.version_file = os.path.join(folder, "mintmark_version.json")  # 已下载数据的版本（带哈希的文件名）
+
+
+DEFAULT_PATHS = DataPaths()
+
+# 刻印数据的版本文件，以及 mintmark.json 所在的目录
+VERSION_URL = "http://seerh5.61.com/version/version.json"
+MINTMARK_BASE_URL = "http://seerh5.61.com/resource/config/xml/"
+
+# CSV 文件的列
+MINTMARK_FIELDS = ["id", "quality", "description", "total_attr_value", "total_sum", "monster_id", "mintmark_class"]
+
+# 向量化搜索时每个计算块包含的三元组数量上限，用于控制内存占用
+SEARCH_BLOCK_SIZE = 1 << 20
+
+# 六项属性的名称，顺序与 total_attr_value 一致
+ATTRIBUTES = ['攻击', '防御', '特攻', '特防', '速度', '体力']
+
+# 并行搜索时每个进程平均分到的分片数，分片越多负载越均衡
+SHARDS_PER_WORKER = 4
+
+# 查询结果缓存的容量：内存中最多保存的查询数和结果行数，磁盘缓存的总大小（字节），
+# 以及写入磁盘缓存的结果行数上限（更大的结果写盘耗时与重新计算相当，只保存在内存中）
+QUERY_CACHE_MAX_ENTRIES = 32
+QUERY_CACHE_MAX_ROWS = 2000000
+QUERY_CACHE_DISK_LIMIT = 256 * 1024 * 1024
+QUERY_CACHE_DISK_MAX_ROWS = 50000
+
+# 配对和索引缓存最多保留的索引数（每个索引约占 n² 量级的内存）
+PAIR_INDEX_CACHE_SIZE = 4
+
+# 查询服务的默认端口、处理请求的线程数、排队等待的请求数上限，以及分页的默认和最大行数；
+# 服务繁忙时读取被拒绝请求的超时（秒），避免慢速客户端阻塞接收新连接
+SERVICE_PORT = 8765
+SERVICE_THREADS = 4
+SERVICE_QUEUE_SIZE = 16
+SERVICE_PAGE_SIZE = 1000
+SERVICE_MAX_PAGE_SIZE = 10000
+SERVICE_REJECT_TIMEOUT = 1.0
+
+# 后台搜索时向界面推送进度和结果的最短间隔（秒）
+PROGRESS_INTERVAL = 0.1
+
+# 搜索过程中最多预先显示的结果行数，其余结果在搜索结束后一次性显示
+STREAM_PREVIEW_ROWS = 2000
+
+# 历史记录 process.csv 的大小上限（字节）和保留的旧文件数（process.1.csv、process.2.csv ...）
+PROCESS_MAX_BYTES = 32 * 1024 * 1024
+PROCESS_BACKUPS = 2
+
+# 导出时每写入多少行报告一次进度；Excel 每个工作表最多写入的结果行数（不含表头）
+EXPORT_PROGRESS_ROWS = 20000
+EXCEL_MAX_ROWS = 1048575
+
+# 结果数统计：精确计数时直方图网格的最大格数（超过时改为抽样估计）、抽样估计的样本对数，以及直接枚举的刻印数上限
+COUNT_MAX_CELLS = 1 << 22
+COUNT_SAMPLES = 2000
+COUNT_DIRECT_SIZE = 64
+
+# 查询各阶段的名称，用于状态栏显示
+STAGE_LABELS = OrderedDict([
+    ("load", "读取"), ("cache", "缓存"), ("refine", "结果内筛选"), ("initial_filtering", "初步过滤"),
+    ("filter_zero_requirements", "置0过滤"), ("filter_dominated_mintmarks", "去除压制"), ("search", "组合搜索"),
+    ("sort", "排序"), ("validate", "验证"), ("feasibility", "可行性检查"), ("pareto", "Pareto前沿"), ("export_csv", "导出CSV"), ("export_process", "写入历史"),
+    ("export_excel", "导出Excel"),
+])
+
+# 各项过滤淘汰的刻印数和各条规则淘汰的组合数的名称
+MINTMARK_REJECTION_LABELS = OrderedDict([
+    ("initial_filtering", "初步过滤"), ("zero_requirements", "置0"), ("dominated", "被压制"),
+])
+COMBINATION_REJECTION_LABELS = OrderedDict([
+    ("same_mintmark", "同一刻印三次"), ("same_class", "三枚同系列"), ("symmetric", "不对称"),
+    ("only1_duplicate", "限1重复"), ("attribute_bounds", "属性范围"), ("top_k", "属性范围或未进入前K名"),
+    ("pareto", "被其他组合压制"),
+])
+
+# 结果表格的列名
+RESULT_COLUMNS = ["刻印1", "刻印2", "刻印3", "攻击", "防御", "特攻", "特防", "速度", "体力", "选项总和"]
+
+# 内存中结果数组的字段：结果表格的各列，以及 3 个刻印的 ID
+RESULT_DTYPE = np.dtype(
+    [(column, object) for column in RESULT_COLUMNS[:3]] +
+    [(column, np.int64) for column in RESULT_COLUMNS[3:]] +
+    [("ID1", np.int64), ("ID2", np.int64), ("ID3", np.int64)]
+)
+
+# 限1刻印的系列id，例如65是"精灵王誓约"
+content = [
+    "57", "61", "65", "66", "67", "74", "75", "78", "80", "83", "84", "85"
+]
+
+# 将内容写入txt文件，每个数字占一行
+def write_content_to_file(file_path, content):
+    if not os.path.exists(file_path):
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write("\n".join(content) + "\n")
+        print(f"文件 '{file_path}' 创建成功并写入内容。")
+    else:
+        print(f"文件 '{file_path}' 已存在，未修改。")
+
+# 读取 `only1_mintmark_class.txt` 中的系列 id
+def load_only1_mintmark_class(paths=DEFAULT_PATHS):
+    try:
+        with open(paths.only1_class_file, 'r', encoding='utf-8-sig') as f:
+            only1_mintmark_class = set(line.strip() for line in f if line.strip())
+        return only1_mintmark_class
+    except FileNotFoundError:
+        return set()
+
+# 加载用户没有的刻印 id
+def load_missing_mintmark_ids(paths=DEFAULT_PATHS):
+    try:
+        with open(paths.missing_ids_file, 'r', encoding='utf-8-sig') as f:
+            return set(line.strip() for line in f if line.strip())
+    except FileNotFoundError:
+        return set()  # 如果文件不存在，返回一个空集合
+
+
+# 读取已下载数据的版本信息，没有时返回空字典
+def load_download_version(paths=DEFAULT_PATHS):
+    try:
+        with open(paths.version_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+# 先写临时文件再替换，避免留下写了一半的文件
+def write_file_atomically(file_path, data):
+    temp_file = file_path + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+    os.replace(temp_file, file_path)
+
+
+# 下载并保存 JSON 数据的方法：version.json 中 mintmark.json 对应的文件名带有内容哈希，作为数据版本；
+# 版本未变且本地已有数据时跳过下载。原始响应直接保存，不再重新排版。
+# 本地的 CSV 和二进制目录与旧数据一致时只按新旧刻印的差异更新，否则交给 convert_json_to_csv 重新生成。
+# 返回是否下载了新数据
+def download_and_store_json(paths=DEFAULT_PATHS, version_url=VERSION_URL, base_url=MINTMARK_BASE_URL):
+    import urllib.request
+
+    try:
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        req = urllib.request.Request(version_url, headers=headers)
+        response = urllib.request.urlopen(req, timeout=10)
+        version_data = json.load(response)
+
+        files = version_data.get("files", {})
+        resource = files.get("resource", {})
+        config = resource.get("config", {})
+        xml = config.get("xml", {})
+        mintmark_file = xml.get("mintmark.json", "")
+
+        if mintmark_file and os.path.exists(paths.json_file) \
+                and load_download_version(paths).get("mintmark.json") == mintmark_file:
+            print(f"刻印数据已是最新版本（{mintmark_file}），跳过下载。")
+            return False
+
+        mintmark_url = urljoin(base_url, mintmark_file)
+        req = urllib.request.Request(mintmark_url, headers=headers)
+        response = urllib.request.urlopen(req, timeout=10)
+        raw_data = response.read()
+        new_entries = json.loads(raw_data.decode('utf-8-sig')).get("MintMarks", {}).get("MintMark", [])
+
+        # 旧的 CSV 和二进制目录由当前 JSON 生成时才能按差异更新
+        old_entries = None
+        if os.path.exists(paths.data_file) and catalog_is_current(paths):
+            old_entries = load_mintmark_entries(paths)
+
+        write_file_atomically(paths.json_file, raw_data)
+        write_file_atomically(paths.version_file, json.dumps({"mintmark.json": mintmark_file}).encode('utf-8'))
+        print(f"MintMark JSON 数据已保存到文件 {paths.json_file}")
+
+        if old_entries is not None:
+            update_mintmark_rows(old_entries, new_entries, paths)
+        return True
+    except urllib.error.URLError as e:
+        print(f"网络错误：{e}")
+    except json.JSONDecodeError as e:
+        print(f"JSON 解析错误：{e}")
+    except Exception as e:
+        print(f"发生未知错误: {e}")
+    return False
+
+# 计算二进制目录的版本标记：源 JSON 文件和缺失刻印 ID 文件内容的哈希
+def compute_catalog_stamp(paths=DEFAULT_PATHS):
+    digest = hashlib.sha256()
+    for file_path in (paths.json_file, paths.missing_ids_file):
+        digest.update(file_path.encode('utf-8') + b"\0")
+        try:
+            with open(file_path, 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+# 将刻印行写入二进制目录：ID、品质、系列、专属精灵 ID、六项属性等定宽数组，附带版本标记
+def write_catalog(rows, stamp, catalog_file=CATALOG_FILE):
+    attr_values = np.array([[int(num) for num in row["total_attr_value"].split()] for row in rows],
+                           dtype=np.int32).reshape(-1, 6)
+    # 先写临时文件再替换，避免读到写了一半的目录
+    temp_file = catalog_file + ".tmp.npz"
+    np.savez(
+        temp_file,
+        stamp=np.array(stamp),
+        id=np.array([int(row["id"]) for row in rows], dtype=np.int64),
+        quality=np.array([int(row["quality"]) for row in rows], dtype=np.int16),
+        mintmark_class=np.array([int(row["mintmark_class"]) if row["mintmark_class"] != "" else -1
+                                 for row in rows], dtype=np.int32),
+        monster_id=np.array([str(row["monster_id"]) for row in rows], dtype=str),
+        description=np.array([row["description"] for row in rows], dtype=str),
+        attr_values=attr_values,
+        total_sum=np.array([int(row["total_sum"]) for row in rows], dtype=np.int32),
+    )
+    os.replace(temp_file, catalog_file)
+
+
+# 二进制目录是否存在且由当前的 JSON 和缺失刻印 ID 文件生成
+def catalog_is_current(paths=DEFAULT_PATHS):
+    try:
+        with np.load(paths.catalog_file) as data:
+            return str(data["stamp"]) == compute_catalog_stamp(paths)
+    except (FileNotFoundError, OSError, KeyError, ValueError):
+        return False
+
+
+# 读取二进制目录；目录不存在或版本标记与当前 JSON / 缺失刻印 ID 文件不一致时自动重新生成
+# 返回字段名到数组的字典，源 JSON 文件不存在时返回 None
+def load_catalog(paths=DEFAULT_PATHS):
+    if not os.path.exists(paths.json_file):
+        return None
+
+    stamp = compute_catalog_stamp(paths)
+    try:
+        with np.load(paths.catalog_file) as data:
+            if str(data["stamp"]) == stamp:
+                return {key: data[key] for key in data.files}
+    except (FileNotFoundError, OSError, KeyError, ValueError):
+        pass
+
+    print("二进制刻印目录不存在或已过期，正在重新生成...")
+    convert_json_to_csv(paths)
+    try:
+        with np.load(paths.catalog_file) as data:
+            return {key: data[key] for key in data.files}
+    except (FileNotFoundError, OSError, KeyError, ValueError):
+        return None
+
+
+# 将二进制目录还原为与 CSV 文件相同格式的刻印列表（每行一个字典，值均为字符串）
+def catalog_to_mintmark_list(catalog):
+    return catalog_to_mintmark_table(catalog).to_mintmark_list()
+
+
+# 读取 JSON 文件中的 MintMark 列表，文件不存在或无法解析时返回空列表
+def load_mintmark_entries(paths=DEFAULT_PATHS):
+    try:
+        with open(paths.json_file, 'r', encoding='utf-8-sig') as f:
+            mintmark_data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return mintmark_data.get("MintMarks", {}).get("MintMark", [])
+
+
+# 将 JSON 中的一个刻印转换为 CSV 的一行；不是刻印（Type 不为 3）或在缺失 ID 列表中时返回 None
+def mintmark_to_row(mintmark, missing_mintmark_ids):
+    if mintmark.get("Type", 0) != 3:
+        return None
+
+    # 获取刻印的 ID
+    id = mintmark.get("ID", 0)
+    id_str = str(id)
+    # 如果该刻印在缺失 ID 列表中，跳过
+    if id_str in missing_mintmark_ids:
+        return None
+    quality = mintmark.get("Quality", 0)
+    description = mintmark.get("Des", "")
+    monster_id = mintmark.get("MonsterID", "")
+    mintmark_class = mintmark.get("MintmarkClass", "")
+
+    max_attr_value = mintmark.get("MaxAttriValue", "")
+    extra_attr_value = mintmark.get("ExtraAttriValue", "")
+    max_values = [int(num) for num in max_attr_value.split()]
+    extra_values = [int(num) for num in extra_attr_value.split()] if extra_attr_value else [0] * len(
+        max_values)
+    total_values = [max_val + extra_val for max_val, extra_val in zip(max_values, extra_values)]
+    total_attr_value = " ".join(map(str, total_values))
+    total_sum = sum(total_values)
+
+    return {
+        "id": id,
+        "quality": quality,
+        "description": description,
+        "total_attr_value": total_attr_value,
+        "total_sum": total_sum,
+        "monster_id": monster_id,
+        "mintmark_class": mintmark_class
+    }
+
+
+# 将刻印行写入 CSV 文件和二进制目录（二进制目录只保留六项属性齐全的刻印），并刷新限1刻印 ID 文件
+def write_mintmark_rows(rows, paths=DEFAULT_PATHS, stamp=None):
+    stamp = stamp or compute_catalog_stamp(paths)
+
+    # 写入到 CSV 文件
+    with open(paths.data_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=MINTMARK_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"MintMark 数据已保存到文件 {paths.data_file}")
+
+    write_catalog([row for row in rows if len(row["total_attr_value"].split()) == 6], stamp, paths.catalog_file)
+    print(f"二进制刻印目录已保存到文件 {paths.catalog_file}")
+
+    refresh_only1_mintmark_ids(rows, paths)
+
+
+# 比较新旧 MintMark 列表，返回新增、删除和内容有变化的刻印 ID
+def diff_mintmarks(old_entries, new_entries):
+    old = {entry.get("ID"): entry for entry in old_entries}
+    new = {entry.get("ID"): entry for entry in new_entries}
+    return {
+        "added": [id for id in new if id not in old],
+        "removed": [id for id in old if id not in new],
+        "changed": [id for id in new if id in old and new[id] != old[id]],
+    }
+
+
+# 按新旧刻印的差异更新 CSV、二进制目录和限1刻印 ID 文件：只重新转换新增和有变化的刻印，
+# 其余刻印沿用现有 CSV 中的行，行的顺序与 JSON 中一致（与完整重新生成的结果相同）。返回差异
+def update_mintmark_rows(old_entries, new_entries, paths=DEFAULT_PATHS):
+    diff = diff_mintmarks(old_entries, new_entries)
+    print(f"刻印数据变化：新增 {len(diff['added'])} 个，删除 {len(diff['removed'])} 个，修改 {len(diff['changed'])} 个")
+
+    existing_rows = {row["id"]: row for row in load_mintmark_list(paths.data_file)}
+    updated_ids = set(diff["added"]) | set(diff["changed"])
+    if not updated_ids and not diff["removed"] and [entry.get("ID") for entry in old_entries] == \
+            [entry.get("ID") for entry in new_entries]:
+        # 内容没有变化，只需更新二进制目录的版本标记
+        write_catalog([row for row in existing_rows.values() if len(row["total_attr_value"].split()) == 6],
+                      compute_catalog_stamp(paths), paths.catalog_file)
+        return diff
+
+    missing_mintmark_ids = load_missing_mintmark_ids(paths)
+    rows = []
+    for mintmark in new_entries:
+        id = mintmark.get("ID", 0)
+        if id in updated_ids:
+            try:
+                row = mintmark_to_row(mintmark, missing_mintmark_ids)
+            except (KeyError, ValueError):
+                continue
+        else:
+            row = existing_rows.get(str(id))
+        if row is not None:
+            rows.append(row)
+
+    write_mintmark_rows(rows, paths)
+    return diff
+
+
+# 更新 JSON 数据为 CSV 文件的方法，同时生成二进制刻印目录
+def convert_json_to_csv(paths=DEFAULT_PATHS):
+    try:
+        # 加载用户缺失的刻印 ID
+        missing_mintmark_ids = load_missing_mintmark_ids(paths)  # 加载缺失的刻印 ID
+        stamp = compute_catalog_stamp(paths)
+
+        # 打开 JSON 文件读取数据
+        with open(paths.json_file, 'r', encoding='utf-8-sig') as f:
+            mintmark_data = json.load(f)
+
+        MintMarks = mintmark_data.get("MintMarks", {})
+        MintMark = MintMarks.get("MintMark", [])
+
+        rows = []
+        for mintmark in MintMark:
+            try:
+                row = mintmark_to_row(mintmark, missing_mintmark_ids)
+            except (KeyError, ValueError):
+                continue
+            if row is not None:
+                rows.append(row)
+
+        write_mintmark_rows(rows, paths, stamp)
+    except Exception as e:
+        print(f"转换 JSON 数据到 CSV 时发生错误: {e}")
+
+def ensure_data_prepared(paths=DEFAULT_PATHS):
+    """
+    确保 JSON 数据已经下载并且成功转换为 CSV。
+    """
+    # 检查 JSON 文件是否存在，如果不存在则下载数据
+    if not os.path.exists(paths.json_file):
+        print("JSON 文件不存在，正在下载 JSON 数据...")
+        download_and_store_json(paths)
+
+    # 检查 CSV 文件是否存在，如果 JSON 已存在但 CSV 未生成，则生成 CSV
+    if os.path.exists(paths.json_file) and not os.path.exists(paths.data_file):
+        print("CSV 文件不存在，从 JSON 生成 CSV 文件...")
+        convert_json_to_csv(paths)
+
+
+
+# 加载限1刻印的 id（数据由 prepare_data 准备，这里只读取文件）
+def load_only1_mintmark_ids(paths=DEFAULT_PATHS):
+    try:
+        with open(paths.only1_ids_file, 'r', encoding='utf-8-sig') as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+# 读取 csv 文件并生成限1刻印的 id 文件
+def generate_only1_mintmark_ids(paths=DEFAULT_PATHS):
+    # 确保数据已经被下载和准备
+    ensure_data_prepared(paths)
+
+    if os.path.exists(paths.data_file):
+        only1_mintmark_class = load_only1_mintmark_class(paths)
+        with open(paths.data_file, 'r', encoding='utf-8-sig') as csvfile:
+            reader = csv.DictReader(csvfile)
+            filtered_rows = []
+
+            # 过滤 mintmark_class 在限1刻印系列中的行
+            for row in reader:
+                if row['mintmark_class'] in only1_mintmark_class:
+                    filtered_rows.append(row['id'])
+
+            # 写入到新的 txt 文件，每行一个 id
+            if filtered_rows:
+                if not os.path.exists(paths.only1_ids_file):
+                    with open(paths.only1_ids_file, 'w', newline='', encoding='utf-8-sig') as txtfile:
+                        for row_id in filtered_rows:
+                            txtfile.write(row_id + "\n")
+                    print(f"文件 '{paths.only1_ids_file}' 创建成功并写入限1刻印的 id 数据。")
+                else:
+                    print(f"文件 '{paths.only1_ids_file}' 已存在，未修改。")
+            else:
+                print("没有匹配到任何限1刻印的数据。")
+    else:
+        print(f"文件 '{paths.data_file}' 不存在，请检查路径。")
+
+# 根据刻印行刷新已有的限1刻印 ID 文件，内容不变时不改写；文件不存在时由 generate_only1_mintmark_ids 生成
+def refresh_only1_mintmark_ids(rows, paths=DEFAULT_PATHS):
+    if not os.path.exists(paths.only1_ids_file):
+        return
+    only1_mintmark_class = load_only1_mintmark_class(paths)
+    only1_ids = [str(row["id"]) for row in rows if str(row["mintmark_class"]) in only1_mintmark_class]
+    if only1_ids != load_only1_mintmark_ids(paths):
+        with open(paths.only1_ids_file, 'w', newline='', encoding='utf-8-sig') as txtfile:
+            for row_id in only1_ids:
+                txtfile.write(row_id + "\n")
+        print(f"文件 '{paths.only1_ids_file}' 已按新的刻印数据更新。")
+
+# 创建缺失的刻印 ID 文件
+def create_missing_mintmark_ids_file(paths=DEFAULT_PATHS):
+    if not os.path.exists(paths.missing_ids_file):
+        with open(paths.missing_ids_file, 'w', encoding='utf-8') as file:
+            file.write("# 请输入您没有（或者不想用）的刻印 ID，每个 ID 占一行。并且在输入之后点击“更新刻印文件”按钮。\n")
+        print(f"文件 '{paths.missing_ids_file}' 已创建。")
+    else:
+        print(f"文件 '{paths.missing_ids_file}' 已存在，未修改。")
+
+
+# 启动时准备全部数据文件：创建数据文件夹、限1系列文件和缺失刻印 ID 文件，下载并转换刻印数据，生成限1刻印 ID 文件。
+# 缺失刻印 ID 文件参与二进制目录的版本标记，必须在转换之前创建，否则首次安装时生成的目录会立即过期
+def prepare_data(paths=DEFAULT_PATHS):
+    os.makedirs(paths.folder, exist_ok=True)
+    write_content_to_file(paths.only1_class_file, content)
+    create_missing_mintmark_ids_file(paths)  # 创建缺失刻印 ID 文件
+    ensure_data_prepared(paths)  # 确保 JSON 和 CSV 数据已准备好
+    generate_only1_mintmark_ids(paths)  # 生成限1刻印的 ID 文件
+
+
+
+
+# 刻印表：每个字段一列数组，每次读取刻印目录时构建一次，供各个过滤阶段和组合搜索共用，查询中不再解析字符串。
+# 只包含能够解析的刻印（六项属性、ID 和总和都是整数）；系列编码和名称编码在整张表上计算，取子表后依然可以直接比较
+class MintmarkTable:
+    def __init__(self, ids, qualities, descriptions, mintmark_classes, monster_ids, total_sums, attr_values,
+                 class_codes=None, description_codes=None):
+        self.ids = ids
+        self.qualities = qualities
+        self.descriptions = descriptions
+        self.mintmark_classes = mintmark_classes
+        self.monster_ids = monster_ids
+        self.total_sums = total_sums
+        self.attr_values = attr_values
+        # 系列编码：相同系列（包括空系列）得到相同的整数编码
+        if class_codes is None:
+            class_codes = np.unique(mintmark_classes, return_inverse=True)[1].astype(np.int32).reshape(-1)
+        if description_codes is None:
+            description_codes = np.unique(descriptions.astype(str), return_inverse=True)[1].reshape(-1)
+        self.class_codes = class_codes
+        self.description_codes = description_codes
+
+    def __len__(self):
+        return len(self.ids)
+
+    # 按下标（按给出的顺序）取出子表
+    def subset(self, indices):
+        return MintmarkTable(self.ids[indices], self.qualities[indices], self.descriptions[indices],
+                             self.mintmark_classes[indices], self.monster_ids[indices], self.total_sums[indices],
+                             self.attr_values[indices], self.class_codes[indices], self.description_codes[indices])
+
+    # 还原为与 CSV 文件相同格式的刻印列表（每行一个字典，值均为字符串）
+    def to_mintmark_list(self):
+        columns = zip(self.ids.tolist(), self.qualities.tolist(), self.descriptions.tolist(),
+                      self.attr_values.tolist(), self.total_sums.tolist(), self.monster_ids.tolist(),
+                      self.mintmark_classes.tolist())
+        return [
+            {
+                "id": str(id),
+                "quality": quality,
+                "description": description,
+                "total_attr_value": " ".join(map(str, attr_values)),
+                "total_sum": str(total_sum),
+                "monster_id": monster_id,
+                "mintmark_class": mintmark_class,
+            }
+            for id, quality, description, attr_values, total_sum, monster_id, mintmark_class in columns
+        ]
+
+
+# 由刻印列表（每行一个字典，值为字符串）构建刻印表，无法解析的刻印被跳过
+def build_mintmark_table(mintmark_list):
+    ids, qualities, descriptions, mintmark_classes, monster_ids, total_sums, attr_values_list = \
+        [], [], [], [], [], [], []
+
+    for mintmark in mintmark_list:
+        try:
+            total_attr_values = [int(num) for num in mintmark["total_attr_value"].split()]
+            if len(total_attr_values) != 6:
+                continue
+            mintmark_id = int(mintmark["id"])
+            total_sum = int(mintmark["total_sum"])
+        except ValueError:
+            continue
+
+        attr_values_list.append(total_attr_values)
+        ids.append(mintmark_id)
+        total_sums.append(total_sum)
+        qualities.append(str(mintmark["quality"]))
+        descriptions.append(mintmark["description"])
+        mintmark_classes.append(str(mintmark["mintmark_class"]))
+        monster_ids.append(str(mintmark.get("monster_id") or ""))
+
+    return MintmarkTable(
+        np.array(ids, dtype=np.int64), np.array(qualities, dtype=str), np.array(descriptions, dtype=object),
+        np.array(mintmark_classes, dtype=str), np.array(monster_ids, dtype=str),
+        np.array(total_sums, dtype=np.int64), np.array(attr_values_list, dtype=np.int32).reshape(-1, 6))
+
+
+# 由二进制目录直接构建刻印表，不经过字符串
+def catalog_to_mintmark_table(catalog):
+    mintmark_classes = catalog["mintmark_class"]
+    return MintmarkTable(
+        catalog["id"].astype(np.int64), catalog["quality"].astype(str), catalog["description"].astype(object),
+        np.where(mintmark_classes == -1, "", mintmark_classes.astype(str)), catalog["monster_id"].astype(str),
+        catalog["total_sum"].astype(np.int64), catalog["attr_values"].astype(np.int32).reshape(-1, 6))
+
+
+# 刻印表原样返回，刻印列表转换为刻印表
+def as_mintmark_table(mintmarks):
+    if isinstance(mintmarks, MintmarkTable):
+        return mintmarks
+    return build_mintmark_table(mintmarks)
+
+
+# 将刻印表（或刻印列表）整理为 NumPy 数组：ID、描述、系列编码和 (n, 6) 的属性矩阵
+def build_mintmark_arrays(mintmarks):
+    table = as_mintmark_table(mintmarks)
+    return table.ids, table.descriptions, table.class_codes, table.attr_values
+
+
+# 一次查询的分阶段耗时（秒）和计数，可写入 JSON Lines 日志
+class QueryMetrics:
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.counters = OrderedDict()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def as_dict(self):
+        return {"timings": {name: round(seconds, 6) for name, seconds in self.timings.items()},
+                "counters": dict(self.counters)}
+
+    # 状态栏显示的一行摘要
+    def summary(self):
+        parts = ["耗时 " + "，".join(f"{STAGE_LABELS.get(name, name)} {seconds * 1000:.0f}ms"
+                                     for name, seconds in self.timings.items())]
+        for title, labels in (("淘汰刻印", MINTMARK_REJECTION_LABELS), ("淘汰组合", COMBINATION_REJECTION_LABELS)):
+            counted = [f"{label} {self.counters[name]}" for name, label in labels.items() if name in self.counters]
+            if counted:
+                parts.append(f"{title} " + "，".join(counted))
+        return "  |  ".join(parts)
+
+
+# 未传入 metrics 时不计时
+def _metric_stage(metrics, name):
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+
+# 多个线程共用同一个日志文件时的写入锁
+_metrics_log_lock = threading.Lock()
+
+
+# 将一次查询的参数、结果数和各阶段计数追加到 JSON Lines 日志文件
+def write_metrics_log(log_file, query, stats, metrics):
+    record = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "query": normalize_query(query),
+        "stats": {key: value for key, value in stats.items() if key != "metrics"},
+    }
+    record.update(metrics.as_dict())
+    with _metrics_log_lock:
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# 在 cProfile 下执行一次调用，统计结果保存到 profile_path，并打印累计耗时最多的函数
+def profile_call(profile_path, function, *args, **kwargs):
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(profile_path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        print(f"性能分析结果已保存到文件 {profile_path}")
+
+
+# 统计组合规则淘汰的三元组数量（按 iter_structural_combinations 中规则的先后顺序，不枚举全部三元组），
+# 返回 (各规则淘汰的数量, 通过全部规则的三元组数量)
+def count_rule_rejections(ids, class_codes, only1_mask, symmetric=False):
+    n = len(ids)
+    class_sizes = [int(size) for size in np.unique(class_codes, return_counts=True)[1]]
+    counts = OrderedDict([("triples", comb(n + 2, 3)), ("same_mintmark", n),
+                          ("same_class", sum(comb(size + 2, 3) - size for size in class_sizes)),
+                          ("symmetric", 0), ("only1_duplicate", 0)])
+    remaining = counts["triples"] - counts["same_mintmark"] - counts["same_class"]
+
+    # 对称时只保留 (a, a, b) 形式且 a、b 不同系列的组合
+    if symmetric:
+        pairs = n * (n - 1) - sum(size * (size - 1) for size in class_sizes)
+        counts["symmetric"] = remaining - pairs
+        remaining = pairs
+
+    only1_indices = np.nonzero(only1_mask)[0]
+    if len(np.unique(ids[only1_indices])) == len(only1_indices):
+        # ID 不重复时只有 (a, a, b) 会重复限1 ID，其中 b 与 a 同系列的已被前面的规则淘汰
+        _, class_index, class_counts = np.unique(class_codes, return_inverse=True, return_counts=True)
+        counts["only1_duplicate"] = int((n - class_counts[class_index[only1_indices]]).sum())
+    else:
+        # 有重复 ID 时逐个列出包含重复限1 ID 的三元组
+        triples = []
+        for a in only1_indices:
+            for b in only1_indices[(only1_indices >= a) & (ids[only1_indices] == ids[a])]:
+                triples.append(np.sort(np.column_stack((np.full(n, a), np.full(n, b), np.arange(n))), axis=1))
+        first, second, third = np.unique(np.concatenate(triples), axis=0).T
+        keep = ~((class_codes[first] == class_codes[second]) & (class_codes[second] == class_codes[third]))
+        if symmetric:
+            keep &= (first == second) != (second == third)
+        counts["only1_duplicate"] = int(keep.sum())
+    remaining -= counts["only1_duplicate"]
+    return counts, remaining
+
+
+# 搜索被取消时由 progress_callback 抛出
+class SearchCancelled(Exception):
+    pass
+
+
+# 向 progress_callback 报告进度：已处理的第一枚刻印数、总数，以及自上次报告以来新找到的组合块
+# mapping 用于把重排后的下标映射回原始下标；返回已报告的组合块数
+def _report_progress(progress_callback, done, total, found, reported, mapping=None):
+    if progress_callback is None:
+        return reported
+    blocks = found[reported:]
+    if mapping is not None:
+        blocks = [mapping[block] for block in blocks]
+    progress_callback(done, total, blocks)
+    return len(found)
+
+
+# 将属性范围整理为 (属性下标, 下限, 上限) 的列表
+def _attribute_bounds(attribute_targets):
+    return [
+        (attr_index, target_min, target_max)
+        for attr_index, (target_min, target_max) in attribute_targets.items()
+    ]
+
+
+# 检查第一枚刻印为 i、第二枚取自 j_indices、第三枚取自 k_indices（且 k >= j）的一块三元组
+# 返回满足属性范围和系列规则的组合，按 (j, k) 的先后顺序排列
+def _search_block(attr_values, ids, class_codes, only1_mask, bounds, symmetric, i, j_indices, k_indices):
+    # 仅保留 k >= j 的位置，与 combinations_with_replacement 一致
+    mask = k_indices[None, :] >= j_indices[:, None]
+    for attr_index, target_min, target_max in bounds:
+        column = attr_values[:, attr_index]
+        sums = (column[i] + column[j_indices])[:, None] + column[k_indices][None, :]
+        if target_min != float('-inf'):
+            mask &= sums >= target_min
+        if target_max != float('inf'):
+            mask &= sums <= target_max
+
+    jj, kk = np.nonzero(mask)
+    if len(jj) == 0:
+        return None
+    j_sel = j_indices[jj]
+    k_sel = k_indices[kk]
+
+    # 排除三个刻印来自同一系列的组合（包括同一刻印出现三次）
+    keep = ~((class_codes[j_sel] == class_codes[i]) & (class_codes[k_sel] == class_codes[i]))
+
+    # 对称：恰好有两个相同的刻印
+    if symmetric:
+        keep &= (j_sel == i) != (k_sel == j_sel)
+
+    # 限1刻印的 ID 不能重复出现
+    keep &= ~((ids[j_sel] == ids[i]) & only1_mask[i])
+    keep &= ~((ids[k_sel] == ids[j_sel]) & only1_mask[j_sel])
+    keep &= ~((ids[k_sel] == ids[i]) & only1_mask[i])
+
+    if not keep.any():
+        return None
+    count = int(keep.sum())
+    return np.column_stack((np.full(count, i), j_sel[keep], k_sel[keep]))
+
+
+# 以块为单位枚举 i <= j <= k 的三元组，按生成顺序返回满足属性范围和系列规则的组合
+# first_range=(start, stop) 时只枚举第一枚刻印下标在该范围内的三元组
+def search_combinations_numpy(attr_values, ids, class_codes, only1_mask, attribute_targets, symmetric=False,
+                              progress_callback=None, first_range=None):
+    n = len(ids)
+    found = []
+    reported = 0
+    bounds = _attribute_bounds(attribute_targets)
+
+    for i in range(*(first_range or (0, n))):
+        reported = _report_progress(progress_callback, i, n, found, reported)
+        k_indices = np.arange(i, n)
+        rows_per_block = max(1, SEARCH_BLOCK_SIZE // len(k_indices))
+
+        for start in range(i, n, rows_per_block):
+            j_indices = np.arange(start, min(start + rows_per_block, n))
+            block = _search_block(attr_values, ids, class_codes, only1_mask, bounds, symmetric,
+                                  i, j_indices, k_indices)
+            if block is not None:
+                found.append(block)
+    _report_progress(progress_callback, n, n, found, reported)
+
+    if not found:
+        return np.empty((0, 3), dtype=np.int64)
+    return np.concatenate(found)
+
+
+# 精确的分支定界搜索：结果与完整枚举一致，但会提前剪掉不可能满足属性范围的部分组合
+# 先按受限属性之和从大到小重排刻印，再预先计算每个位置之后剩余刻印在各属性上的最大/最小值；
+# 已选刻印的属性和加上剩余刻印的最好（最差）贡献仍达不到下限（必然超过上限）时直接剪枝
+# first_range=(start, stop) 时只处理重排后第一枚刻印位置在该范围内的三元组
+def search_combinations_branch_bound(attr_values, ids, class_codes, only1_mask, attribute_targets, symmetric=False,
+                                     progress_callback=None, first_range=None):
+    n = len(ids)
+    bounds = _attribute_bounds(attribute_targets)
+    if n == 0 or not bounds:
+        return search_combinations_numpy(attr_values, ids, class_codes, only1_mask, attribute_targets,
+                                          symmetric=symmetric, progress_callback=progress_callback,
+                                          first_range=first_range)
+
+    # 受限属性之和大的刻印排在前面，使后缀最大值尽快下降
+    sort_key = np.zeros(n, dtype=np.int64)
+    for attr_index, target_min, target_max in bounds:
+        if target_min > 0:
+            sort_key += attr_values[:, attr_index]
+    order = np.argsort(-sort_key, kind='stable')
+
+    values = attr_values[order]
+    sorted_ids = ids[order]
+    sorted_classes = class_codes[order]
+    sorted_only1 = only1_mask[order]
+
+    # suffix_max[p] / suffix_min[p]：位置 p 及之后的刻印在各属性上的最大/最小值
+    suffix_max = np.maximum.accumulate(values[::-1], axis=0)[::-1]
+    suffix_min = np.minimum.accumulate(values[::-1], axis=0)[::-1]
+
+    found = []
+    reported = 0
+    for i in range(*(first_range or (0, n))):
+        reported = _report_progress(progress_callback, i, n, found, reported, mapping=order)
+
+        # 三枚刻印都取自位置 i 之后：若连最好情况都不满足，后续位置也不可能满足
+        if any(
+            (target_min != float('-inf') and 3 * suffix_max[i, attr_index] < target_min) or
+            (target_max != float('inf') and 3 * suffix_min[i, attr_index] > target_max)
+            for attr_index, target_min, target_max in bounds
+        ):
+            break
+
+        # 第一层：已选 i，剩余两枚取自位置 i 之后
+        if any(
+            (target_min != float('-inf') and values[i, attr_index] + 2 * suffix_max[i, attr_index] < target_min) or
+            (target_max != float('inf') and values[i, attr_index] + 2 * suffix_min[i, attr_index] > target_max)
+            for attr_index, target_min, target_max in bounds
+        ):
+            continue
+
+        # 第二层：已选 i 和 j，剩余一枚取自位置 j 之后
+        j_indices = np.arange(i, n)
+        keep = np.ones(len(j_indices), dtype=bool)
+        for attr_index, target_min, target_max in bounds:
+            partial = values[i, attr_index] + values[j_indices, attr_index]
+            if target_min != float('-inf'):
+                keep &= partial + suffix_max[j_indices, attr_index] >= target_min
+            if target_max != float('inf'):
+                keep &= partial + suffix_min[j_indices, attr_index] <= target_max
+        j_indices = j_indices[keep]
+        if len(j_indices) == 0:
+            continue
+
+        rows_per_block = max(1, SEARCH_BLOCK_SIZE // (n - j_indices[0]))
+        for start in range(0, len(j_indices), rows_per_block):
+            j_block = j_indices[start:start + rows_per_block]
+            block = _search_block(values, sorted_ids, sorted_classes, sorted_only1, bounds, symmetric,
+                                  i, j_block, np.arange(j_block[0], n))
+            if block is not None:
+                found.append(block)
+    _report_progress(progress_callback, n, n, found, reported, mapping=order)
+
+    if not found:
+        return np.empty((0, 3), dtype=np.int64)
+
+    # 映射回原始下标，并恢复 combinations_with_replacement 的生成顺序
+    combinations = np.sort(order[np.concatenate(found)], axis=1)
+    generation_order = np.lexsort((combinations[:, 2], combinations[:, 1], combinations[:, 0]))
+    return combinations[generation_order]
+
+
+# 对称模式下直接构造 (a, a, b) 形式的组合，只需 O(n²) 次检查，结果与完整枚举后筛选一致：
+# 重复的刻印 a 不能是限1刻印（限1刻印不与自身配对），b 取自与 a 不同系列的刻印（按系列分组后跳过 a 所在的组），
+# 这样三枚同系列和限1重复的组合从一开始就不会生成。返回按 combinations_with_replacement 生成顺序排列的组合
+def search_combinations_symmetric(attr_values, ids, class_codes, only1_mask, attribute_targets,
+                                  progress_callback=None, first_range=None):
+    n = len(ids)
+    bounds = _attribute_bounds(attribute_targets)
+    by_class = np.argsort(class_codes, kind='stable')
+    sorted_classes = class_codes[by_class]
+    group_starts = np.searchsorted(sorted_classes, class_codes, side='left')
+    group_stops = np.searchsorted(sorted_classes, class_codes, side='right')
+
+    found = []
+    reported = 0
+    for a in range(*(first_range or (0, n))):
+        reported = _report_progress(progress_callback, a, n, found, reported)
+        if only1_mask[a]:
+            continue
+        others = np.concatenate([by_class[:group_starts[a]], by_class[group_stops[a]:]])
+        for attr_index, target_min, target_max in bounds:
+            if len(others) == 0:
+                break
+            sums = 2 * attr_values[a, attr_index] + attr_values[others, attr_index]
+            keep = np.ones(len(others), dtype=bool)
+            if target_min != float('-inf'):
+                keep &= sums >= target_min
+            if target_max != float('inf'):
+                keep &= sums <= target_max
+            others = others[keep]
+        if len(others):
+            found.append(np.sort(np.column_stack((np.full(len(others), a), np.full(len(others), a), others)),
+                                 axis=1))
+    _report_progress(progress_callback, n, n, found, reported)
+
+    if not found:
+        return np.empty((0, 3), dtype=np.int64)
+    combinations = np.concatenate(found)
+    generation_order = np.lexsort((combinations[:, 2], combinations[:, 1], combinations[:, 0]))
+    return combinations[generation_order]
+
+
+# 按第一枚刻印的下标把三元组空间切分为工作量相近的连续分片，返回 [(start, stop), ...]
+# 第一枚刻印为 i 时剩余 (j, k) 的组合数为 m(m + 1) / 2（m = n - i），靠前的下标工作量大得多
+def balanced_shards(n, shard_count):
+    if n == 0:
+        return []
+    remaining = n - np.arange(n, dtype=np.float64)
+    cumulative = np.cumsum(remaining * (remaining + 1) / 2)
+    targets = cumulative[-1] * np.arange(1, max(1, shard_count)) / shard_count
+    edges = sorted(set([0, n] + (np.searchsorted(cumulative, targets) + 1).tolist()))
+    return [(start, stop) for start, stop in zip(edges, edges[1:]) if start < stop]
+
+
+# 并行搜索子进程中的刻印数据，由进程初始化函数设置一次，之后的分片任务只传递下标范围
+_shard_context = {}
+
+
+def _init_shard_worker(attr_values, ids, class_codes, only1_mask, attribute_targets, symmetric, engine):
+    _shard_context.update(attr_values=attr_values, ids=ids, class_codes=class_codes, only1_mask=only1_mask,
+                          attribute_targets=attribute_targets, symmetric=symmetric, engine=engine)
+
+
+def _search_shard(first_range):
+    context = dict(_shard_context)
+    engine = context.pop("engine")
+    search = search_combinations_branch_bound if engine == "branch_bound" else search_combinations_numpy
+    return search(first_range=first_range, **context)
+
+
+# 多进程分片搜索：把第一枚刻印的下标空间切成工作量均衡的分片，交给进程池并行处理，
+# 合并后恢复生成顺序，结果与单进程搜索完全一致
+def search_combinations_parallel(attr_values, ids, class_codes, only1_mask, attribute_targets, symmetric=False,
+                                 engine="numpy", workers=None, progress_callback=None):
+    n = len(ids)
+    workers = workers or os.cpu_count() or 1
+    shards = balanced_shards(n, workers * SHARDS_PER_WORKER)
+    found = []
+    done = 0
+
+    # 使用 spawn 启动子进程，避免在 Qt 后台线程中 fork
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_shard_worker,
+                                   initargs=(attr_values, ids, class_codes, only1_mask, attribute_targets, symmetric,
+                                             engine))
+    try:
+        futures = {executor.submit(_search_shard, shard): shard for shard in shards}
+        for future in as_completed(futures):
+            start, stop = futures[future]
+            block = future.result()
+            done += stop - start
+            if len(block):
+                found.append(block)
+            if progress_callback is not None:
+                progress_callback(done, n, [block] if len(block) else [])
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if not found:
+        return np.empty((0, 3), dtype=np.int64)
+    combinations = np.sort(np.concatenate(found), axis=1)
+    generation_order = np.lexsort((combinations[:, 2], combinations[:, 1], combinations[:, 0]))
+    return combinations[generation_order]
+
+
+# 三刻印组合的配对和索引（meet-in-the-middle）
+# 预先计算所有 j <= k 的配对属性和，并按受限最严的属性排序；
+# 查询时对每个第一枚刻印 i 用二分查找取出剩余范围内的配对，再检查其它属性和系列规则
+class PairSumIndex:
+    def __init__(self, attr_values, ids, class_codes, only1_mask):
+        self.attr_values = attr_values
+        self.ids = ids
+        self.class_codes = class_codes
+        self.only1_mask = only1_mask
+
+        first, second = np.triu_indices(len(ids))
+        # 限1刻印不能与相同 ID 的刻印配对
+        keep = ~((ids[first] == ids[second]) & only1_mask[first])
+        self.first = first[keep]
+        self.second = second[keep]
+        self.same_class = class_codes[self.first] == class_codes[self.second]
+        self.pair_sums = attr_values[self.first] + attr_values[self.second]
+
+        # 按属性缓存排序结果：attr_index -> (配对下标, 排序后的配对和)
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.first)
+
+    def sorted_on(self, attr_index):
+        if attr_index not in self._sorted:
+            order = np.argsort(self.pair_sums[:, attr_index], kind='stable')
+            self._sorted[attr_index] = (order, self.pair_sums[order, attr_index])
+        return self._sorted[attr_index]
+
+    # 选出限制最严的属性：有效区间占三枚刻印可达范围的比例最小
+    def choose_key_attribute(self, attribute_targets):
+        best_attr, best_ratio = None, None
+        for attr_index, (target_min, target_max) in attribute_targets.items():
+            column = self.attr_values[:, attr_index]
+            if len(column) == 0:
+                return attr_index
+            low, high = 3 * int(column.min()), 3 * int(column.max())
+            effective_min = max(target_min, low)
+            effective_max = min(target_max, high)
+            ratio = (effective_max - effective_min + 1) / (high - low + 1)
+            if best_ratio is None or ratio < best_ratio:
+                best_attr, best_ratio = attr_index, ratio
+        return best_attr
+
+    # 返回满足属性范围和系列规则的组合 (i, j, k)，按 combinations_with_replacement 的生成顺序
+    def query(self, attribute_targets, symmetric=False, progress_callback=None):
+        n = len(self.ids)
+        key_attr = self.choose_key_attribute(attribute_targets)
+        if key_attr is None:
+            order, sorted_sums = np.arange(len(self.first)), None
+        else:
+            order, sorted_sums = self.sorted_on(key_attr)
+            key_min, key_max = attribute_targets[key_attr]
+
+        other_bounds = [
+            (attr_index, target_min, target_max)
+            for attr_index, (target_min, target_max) in attribute_targets.items()
+            if attr_index != key_attr
+        ]
+
+        found = []
+        reported = 0
+        for i in range(n):
+            reported = _report_progress(progress_callback, i, n, found, reported)
+            if sorted_sums is None:
+                pairs = order
+            else:
+                # 第三枚刻印之外，配对和需要落在 [下限 - A[i], 上限 - A[i]] 内
+                value = int(self.attr_values[i, key_attr])
+                start = 0 if key_min == float('-inf') else np.searchsorted(sorted_sums, key_min - value, 'left')
+                stop = len(sorted_sums) if key_max == float('inf') else np.searchsorted(sorted_sums, key_max - value,
+                                                                                       'right')
+                if start >= stop:
+                    continue
+                pairs = order[start:stop]
+
+            pairs = pairs[self.first[pairs] >= i]
+            for attr_index, target_min, target_max in other_bounds:
+                if len(pairs) == 0:
+                    break
+                sums = self.attr_values[i, attr_index] + self.pair_sums[pairs, attr_index]
+                keep = np.ones(len(pairs), dtype=bool)
+                if target_min != float('-inf'):
+                    keep &= sums >= target_min
+                if target_max != float('inf'):
+                    keep &= sums <= target_max
+                pairs = pairs[keep]
+            if len(pairs) == 0:
+                continue
+
+            j_sel = self.first[pairs]
+            k_sel = self.second[pairs]
+
+            # 排除三个刻印来自同一系列的组合
+            keep = ~(self.same_class[pairs] & (self.class_codes[j_sel] == self.class_codes[i]))
+            if symmetric:
+                keep &= (j_sel == i) != (k_sel == j_sel)
+            if self.only1_mask[i]:
+                keep &= (self.ids[j_sel] != self.ids[i]) & (self.ids[k_sel] != self.ids[i])
+
+            if keep.any():
+                count = int(keep.sum())
+                found.append(np.column_stack((np.full(count, i), j_sel[keep], k_sel[keep])))
+        _report_progress(progress_callback, n, n, found, reported)
+
+        if not found:
+            return np.empty((0, 3), dtype=np.int64)
+        combinations = np.concatenate(found)
+        # 恢复生成顺序，保证排序中相同 ID 的先后关系与原实现一致
+        order = np.lexsort((combinations[:, 2], combinations[:, 1], combinations[:, 0]))
+        return combinations[order]
+
+
+# 配对和索引的缓存：候选刻印完全相同的查询共用同一个索引（LRU），可在多个线程中共用
+class PairIndexCache:
+    def __init__(self, max_entries=PAIR_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def get(self, attr_values, ids, class_codes, only1_mask):
+        digest = hashlib.sha256()
+        for array in (attr_values, ids, class_codes, only1_mask):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        key = digest.hexdigest()
+
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+            else:
+                self._indexes[key] = PairSumIndex(attr_values, ids, class_codes, only1_mask)
+                while len(self._indexes) > self.max_entries:
+                    self._indexes.popitem(last=False)
+            return self._indexes[key]
+
+
+# 将组合内按 ID 从大到小排列，并对全部组合按 ID 元组从大到小排序（稳定排序，保持与原实现一致）
+def sort_combinations_by_id(combinations, ids):
+    if len(combinations) == 0:
+        return combinations
+    order = np.argsort(-ids[combinations], axis=1, kind='stable')
+    combinations = np.take_along_axis(combinations, order, axis=1)
+    combination_ids = ids[combinations]
+    order = np.lexsort((-combination_ids[:, 2], -combination_ids[:, 1], -combination_ids[:, 0]))
+    return combinations[order]
+
+
+# 将结果行逐行写入 CSV 文件（与 DataFrame.to_csv 的格式一致），返回写入的行数
+def write_result_rows(rows, file_path=COMBINATIONS_FILE):
+    count = 0
+    with open(file_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.writer(csvfile, lineterminator=os.linesep)
+        writer.writerow(RESULT_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+# 按块将结果数组转换为结果表格的行
+def iter_result_rows(results, chunk_size=65536):
+    for start in range(0, len(results), chunk_size):
+        chunk = results[start:start + chunk_size]
+        yield from zip(*(chunk[column].tolist() for column in RESULT_COLUMNS))
+
+
+# 由排序后的组合下标构建结果数组：3 个刻印描述、6 项属性和、选项总和以及刻印 ID
+def build_result_array(combinations, ids, descriptions, attr_values, attribute_targets):
+    results = np.empty(len(combinations), dtype=RESULT_DTYPE)
+    descriptions = np.array(descriptions, dtype=object)
+    attr_values_sum = attr_values[combinations].sum(axis=1, dtype=np.int64).reshape(-1, 6)
+
+    for position in range(3):
+        results[RESULT_COLUMNS[position]] = descriptions[combinations[:, position]]
+        results[f"ID{position + 1}"] = ids[combinations[:, position]]
+    for attr_index in range(6):
+        results[RESULT_COLUMNS[3 + attr_index]] = attr_values_sum[:, attr_index]
+
+    summed_attrs = [attr_index for attr_index in attribute_targets if attribute_targets[attr_index] != (0, 0)]
+    results["选项总和"] = attr_values_sum[:, summed_attrs].sum(axis=1)
+    return results
+
+
+# find_initial_combinations 的向量化实现，写入文件的结果与逐个组合遍历的实现完全一致
+# engine="numpy" 按块枚举全部三元组；engine="pair_index" 使用配对和索引做范围查询；
+# engine="branch_bound" 使用精确的分支定界剪枝；symmetric=True 时不论引擎都直接构造对称组合
+# 搜索阶段只保留通过检查的组合，排序只针对结果集
+# 返回结果数组（RESULT_DTYPE），给出 export_path 时同时写入 CSV 文件
+# progress_callback(done, total, partial_results) 在每处理完一枚第一刻印后调用，partial_results 为新找到的结果；
+# 在回调中抛出 SearchCancelled 可以中止搜索
+# workers > 1 时 numpy 和 branch_bound 引擎使用多进程分片搜索；index_cache 为 PairIndexCache，用于复用配对和索引
+def find_initial_combinations_vectorized(filtered_mintmark_list, attribute_targets, symmetric=False, use_only1=False,
+                                         engine="numpy", export_path=None, progress_callback=None, workers=1,
+                                         index_cache=None, metrics=None, paths=DEFAULT_PATHS):
+    only1_ids = set()
+    if use_only1:
+        only1_ids = set(int(x) for x in load_only1_mintmark_ids(paths))
+
+    ids, descriptions, class_codes, attr_values = build_mintmark_arrays(filtered_mintmark_list)
+    only1_mask = np.isin(ids, list(only1_ids))
+
+    # 将新找到的组合块整理为结果数组再交给调用者
+    def report_blocks(done, total, blocks):
+        if blocks:
+            partial = sort_combinations_by_id(np.concatenate(blocks), ids)
+        else:
+            partial = np.empty((0, 3), dtype=np.int64)
+        progress_callback(done, total, build_result_array(partial, ids, descriptions, attr_values, attribute_targets))
+
+    block_callback = report_blocks if progress_callback is not None else None
+
+    with _metric_stage(metrics, "search"):
+        if symmetric:
+            # 对称模式下各引擎的结果相同，直接构造 (a, a, b) 形式的组合
+            combinations = search_combinations_symmetric(attr_values, ids, class_codes, only1_mask, attribute_targets,
+                                                         progress_callback=block_callback)
+        elif workers > 1 and engine in ("numpy", "branch_bound"):
+            combinations = search_combinations_parallel(attr_values, ids, class_codes, only1_mask, attribute_targets,
+                                                        symmetric=symmetric, engine=engine, workers=workers,
+                                                        progress_callback=block_callback)
+        elif engine == "pair_index":
+            if index_cache is not None:
+                pair_index = index_cache.get(attr_values, ids, class_codes, only1_mask)
+            else:
+                pair_index = PairSumIndex(attr_values, ids, class_codes, only1_mask)
+            combinations = pair_index.query(attribute_targets, symmetric=symmetric,
+                                            progress_callback=block_callback)
+        elif engine == "branch_bound":
+            combinations = search_combinations_branch_bound(attr_values, ids, class_codes, only1_mask,
+                                                            attribute_targets, symmetric=symmetric,
+                                                            progress_callback=block_callback)
+        else:
+            combinations = search_combinations_numpy(attr_values, ids, class_codes, only1_mask, attribute_targets,
+                                                     symmetric=symmetric, progress_callback=block_callback)
+    with _metric_stage(metrics, "sort"):
+        combinations = sort_combinations_by_id(combinations, ids)
+        results = build_result_array(combinations, ids, descriptions, attr_values, attribute_targets)
+
+    if export_path:
+        write_result_rows(iter_result_rows(results), export_path)
+    return results
+
+
+# 逐个组合遍历：按 combinations_with_replacement 的顺序产生满足系列规则和限1规则的组合，组合内的刻印按 ID 从大到小排列。
+# 不合规的组合不会被生成：限1刻印不与自身配对；前两枚同系列时第三枚只从其它系列中选（按系列分组的下标）；
+# 对称模式下直接构造 (a, a, b) 形式的组合，只需 O(n²) 步
+def iter_structural_combinations(ids, mintmark_classes, only1_ids, symmetric=False):
+    n = len(ids)
+    is_only1 = [ids[i] in only1_ids for i in range(n)]
+    # 每个系列之外的刻印下标（升序）
+    outside_class = {
+        mintmark_class: [k for k in range(n) if mintmark_classes[k] != mintmark_class]
+        for mintmark_class in set(mintmark_classes)
+    }
+
+    for i in range(n):
+        for j in range(i, n):
+            # 限1刻印不与自身配对
+            if j == i and is_only1[i]:
+                continue
+
+            same_class = mintmark_classes[i] == mintmark_classes[j]
+            if symmetric:
+                # (i, i, k) 或 (i, j, j)，第三枚刻印与重复的刻印不能同系列
+                if j == i:
+                    others = outside_class[mintmark_classes[i]]
+                    third_indices = others[bisect_left(others, i + 1):]
+                elif same_class:
+                    continue
+                else:
+                    third_indices = (j,)
+            elif same_class:
+                # 确保没有三个刻印来自于同一系列
+                others = outside_class[mintmark_classes[i]]
+                third_indices = others[bisect_left(others, j):]
+            else:
+                third_indices = range(j, n)
+
+            for k in third_indices:
+                if k == j and is_only1[j]:
+                    continue
+                combination = (i, j, k)
+
+                # 不同的刻印 ID 相同时，检查重复的 ID 是否属于限1系列
+                ids_in_combination = [ids[index] for index in combination]
+                if len(set(ids_in_combination)) < 3 and any(
+                    ids_in_combination.count(id) > 1 and id in only1_ids for id in ids_in_combination
+                ):
+                    continue
+
+                # **对组合的刻印ID从大到小排序**
+                yield tuple(sorted(combination, key=lambda index: ids[index], reverse=True))
+
+
+# 逐个组合检查属性目标，只放行符合要求的组合
+def iter_combinations_within_bounds(combinations, attr_values_list, attribute_targets):
+    for combination in combinations:
+        if all(
+            target_min <= sum(attr_values_list[i][attr_index] for i in combination) <= target_max
+            for attr_index, (target_min, target_max) in attribute_targets.items()
+        ):
+            yield combination
+
+
+# 将组合格式化为结果数组的行，增加"总和"列和刻印 ID
+def iter_formatted_rows(combinations, ids, descriptions, attr_values_list, attribute_targets):
+    for combination in combinations:
+        attr_values_sum = [
+            sum(attr_values_list[i][attr_index] for i in combination) for attr_index in range(6)
+        ]
+        total_sum = sum(attr_values_sum[attr_index] for attr_index in attribute_targets if
+                        attribute_targets[attr_index] != (0, 0))
+        yield tuple([descriptions[i] for i in combination] + attr_values_sum + [total_sum] +
+                    [ids[i] for i in combination])
+
+
+# 实现添加总和列的功能
+# 在此阶段排除来自同一系列的三个刻印组合，并且确保only1系列的刻印最多只有一个
+# engine 可选 "numpy"（默认）、"pair_index"、"branch_bound" 或 "python"（逐个组合遍历的实现）
+# 返回内存中的结果数组（RESULT_DTYPE），默认不读写文件；给出 export_path 时同时写入 CSV 文件
+# progress_callback、workers 和 index_cache 见 find_initial_combinations_vectorized，engine="python" 时均不使用；
+# metrics 为 QueryMetrics，记录组合搜索和排序的耗时；限1刻印 ID 从 paths 读取
+def find_initial_combinations(filtered_mintmark_list, attribute_targets, symmetric=False, use_only1=False,
+                              engine="numpy", export_path=None, progress_callback=None, workers=1, index_cache=None,
+                              metrics=None, paths=DEFAULT_PATHS):
+    if engine != "python":
+        return find_initial_combinations_vectorized(filtered_mintmark_list, attribute_targets, symmetric=symmetric,
+                                                    use_only1=use_only1, engine=engine, export_path=export_path,
+                                                    progress_callback=progress_callback, workers=workers,
+                                                    index_cache=index_cache, metrics=metrics, paths=paths)
+
+    only1_ids = []
+    # 加载限制的系列id
+    if use_only1:
+        only1_ids = load_only1_mintmark_ids(paths)  # 加载`only1`系列的ID集，用于后续判断
+        only1_ids = set(int(x) for x in only1_ids)  # 将 only1_ids 中的所有元素转换为整数
+
+    # 逐个组合遍历时使用 Python 列表；ID 存储为整数类型，便于后续排序
+    table = as_mintmark_table(filtered_mintmark_list)
+    ids = table.ids.tolist()
+    descriptions = table.descriptions.tolist()
+    mintmark_classes = table.class_codes.tolist()
+    attr_values_list = table.attr_values.tolist()
+
+    # 系列检查和属性检查逐个组合串联进行，只保留通过检查的组合
+    with _metric_stage(metrics, "search"):
+        combinations = iter_structural_combinations(ids, mintmark_classes, only1_ids, symmetric=symmetric)
+        valid_combinations = list(iter_combinations_within_bounds(combinations, attr_values_list, attribute_targets))
+
+    with _metric_stage(metrics, "sort"):
+        # 只对结果集排序，优先比较第一个刻印的ID，如果相同则比较第二个，以此类推
+        valid_combinations.sort(key=lambda comb: tuple(ids[i] for i in comb), reverse=True)
+
+        rows = iter_formatted_rows(valid_combinations, ids, descriptions, attr_values_list, attribute_targets)
+        results = np.array(list(rows), dtype=RESULT_DTYPE)
+
+    if export_path:
+        write_result_rows(iter_result_rows(results), export_path)
+    return results
+
+
+# 排名用的各属性权重：给出 weights（{属性下标: 权重}）时使用它，否则与“选项总和”一致，
+# 即给出范围且不是“置0”的属性权重为 1，其余为 0
+def score_weights(attribute_targets, weights=None):
+    vector = np.zeros(6, dtype=np.float64)
+    if weights:
+        for attr_index, weight in weights.items():
+            vector[int(attr_index)] = weight
+    else:
+        for attr_index, target in attribute_targets.items():
+            if target != (0, 0):
+                vector[attr_index] = 1
+    return vector
+
+
+# 按权重求各行属性的加权和，逐列累加（列的顺序固定，浮点权重下同一组合的得分总是相同）
+def weighted_scores(attr_values, weights):
+    scores = np.zeros(len(attr_values), dtype=np.float64)
+    for attr_index in np.flatnonzero(weights):
+        scores += attr_values[:, attr_index] * weights[attr_index]
+    return scores
+
+
+# 把新的候选组合与当前的前 top_k 名合并，只保留前 top_k 名。排名：得分从大到小，
+# 得分相同时按组合内从大到小排列的 ID 元组从大到小（即完整搜索的结果顺序）；返回 (组合, 得分)
+def _merge_top(best, best_scores, candidates, candidate_scores, ids, top_k):
+    candidates = np.concatenate([best, candidates])
+    candidate_scores = np.concatenate([best_scores, candidate_scores])
+    id_keys = -np.sort(ids[candidates], axis=1)[:, ::-1]
+    ranking = np.lexsort((id_keys[:, 2], id_keys[:, 1], id_keys[:, 0], -candidate_scores))[:top_k]
+    return candidates[ranking], candidate_scores[ranking]
+
+
+# 只保留得分最高的 top_k 个组合的精确搜索，结果与完整枚举后按得分从大到小、得分相同时按原来的顺序取前 top_k 个一致。
+# 组合的得分是三枚刻印属性和的加权和（weights 为 score_weights 的结果），等于三枚刻印各自得分之和。先按得分从大到小重排刻印，第一枚刻印为 a 的组合得分不超过 3 * s[a]，
+# 前两枚为 a、b 的不超过 s[a] + 2 * s[b]；已有 top_k 个组合时，上界低于当前第 top_k 名得分的部分直接跳过。
+# 候选组合按块检查属性范围、系列规则和 validate_combinations 的同名规则，与当前的前 top_k 名合并后只保留前 top_k 名。
+# 对称模式下与 search_combinations_symmetric 一样直接构造 (a, a, b) 形式的组合，见 _search_top_symmetric。
+# 返回原始下标的组合（每行 3 个下标）和对应的得分，按排名排列
+def search_top_combinations(attr_values, ids, class_codes, description_codes, only1_mask, attribute_targets, weights,
+                            top_k, symmetric=False, progress_callback=None):
+    n = len(ids)
+    if n == 0 or top_k <= 0:
+        return np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.float64)
+    bounds = _attribute_bounds(attribute_targets)
+    scores = weighted_scores(attr_values, weights)
+
+    order = np.argsort(-scores, kind='stable')
+    values = attr_values[order]
+    sorted_scores = scores[order]
+    sorted_ids = ids[order]
+    sorted_classes = class_codes[order]
+    sorted_descriptions = description_codes[order]
+    sorted_only1 = only1_mask[order]
+    negated_scores = -sorted_scores
+    # 浮点权重的得分和可能有舍入误差，剪枝时留出余量（只影响剪枝，不影响结果）
+    slack = 1e-6 * max(1.0, float(np.abs(sorted_scores).max()))
+
+    if symmetric:
+        best, best_scores = _search_top_symmetric(values, sorted_scores, sorted_ids, sorted_classes,
+                                                  sorted_descriptions, sorted_only1, bounds, weights, top_k, slack,
+                                                  progress_callback)
+        return order[best], best_scores
+
+    best = np.empty((0, 3), dtype=np.int64)  # 当前前 top_k 名（重排后的下标）
+    best_scores = np.empty(0, dtype=np.float64)
+    threshold = float('-inf')  # 已有 top_k 个组合时为第 top_k 名的得分
+
+    for a in range(n):
+        if progress_callback is not None:
+            progress_callback(a, n)
+        if 3 * sorted_scores[a] < threshold - slack:
+            break
+
+        b = a
+        while b < n:
+            b_indices = np.arange(b, n)
+            # 第三枚刻印只能取得分不低于 threshold - s[a] - s[b] 的位置
+            c_stops = np.searchsorted(negated_scores, -(threshold - slack - sorted_scores[a] - sorted_scores[b_indices]),
+                                      side='right')
+            counts = np.maximum(c_stops - b_indices, 0)
+            counts[sorted_scores[a] + 2 * sorted_scores[b_indices] < threshold - slack] = 0
+            if not counts.any():
+                break
+            cumulative = np.cumsum(counts)
+            take = max(1, int(np.searchsorted(cumulative, SEARCH_BLOCK_SIZE, side='right')))
+            b_block, counts = b_indices[:take], counts[:take]
+            b = int(b_block[-1]) + 1
+            total = int(cumulative[take - 1])
+            if total == 0:
+                continue
+
+            jj = np.repeat(b_block, counts)
+            kk = jj + np.arange(total) - np.repeat(cumulative[:take] - counts, counts)
+            mask = np.ones(total, dtype=bool)
+            for attr_index, target_min, target_max in bounds:
+                sums = values[a, attr_index] + values[jj, attr_index] + values[kk, attr_index]
+                if target_min != float('-inf'):
+                    mask &= sums >= target_min
+                if target_max != float('inf'):
+                    mask &= sums <= target_max
+
+            # 与 _search_block 相同的系列规则，以及 validate_combinations 中三枚刻印名称相同的规则
+            mask &= ~((sorted_classes[jj] == sorted_classes[a]) & (sorted_classes[kk] == sorted_classes[a]))
+            mask &= ~((sorted_descriptions[jj] == sorted_descriptions[a]) &
+                      (sorted_descriptions[kk] == sorted_descriptions[a]))
+            mask &= ~((sorted_ids[jj] == sorted_ids[a]) & sorted_only1[a])
+            mask &= ~((sorted_ids[kk] == sorted_ids[jj]) & sorted_only1[jj])
+            mask &= ~((sorted_ids[kk] == sorted_ids[a]) & sorted_only1[a])
+
+            block_scores = weighted_scores(values[a] + values[jj] + values[kk], weights)
+            if len(best) == top_k:
+                mask &= block_scores >= threshold
+            if not mask.any():
+                continue
+
+            best, best_scores = _merge_top(best, best_scores,
+                                           np.column_stack((np.full(int(mask.sum()), a), jj[mask], kk[mask])),
+                                           block_scores[mask], sorted_ids, top_k)
+            if len(best) == top_k:
+                threshold = float(best_scores[-1])
+    if progress_callback is not None:
+        progress_callback(n, n)
+
+    return order[best], best_scores
+
+
+# 对称模式的前 K 名搜索（参数为 search_top_combinations 中按得分重排后的数组）：组合为 (a, a, b)，
+# 得分为 2 * s[a] + s[b]，只需 O(n²) 个配对。a 不能是限1刻印，b 与 a 不同系列、不同名称；
+# 按 a 的得分从大到小检查，2 * s[a] 加上最高得分也达不到第 top_k 名时结束，b 只取得分不低于 threshold - 2 * s[a] 的位置
+def _search_top_symmetric(values, sorted_scores, sorted_ids, sorted_classes, sorted_descriptions, sorted_only1,
+                          bounds, weights, top_k, slack, progress_callback=None):
+    n = len(sorted_ids)
+    negated_scores = -sorted_scores
+    best = np.empty((0, 3), dtype=np.int64)
+    best_scores = np.empty(0, dtype=np.float64)
+    threshold = float('-inf')
+
+    for a in range(n):
+        if progress_callback is not None:
+            progress_callback(a, n)
+        if 2 * sorted_scores[a] + sorted_scores[0] < threshold - slack:
+            break
+        if sorted_only1[a]:
+            continue
+
+        stop = int(np.searchsorted(negated_scores, -(threshold - slack - 2 * sorted_scores[a]), side='right'))
+        others = np.arange(stop)
+        others = others[(others != a) & (sorted_classes[others] != sorted_classes[a]) &
+                        (sorted_descriptions[others] != sorted_descriptions[a])]
+        mask = np.ones(len(others), dtype=bool)
+        for attr_index, target_min, target_max in bounds:
+            sums = 2 * values[a, attr_index] + values[others, attr_index]
+            if target_min != float('-inf'):
+                mask &= sums >= target_min
+            if target_max != float('inf'):
+                mask &= sums <= target_max
+
+        block_scores = weighted_scores(2 * values[a] + values[others], weights)
+        if len(best) == top_k:
+            mask &= block_scores >= threshold
+        if not mask.any():
+            continue
+
+        others = others[mask]
+        triples = np.sort(np.column_stack((np.full(len(others), a), np.full(len(others), a), others)), axis=1)
+        best, best_scores = _merge_top(best, best_scores, triples, block_scores[mask], sorted_ids, top_k)
+        if len(best) == top_k:
+            threshold = float(best_scores[-1])
+    if progress_callback is not None:
+        progress_callback(n, n)
+
+    return best, best_scores
+
+
+# 前 K 名模式下的组合搜索：按得分（默认为“选项总和”，给出 weights 时为加权和）只保留最高的 top_k 个组合，
+# 结果数组按得分从大到小排列，得分相同时与完整搜索的顺序一致；其余参数见 find_initial_combinations
+def find_top_combinations(filtered_mintmark_list, attribute_targets, top_k, weights=None, symmetric=False,
+                          use_only1=False, progress_callback=None, metrics=None, paths=DEFAULT_PATHS):
+    only1_ids = set()
+    if use_only1:
+        only1_ids = set(int(x) for x in load_only1_mintmark_ids(paths))
+
+    table = as_mintmark_table(filtered_mintmark_list)
+    ids, descriptions, class_codes, attr_values = build_mintmark_arrays(table)
+    only1_mask = np.isin(ids, list(only1_ids))
+    description_codes = table.description_codes
+
+    # 前 K 名只有在搜索结束后才能确定，过程中只报告进度
+    def report_progress(done, total):
+        progress_callback(done, total, np.empty(0, dtype=RESULT_DTYPE))
+
+    search_callback = report_progress if progress_callback is not None else None
+
+    with _metric_stage(metrics, "search"):
+        combinations, _ = search_top_combinations(
+            attr_values, ids, class_codes, description_codes, only1_mask, attribute_targets,
+            score_weights(attribute_targets, weights), top_k,
+            symmetric=symmetric, progress_callback=search_callback)
+    with _metric_stage(metrics, "sort"):
+        # 组合已按排名排列，只需将组合内的刻印按 ID 从大到小排列
+        order = np.argsort(-ids[combinations], axis=1, kind='stable')
+        combinations = np.take_along_axis(combinations, order, axis=1)
+        results = build_result_array(combinations, ids, descriptions, attr_values, attribute_targets)
+    return results
+
+
+# 初步过滤刻印数据的方法：在刻印表 mintmark_table 中 indices 给出的刻印（默认为全部）上逐项过滤，
+# 返回通过过滤的刻印下标（按原来的顺序；勾选提升效率时按受限属性之和从大到小）
+def initial_filtering(mintmark_table, indices=None, monster_id_filter=None, quality_filter=None,
+                      filter_low_values=False, total_sum_filter=None, attribute_targets=None, improve_efficiency=False,
+                      top_n=200):
+    table = mintmark_table
+    indices = np.arange(len(table)) if indices is None else np.asarray(indices, dtype=np.int64)
+
+    # 专属刻印只保留与用户输入的 monster_id 相同的第一枚，没有输入 monster_id 时全部跳过
+    monster_ids = table.monster_ids[indices]
+    exclusive = monster_ids != ""
+    keep = ~exclusive
+    if monster_id_filter is not None:
+        keep[np.flatnonzero(exclusive & (monster_ids == monster_id_filter))[:1]] = True
+
+    qualities = table.qualities[indices]
+    if total_sum_filter:
+        total_sums = table.total_sums[indices]
+        allowed = np.zeros(len(indices), dtype=bool)
+        if '>220' in total_sum_filter:
+            allowed |= total_sums > 220
+        if '=220' in total_sum_filter:
+            allowed |= total_sums == 220
+        if '<220' in total_sum_filter:
+            allowed |= total_sums < 220
+        keep &= (qualities != '5') | allowed
+
+    # 质量过滤
+    if quality_filter:
+        keep &= np.isin(qualities, list(quality_filter))
+
+    # 过滤低属性值的刻印
+    if filter_low_values:
+        keep &= ~(table.attr_values[indices] < 0).any(axis=1)
+    indices = indices[keep]
+
+    # 如果用户在两个或更多属性上设定了下限，且勾选了提高效率选项，则先进行排序并只保留前 top_n 个
+    # 注意：这里会丢弃排名靠后的刻印，可能缺失结果；不缺失结果的加速请使用 engine="branch_bound"
+    if improve_efficiency and attribute_targets:
+        relevant_indices = [index for index, (min_value, max_value) in attribute_targets.items() if min_value > 0]
+        if len(relevant_indices) >= 2:
+            sums = table.attr_values[indices][:, relevant_indices].sum(axis=1)
+            indices = indices[np.argsort(-sums, kind='stable')][:top_n]
+
+    return indices
+
+
+# 进一步过滤刻印，基于“特定属性必须为 0”；返回 indices 中通过过滤的刻印下标
+def filter_zero_requirements(mintmark_table, indices, attribute_targets):
+    zero_attrs = [attr_index for attr_index, (target_min, target_max) in attribute_targets.items()
+                  if target_min == 0 and target_max == 0]
+    indices = np.asarray(indices, dtype=np.int64)
+    if not zero_attrs:
+        return indices
+    return indices[(mintmark_table.attr_values[indices][:, zero_attrs] == 0).all(axis=1)]
+
+# 各受限属性在支配关系中的方向：只给下限为 1（越大越好），只给上限为 -1（越小越好），上下限都给出为 0（必须相等）
+def dominance_directions(attribute_targets):
+    directions = {}
+    for attr_index, (target_min, target_max) in attribute_targets.items():
+        if target_min != float('-inf') and target_max == float('inf'):
+            directions[attr_index] = 1
+        elif target_min == float('-inf') and target_max != float('inf'):
+            directions[attr_index] = -1
+        elif target_min != float('-inf') and target_max != float('inf'):
+            directions[attr_index] = 0
+    return directions
+
+
+# 去除被压制的刻印（按本次查询的受限属性计算 Pareto 支配关系，方向见 dominance_directions）
+# 刻印 y 压制 x 要求两者同一系列、y 既不是限1刻印也不是专属刻印，并且候选刻印中没有其他刻印与 y 同名，
+# 这样把组合中的 x 换成 y 后系列规则、限1规则和 validate_combinations 的同名规则依然成立，
+# 所有属性范围也依然满足，因此 x 不会带来“更好”的组合。
+# 专属刻印始终保留。属性完全相同时保留 indices 中靠前的一个。返回 indices 中没有被压制的刻印下标
+def filter_dominated_mintmarks(mintmark_table, indices, attribute_targets, use_only1=False, paths=DEFAULT_PATHS):
+    directions = dominance_directions(attribute_targets)
+    indices = np.asarray(indices, dtype=np.int64)
+
+    # 没有受限属性时不存在“更好”的刻印
+    if not directions:
+        return indices
+
+    only1_ids = [int(x) for x in load_only1_mintmark_ids(paths)] if use_only1 else []
+    ordered_attrs = [attr_index for attr_index, direction in directions.items() if direction != 0]
+    equal_attrs = [attr_index for attr_index, direction in directions.items() if direction == 0]
+    signs = np.array([directions[attr_index] for attr_index in ordered_attrs], dtype=np.int32)
+
+    # 按系列分组，专属刻印不参与；positions 为在 indices 中的位置
+    table = mintmark_table
+    class_codes = table.class_codes[indices]
+    candidates = np.flatnonzero(table.monster_ids[indices] == "")
+    # 与其他候选刻印同名的刻印不能压制别人：换入后可能与另外两枚组成三枚同名的组合
+    _, description_index, description_counts = np.unique(table.description_codes[indices], return_inverse=True,
+                                                          return_counts=True)
+    unique_name = description_counts[description_index.reshape(-1)] == 1
+    dominated = np.zeros(len(indices), dtype=bool)
+    for class_code in np.unique(class_codes[candidates]):
+        positions = candidates[class_codes[candidates] == class_code]
+        if len(positions) < 2:
+            continue
+        attrs = table.attr_values[indices[positions]]
+        scores = attrs[:, ordered_attrs] * signs
+        equals = attrs[:, equal_attrs]
+        can_dominate = ~np.isin(table.ids[indices[positions]], only1_ids) & unique_name[positions]
+
+        rows_per_block = max(1, SEARCH_BLOCK_SIZE // len(positions))
+        for start in range(0, len(positions), rows_per_block):
+            x = slice(start, start + rows_per_block)
+            # [a, b]：第 b 个刻印是否压制第 a 个刻印
+            no_worse = (scores[None, :, :] >= scores[x, None, :]).all(axis=2)
+            no_worse &= (equals[None, :, :] == equals[x, None, :]).all(axis=2)
+            better = (scores[None, :, :] > scores[x, None, :]).any(axis=2)
+            earlier = positions[None, :] < positions[x, None]
+            is_dominated = (no_worse & (better | earlier) & can_dominate[None, :]).any(axis=1)
+            dominated[positions[x][is_dominated]] = True
+
+    return indices[~dominated]
+
+
+# 验证刻印组合是否符合所有条件（直接在内存中的结果数组上向量化检查）
+def validate_combinations(results, attribute_targets, attributes):
+    if len(results) == 0:
+        return results
+
+    # 确保最多只有两个刻印来自于同一个系列
+    valid = ~((results["刻印1"] == results["刻印2"]) & (results["刻印2"] == results["刻印3"]))
+
+    for attr_index, (target_min, target_max) in attribute_targets.items():
+        total_value = results[attributes[attr_index]]
+        valid &= (target_min <= total_value) & (total_value <= target_max)
+
+    return results[valid]
+
+
+# 返回 values 中互不相同的行，以及每一行在其中的位置（与 np.unique(values, axis=0) 相同，但更快）
+def unique_rows(values):
+    if len(values) == 0:
+        return values, np.zeros(0, dtype=np.int64)
+    low = values.min(axis=0)
+    widths = [int(width).bit_length() for width in values.max(axis=0) - low]
+    if sum(widths) <= 62:
+        # 各列的取值范围不大时把一行压缩为一个整数
+        keys = np.zeros(len(values), dtype=np.int64)
+        for column, width in enumerate(widths):
+            keys = (keys << width) | (values[:, column] - low[column]).astype(np.int64)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return values[first], inverse.reshape(-1)
+    points, inverse = np.unique(values, axis=0, return_inverse=True)
+    return points, inverse.reshape(-1)
+
+
+# 求 Pareto 前沿（skyline）：values 的每行是一个点，各列越大越好；返回不被任何其他点压制的行的布尔掩码。
+# 点 q 压制 p 指 q 在每一列都不小于 p 且至少一列更大，完全相同的点互不压制。
+# 先合并相同的点，一列时直接取最大值，两列时按第一列从大到小扫描；更多列时用 Sort-Filter-Skyline：
+# 按各列之和从大到小处理（压制 p 的点之和一定更大，总在 p 之前），每块点依次与已确定的前沿分段比较，
+# 分段从 segment_size 开始逐段加倍；被压制的点立即剔除（压制者多半是靠前的点），剩下的点再在块内互相比较
+def pareto_front_mask(values, block_size=4096, segment_size=64):
+    if len(values) == 0 or values.shape[1] == 0:
+        return np.ones(len(values), dtype=bool)
+    points, inverse = unique_rows(values)
+
+    if points.shape[1] == 1:
+        on_front = points[:, 0] == points[:, 0].max()
+    elif points.shape[1] == 2:
+        # 按第一列、第二列从大到小排列后，第二列大于之前所有点的点才不被压制
+        order = np.lexsort((-points[:, 1], -points[:, 0]))
+        second = points[order, 1]
+        previous_max = np.concatenate([[np.iinfo(np.int64).min], np.maximum.accumulate(second)[:-1]])
+        on_front = np.zeros(len(points), dtype=bool)
+        on_front[order] = second > previous_max
+    else:
+        order = np.argsort(-points.sum(axis=1, dtype=np.int64), kind='stable')
+        ordered = points[order]
+        front = np.empty_like(points)
+        front_size = 0
+        on_front = np.zeros(len(points), dtype=bool)
+        for start in range(0, len(ordered), block_size):
+            alive = np.arange(start, min(start + block_size, len(ordered)))
+            # 点互不相同，所以另一个点在每一列都不小于它就是压制
+            front_start, size = 0, segment_size
+            while front_start < front_size and len(alive):
+                segment = front[front_start:min(front_start + size, front_size)]
+                no_worse = np.ones((len(alive), len(segment)), dtype=bool)
+                for column in range(points.shape[1]):
+                    no_worse &= segment[None, :, column] >= ordered[alive, column][:, None]
+                alive = alive[~no_worse.any(axis=1)]
+                front_start, size = front_start + size, size * 2
+
+            # 块内比较只需在剩下的点之间进行：被剔除的点的压制者也压制它所压制的点
+            candidates = ordered[alive]
+            no_worse = ~np.eye(len(alive), dtype=bool)
+            for column in range(points.shape[1]):
+                no_worse &= candidates[None, :, column] >= candidates[:, None, column]
+            alive = alive[~no_worse.any(axis=1)]
+
+            front[front_size:front_size + len(alive)] = ordered[alive]
+            front_size += len(alive)
+            on_front[order[alive]] = True
+    return on_front[inverse]
+
+
+# 只保留所选属性上的 Pareto 前沿组合（不被其他组合在这些属性上全面压制），保持原来的顺序
+def pareto_front(results, pareto_attrs):
+    values = np.column_stack([results[ATTRIBUTES[attr_index]] for attr_index in pareto_attrs]) \
+        if len(pareto_attrs) else np.empty((len(results), 0), dtype=np.int64)
+    return results[pareto_front_mask(values)]
+
+
+# 逐行转发结果行，每 EXPORT_PROGRESS_ROWS 行调用一次 progress_callback(已写入行数, 总行数)
+def _rows_with_progress(rows, progress_callback, done, total):
+    for count, row in enumerate(rows, 1):
+        yield row
+        if progress_callback and count % EXPORT_PROGRESS_ROWS == 0:
+            progress_callback(done + count, total)
+
+
+# 历史记录超过 max_bytes 时轮换：process.csv 改名为 process.1.csv，原有的旧文件依次后移，最多保留 backups 个
+def rotate_process_file(process_path, max_bytes=PROCESS_MAX_BYTES, backups=PROCESS_BACKUPS):
+    if not os.path.exists(process_path) or os.path.getsize(process_path) < max_bytes:
+        return False
+    root, ext = os.path.splitext(process_path)
+    if backups <= 0:
+        os.remove(process_path)
+        return True
+    for index in range(backups - 1, 0, -1):
+        if os.path.exists(f"{root}.{index}{ext}"):
+            os.replace(f"{root}.{index}{ext}", f"{root}.{index + 1}{ext}")
+    os.replace(process_path, f"{root}.1{ext}")
+    return True
+
+
+# 用 openpyxl 的只写模式逐行写入 Excel 文件，内存占用不随行数增长；
+# 超过 EXCEL_MAX_ROWS 行时依次写入 Sheet2、Sheet3 ...
+def write_excel_rows(rows, excel_path):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    for count, row in enumerate(rows):
+        if count % EXCEL_MAX_ROWS == 0:
+            sheet = workbook.create_sheet(f"Sheet{count // EXCEL_MAX_ROWS + 1}")
+            sheet.append(RESULT_COLUMNS)
+        sheet.append(row)
+    if sheet is None:
+        workbook.create_sheet("Sheet1").append(RESULT_COLUMNS)
+    # 先写临时文件再替换，避免留下写了一半的文件
+    temp_file = excel_path + ".tmp.xlsx"
+    workbook.save(temp_file)
+    os.replace(temp_file, excel_path)
+
+
+# 显式导出结果：写入组合 CSV、Excel 文件，并追加到历史记录 process.csv，传入 None 跳过对应文件。
+# 各文件都按块流式写入；progress_callback(已写入行数, 总行数) 报告全部文件合计的进度。
+# 历史记录超过 process_max_bytes 时先轮换再追加，最多保留 process_backups 个旧文件
+def export_results(results, csv_path=COMBINATIONS_FILE, excel_path=excel_file, process_path=PROCESS_FILE,
+                   metrics=None, progress_callback=None, process_max_bytes=PROCESS_MAX_BYTES,
+                   process_backups=PROCESS_BACKUPS):
+    total = len(results) * sum(1 for path in (csv_path, process_path, excel_path) if path)
+    done = 0
+
+    if csv_path:
+        with _metric_stage(metrics, "export_csv"):
+            write_result_rows(_rows_with_progress(iter_result_rows(results), progress_callback, done, total),
+                              csv_path)
+        done += len(results)
+
+    if process_path:
+        with _metric_stage(metrics, "export_process"):
+            rotate_process_file(process_path, process_max_bytes, process_backups)
+            # 打开 process 文件以追加数据
+            with open(process_path, mode='a', newline='', encoding='utf-8-sig') as file:
+                writer = csv.writer(file)
+
+                # 检查文件是否为空，如果为空则写入头部
+                file.seek(0, 2)  # 移动到文件末尾
+                if file.tell() == 0:  # 如果文件为空，则写入头部
+                    writer.writerow(RESULT_COLUMNS)
+                writer.writerows(_rows_with_progress(iter_result_rows(results), progress_callback, done, total))
+        done += len(results)
+
+    if excel_path:
+        with _metric_stage(metrics, "export_excel"):
+            write_excel_rows(_rows_with_progress(iter_result_rows(results), progress_callback, done, total),
+                             excel_path)
+        done += len(results)
+
+    if progress_callback:
+        progress_callback(done, total)
+
+
+# 读取刻印数据 CSV 文件，返回每行一个字典的列表
+def load_mintmark_list(data_file=DATA_FILE):
+    with open(data_file, 'r', encoding='utf-8-sig') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+# 优先从二进制刻印目录读取刻印列表（必要时自动重建），没有源 JSON 文件时退回读取 CSV 文件
+def load_catalog_mintmark_list(paths=DEFAULT_PATHS):
+    catalog = load_catalog(paths)
+    if catalog is None:
+        return load_mintmark_list(paths.data_file)
+    return catalog_to_mintmark_list(catalog)
+
+
+# 与 load_catalog_mintmark_list 相同，但直接返回刻印表（见 MintmarkTable），每次读取只构建一次
+def load_catalog_mintmark_table(paths=DEFAULT_PATHS):
+    catalog = load_catalog(paths)
+    if catalog is None:
+        return build_mintmark_table(load_mintmark_list(paths.data_file))
+    return catalog_to_mintmark_table(catalog)
+
+
+# 三枚刻印的某项属性和能取到的值：返回布尔数组 reachable，reachable[t] 表示和为 offset + t 的组合存在。
+# 用直方图的卷积计算（单枚 -> 两枚 -> 三枚），不考虑系列规则和限1规则，得到的集合只会偏大
+def reachable_sums(column, count=3):
+    if len(column) == 0:
+        return np.zeros(0, dtype=bool), 0
+    low = int(column.min())
+    single = np.zeros(int(column.max()) - low + 1, dtype=np.int64)
+    single[column - low] = 1
+    reachable = single
+    for _ in range(count - 1):
+        reachable = (np.convolve(reachable, single) > 0).astype(np.int64)
+    return reachable > 0, count * low
+
+
+# 可行性预检查：在候选刻印上计算每项属性的三枚刻印和能达到的最小值和最大值。
+# 对每项受限属性，一枚刻印只有在剩余刻印的两枚之和能把它补到范围内时才可用；反复剔除不可用的刻印直到不再变化，
+# 再用剩余刻印计算各属性可达的范围。检查不考虑系列规则和限1规则，只会放过而不会误判：
+# 返回的 feasible 为 False 时一定没有满足条件的组合。返回 (feasible, ranges)，ranges[属性下标] 为 (最小值, 最大值)，
+# 没有可用刻印时为 None
+def check_feasibility(attr_values, attribute_targets):
+    bounds = _attribute_bounds(attribute_targets)
+    usable = np.ones(len(attr_values), dtype=bool)
+    changed = True
+    while changed and usable.any():
+        changed = False
+        for attr_index, target_min, target_max in bounds:
+            column = attr_values[usable, attr_index]
+            pairs, offset = reachable_sums(column, count=2)
+            # 前缀和：可达的两枚之和落在 [下限 - v, 上限 - v] 中的个数
+            prefix = np.concatenate([[0], np.cumsum(pairs)])
+            low = np.clip(target_min - column - offset, 0, len(pairs)) if target_min != float('-inf') \
+                else np.zeros(len(column))
+            high = np.clip(target_max - column - offset + 1, 0, len(pairs)) if target_max != float('inf') \
+                else np.full(len(column), len(pairs))
+            ok = prefix[high.astype(np.int64)] > prefix[low.astype(np.int64)]
+            if not ok.all():
+                usable[np.flatnonzero(usable)[~ok]] = False
+                changed = True
+                if not usable.any():
+                    break
+
+    ranges = []
+    for attr_index in range(6):
+        if not usable.any():
+            ranges.append(None)
+            continue
+        reachable, offset = reachable_sums(attr_values[usable, attr_index])
+        values = np.flatnonzero(reachable) + offset
+        ranges.append((int(values[0]), int(values[-1])))
+    return bool(usable.any()), ranges
+
+
+# 对查询参数（run_query 的关键字参数）做可行性预检查：与 run_query 相同地过滤候选刻印后调用 check_feasibility
+# mintmark_list 可以是刻印表（见 MintmarkTable）或刻印列表
+def query_feasibility(mintmark_list, query):
+    table = as_mintmark_table(mintmark_list)
+    attribute_targets = query.get("attribute_targets") or {}
+    indices = initial_filtering(
+        table, monster_id_filter=query.get("monster_id_filter"), quality_filter=query.get("quality_filter"),
+        filter_low_values=query.get("filter_low_values", False), total_sum_filter=query.get("total_sum_filter"),
+        attribute_targets=attribute_targets, improve_efficiency=query.get("improve_efficiency", False),
+        top_n=query.get("top_n", 200))
+    indices = filter_zero_requirements(table, indices, attribute_targets)
+    return check_feasibility(table.attr_values[indices], attribute_targets)
+
+
+# 属性和的直方图网格：每一维只保留 [下限 - 最大平移 - 1, 上限 - 最小平移 + 1] 这一段，
+# 之外的点并入两端的格子（对任何平移量都一定在范围外）。返回各维的起点和格数
+def _grid_axes(point_min, point_max, shift_min, shift_max, lows, highs):
+    starts, sizes = [], []
+    for d in range(len(lows)):
+        start, stop = int(point_min[d]), int(point_max[d])
+        if lows[d] != float('-inf'):
+            start = max(start, int(lows[d]) - int(shift_max[d]) - 1)
+        if highs[d] != float('inf'):
+            stop = min(stop, int(highs[d]) - int(shift_min[d]) + 1)
+        starts.append(start)
+        sizes.append(max(stop - start + 1, 1))
+    return np.array(starts, dtype=np.int64), np.array(sizes, dtype=np.int64)
+
+
+# 将点（每行一点）按个数 weights 计入直方图 counts（展平的一维数组）
+def _grid_add(counts, starts, sizes, points, weights):
+    cells = np.clip(points - starts, 0, sizes - 1)
+    flat = np.ravel_multi_index(tuple(cells.T), tuple(sizes))
+    counts += np.bincount(flat, weights=weights, minlength=len(counts)).astype(np.int64)
+
+
+# 直方图的多维前缀和，各维前面补一格 0
+def _grid_prefix(counts, sizes):
+    prefix = counts.reshape(tuple(sizes))
+    for axis in range(len(sizes)):
+        prefix = np.cumsum(prefix, axis=axis)
+    return np.pad(prefix, [(1, 0)] * len(sizes))
+
+
+# 对每个平移量 s，统计直方图中满足 下限 <= s + 点 <= 上限（各维同时满足）的点数；多维前缀和按容斥原理相加
+def _grid_box_counts(prefix, starts, sizes, lows, highs, shifts):
+    corners = []
+    for d in range(len(sizes)):
+        low = np.zeros(len(shifts), dtype=np.int64) if lows[d] == float('-inf') else \
+            np.clip(int(lows[d]) - shifts[:, d] - starts[d], 0, sizes[d])
+        high = np.full(len(shifts), sizes[d], dtype=np.int64) if highs[d] == float('inf') else \
+            np.clip(int(highs[d]) - shifts[:, d] - starts[d] + 1, 0, sizes[d])
+        corners.append((low, np.maximum(high, low)))
+    total = np.zeros(len(shifts), dtype=np.int64)
+    for choice in product((0, 1), repeat=len(sizes)):
+        index = tuple(corners[d][bit] for d, bit in enumerate(choice))
+        sign = -1 if (len(sizes) - sum(choice)) % 2 else 1
+        total += sign * prefix[index]
+    return total
+
+
+# 判断属性和（每行一个和）是否落在各维的范围内
+def _within_bounds(sums, lows, highs):
+    return np.all(sums >= lows, axis=-1) & np.all(sums <= highs, axis=-1)
+
+
+# 直接枚举 values 中可重复选取的三元组 i <= j <= k，返回属性和在范围内的三元组（每行 3 个下标）
+def _enumerate_multisets(values, lows, highs):
+    m = len(values)
+    i, j, k = np.meshgrid(np.arange(m), np.arange(m), np.arange(m), indexing='ij')
+    keep = (i <= j) & (j <= k)
+    triples = np.column_stack((i[keep], j[keep], k[keep]))
+    return triples[_within_bounds(values[triples].sum(axis=1), lows, highs)]
+
+
+# 不考虑任何规则时，属性和在范围内的可重复三元组（多重集合）个数，不生成三元组。
+# 按 Burnside 引理，个数 = (T + 3D + 2E) / 6，其中 T 为有序三元组数，D 为有序的 (a, a, b) 个数，E 为 (a, a, a) 个数；
+# T 和 D 用相同取值合并后的直方图计算（两枚之和的直方图、单枚的直方图），网格超过 max_cells 格时返回 None
+def _count_multisets(values, lows, highs, max_cells):
+    m = len(values)
+    if values.shape[1] == 0:
+        return comb(m + 2, 3)
+    if m <= COUNT_DIRECT_SIZE:
+        return len(_enumerate_multisets(values, lows, highs))
+    points, inverse = unique_rows(values)
+    weights = np.bincount(inverse, minlength=len(points)).astype(np.int64)
+    low, high = points.min(axis=0), points.max(axis=0)
+
+    starts, sizes = _grid_axes(2 * low, 2 * high, low, high, lows, highs)
+    if np.prod(sizes, dtype=np.float64) > max_cells:
+        return None
+    counts = np.zeros(int(np.prod(sizes)), dtype=np.int64)
+    rows_per_block = max(1, SEARCH_BLOCK_SIZE // len(points))
+    for start in range(0, len(points), rows_per_block):
+        block = slice(start, start + rows_per_block)
+        pair_points = (points[block, None, :] + points[None, :, :]).reshape(-1, points.shape[1])
+        pair_weights = (weights[block, None] * weights[None, :]).reshape(-1)
+        _grid_add(counts, starts, sizes, pair_points, pair_weights)
+    ordered = int((weights * _grid_box_counts(_grid_prefix(counts, sizes), starts, sizes, lows, highs,
+                                              points)).sum())
+
+    starts, sizes = _grid_axes(low, high, 2 * low, 2 * high, lows, highs)
+    counts = np.zeros(int(np.prod(sizes)), dtype=np.int64)
+    _grid_add(counts, starts, sizes, points, weights)
+    doubled = int((weights * _grid_box_counts(_grid_prefix(counts, sizes), starts, sizes, lows, highs,
+                                              2 * points)).sum())
+    tripled = int(weights[_within_bounds(3 * points, lows, highs)].sum())
+    return (ordered + 3 * doubled + 2 * tripled) // 6
+
+
+# 三元组（每行 3 个下标）中通过系列规则和限1规则的部分；descriptions 给出时还去除三枚刻印名称相同的组合
+def _rule_mask(triples, class_codes, ids, only1_mask, description_codes=None):
+    first, second, third = triples.T
+    keep = ~((class_codes[first] == class_codes[second]) & (class_codes[second] == class_codes[third]))
+    keep &= ~((ids[first] == ids[second]) & only1_mask[first])
+    keep &= ~((ids[second] == ids[third]) & only1_mask[second])
+    keep &= ~((ids[first] == ids[third]) & only1_mask[first])
+    if description_codes is not None:
+        keep &= ~((description_codes[first] == description_codes[second]) &
+                  (description_codes[second] == description_codes[third]))
+    return keep
+
+
+# 精确计数：全部多重集合减去三枚同系列的（逐个系列计数），再减去逐个列出的含重复限1 ID 的组合和三枚同名的组合
+def _count_exact(values, ids, class_codes, description_codes, only1_mask, lows, highs, max_cells):
+    total = _count_multisets(values, lows, highs, max_cells)
+    if total is None:
+        return None
+    for class_code in np.unique(class_codes):
+        members = np.flatnonzero(class_codes == class_code)
+        same_class = _count_multisets(values[members], lows, highs, max_cells)
+        if same_class is None:
+            return None
+        total -= same_class
+
+    # 含两枚相同限1 ID 的组合 (a, b, x)，a、b 的 ID 相同（ID 不重复时 a = b）
+    only1_indices = np.flatnonzero(only1_mask)
+    triples = []
+    for a in only1_indices:
+        for b in only1_indices[(only1_indices >= a) & (ids[only1_indices] == ids[a])]:
+            third = np.flatnonzero(_within_bounds(values[a] + values[b] + values, lows, highs))
+            triples.append(np.column_stack((np.full(len(third), a), np.full(len(third), b), third)))
+    if triples:
+        triples = np.unique(np.sort(np.concatenate(triples), axis=1), axis=0)
+        first, second, third = triples.T
+        total -= int((~((class_codes[first] == class_codes[second]) &
+                        (class_codes[second] == class_codes[third]))).sum())
+
+    # 三枚刻印名称相同、但通过了系列规则和限1规则的组合，由 validate_combinations 去除
+    repeated, sizes = np.unique(description_codes, return_counts=True)
+    for description_code in repeated[sizes > 1]:
+        members = np.flatnonzero(description_codes == description_code)
+        triples = members[_enumerate_multisets(values[members], lows, highs)]
+        total -= int(_rule_mask(triples, class_codes, ids, only1_mask).sum())
+    return total
+
+
+# 对称模式：组合为 (a, a, b)，a、b 不同系列、名称不同，a 不是限1刻印；逐块统计每个 a 可搭配的 b
+def _count_symmetric(values, ids, class_codes, description_codes, only1_mask, lows, highs):
+    n = len(values)
+    firsts = np.flatnonzero(~only1_mask)
+    total = 0
+    rows_per_block = max(1, SEARCH_BLOCK_SIZE // max(n, 1))
+    for start in range(0, len(firsts), rows_per_block):
+        a = firsts[start:start + rows_per_block]
+        keep = _within_bounds(2 * values[a, None, :] + values[None, :, :], lows, highs)
+        keep &= class_codes[a, None] != class_codes[None, :]
+        keep &= description_codes[a, None] != description_codes[None, :]
+        total += int(keep.sum())
+    return total
+
+
+# 抽样估计：用一部分受限属性（key_dims，直方图网格不超过 max_cells 格）算出每对有序的前两枚刻印 (a, j)
+# 可搭配的第三枚刻印数 h 的上界，按 h 的比例抽取 samples 对，逐对精确统计满足全部条件的组合（按重复次数折算）。
+# 估计值为 H * mean(f / h)（H 为 h 的总和），比值在 0 到 1 之间，误差为约 95% 置信区间的半宽；
+# h 大于 0 的对不超过 samples 个时逐对统计全部，返回精确值（误差为 None）
+def _count_sampled(values, ids, class_codes, description_codes, only1_mask, lows, highs, key_dims, samples, rng):
+    n = len(values)
+    points, inverse = unique_rows(values)
+    weights = np.bincount(inverse, minlength=len(points)).astype(np.int64)
+    key_points = points[:, key_dims]
+    key_lows, key_highs = lows[key_dims], highs[key_dims]
+    low, high = key_points.min(axis=0), key_points.max(axis=0)
+    starts, sizes = _grid_axes(low, high, 2 * low, 2 * high, key_lows, key_highs)
+    counts = np.zeros(int(np.prod(sizes)), dtype=np.int64)
+    _grid_add(counts, starts, sizes, key_points, weights)
+    prefix = _grid_prefix(counts, sizes)
+
+    # 相同取值合并后的有序对 (p, q) 的上界，按取值对的个数 w[p] * w[q] 加权
+    pair_bounds = np.zeros((len(points), len(points)), dtype=np.int64)
+    rows_per_block = max(1, SEARCH_BLOCK_SIZE // len(points))
+    for start in range(0, len(points), rows_per_block):
+        shifts = key_points[start:start + rows_per_block, None, :] + key_points[None, :, :]
+        pair_bounds[start:start + rows_per_block] = _grid_box_counts(
+            prefix, starts, sizes, key_lows, key_highs, shifts.reshape(-1, len(key_dims))).reshape(-1, len(points))
+    pair_weights = pair_bounds * weights[:, None] * weights[None, :]
+    total_bound = int(pair_weights.sum())
+    if total_bound == 0:
+        return 0, None
+
+    members = np.split(np.argsort(inverse, kind='stable'), np.cumsum(weights)[:-1])
+    positive = np.argwhere(pair_bounds > 0)
+    if int((weights[positive[:, 0]] * weights[positive[:, 1]]).sum()) <= samples:
+        pairs = np.array([(a, j) for p, q in positive for a in members[p] for j in members[q]], dtype=np.int64)
+        exact = True
+    else:
+        flat = rng.choice(pair_weights.size, size=samples, p=pair_weights.reshape(-1) / total_bound)
+        p, q = np.divmod(flat, len(points))
+        pairs = np.array([(rng.choice(members[p_]), rng.choice(members[q_])) for p_, q_ in zip(p, q)],
+                         dtype=np.int64).reshape(-1, 2)
+        exact = False
+
+    # 逐对统计第三枚刻印：满足全部条件的组合按有序三元组的重复次数（6、3 或 1）折算
+    found = np.zeros(len(pairs), dtype=np.float64)
+    rows_per_block = max(1, SEARCH_BLOCK_SIZE // n)
+    third = np.arange(n)
+    for start in range(0, len(pairs), rows_per_block):
+        a, j = pairs[start:start + rows_per_block].T
+        triples = np.stack(np.broadcast_arrays(a[:, None], j[:, None], third[None, :]), axis=-1).reshape(-1, 3)
+        keep = _within_bounds(values[triples].sum(axis=1), lows, highs)
+        keep &= _rule_mask(triples, class_codes, ids, only1_mask, description_codes)
+        distinct = 1 + (triples[:, 0] != triples[:, 1]) + ((triples[:, 2] != triples[:, 0]) &
+                                                             (triples[:, 2] != triples[:, 1]))
+        repeats = np.array([0, 1, 3, 6])[distinct]
+        found[start:start + rows_per_block] = (keep / repeats).reshape(len(a), n).sum(axis=1)
+    if exact:
+        return int(round(found.sum())), None
+
+    ratios = found / pair_bounds[np.divmod(flat, len(points))]
+    estimate = total_bound * ratios.mean()
+    error = 1.96 * total_bound * ratios.std(ddof=1) / np.sqrt(samples)
+    return int(round(estimate)), float(error)
+
+
+# 统计完整搜索的结果数（满足属性范围、系列规则、限1规则以及 validate_combinations 中同名规则的组合个数），不生成组合。
+# 不会限制任何组合的属性先去掉；剩余受限属性的直方图网格不超过 max_cells 格时精确计数（见 _count_exact），
+# 否则抽样估计（见 _count_sampled，取最严的几项属性作上界）。返回 (个数, 误差)，精确时误差为 None
+def count_combinations(attr_values, ids, class_codes, description_codes, only1_mask, attribute_targets,
+                       symmetric=False, max_cells=COUNT_MAX_CELLS, samples=COUNT_SAMPLES, seed=0):
+    if len(ids) == 0:
+        return 0, None
+    column_min, column_max = attr_values.min(axis=0), attr_values.max(axis=0)
+    dims = [
+        attr_index for attr_index, (target_min, target_max) in attribute_targets.items()
+        if target_min > 3 * column_min[attr_index] or target_max < 3 * column_max[attr_index]
+    ]
+    values = attr_values[:, dims].astype(np.int64)
+    lows = np.array([attribute_targets[attr_index][0] for attr_index in dims], dtype=np.float64)
+    highs = np.array([attribute_targets[attr_index][1] for attr_index in dims], dtype=np.float64)
+
+    if symmetric:
+        return _count_symmetric(values, ids, class_codes, description_codes, only1_mask, lows, highs), None
+    count = _count_exact(values, ids, class_codes, description_codes, only1_mask, lows, highs, max_cells)
+    if count is not None:
+        return count, None
+
+    # 有效区间占三枚刻印可达范围的比例越小越严，依次加入直到网格超过 max_cells 格
+    def ratio(d):
+        low, high = 3 * int(values[:, d].min()), 3 * int(values[:, d].max())
+        return (min(highs[d], high) - max(lows[d], low) + 1) / (high - low + 1)
+
+    key_dims = []
+    for d in sorted(range(len(dims)), key=ratio):
+        column = values[:, key_dims + [d]]
+        _, sizes = _grid_axes(column.min(axis=0), column.max(axis=0), 2 * column.min(axis=0), 2 * column.max(axis=0),
+                              lows[key_dims + [d]], highs[key_dims + [d]])
+        if key_dims and np.prod(sizes, dtype=np.float64) > max_cells:
+            break
+        key_dims.append(d)
+    return _count_sampled(values, ids, class_codes, description_codes, only1_mask, lows, highs, key_dims, samples,
+                          np.random.default_rng(seed))
+
+# 对查询参数（run_query 的关键字参数）统计完整搜索的结果数，不进行组合搜索：与 run_query 相同地过滤候选刻印，
+# 先做可行性预检查，再调用 count_combinations。返回 {"count", "exact", "error", "candidates"}，
+# error 为抽样估计的误差（约 95% 置信区间的半宽），精确计数时为 None；top_k 和 pareto_attrs 不影响统计
+def query_count(mintmark_list, query, paths=DEFAULT_PATHS):
+    table = as_mintmark_table(mintmark_list)
+    attribute_targets = query.get("attribute_targets") or {}
+    indices = initial_filtering(
+        table, monster_id_filter=query.get("monster_id_filter"), quality_filter=query.get("quality_filter"),
+        filter_low_values=query.get("filter_low_values", False), total_sum_filter=query.get("total_sum_filter"),
+        attribute_targets=attribute_targets, improve_efficiency=query.get("improve_efficiency", False),
+        top_n=query.get("top_n", 200))
+    indices = filter_zero_requirements(table, indices, attribute_targets)
+    if not query.get("keep_dominated", True):
+        indices = filter_dominated_mintmarks(table, indices, attribute_targets,
+                                             use_only1=query.get("use_only1", False), paths=paths)
+
+    candidates = table.subset(indices)
+    count, error = 0, None
+    if check_feasibility(candidates.attr_values, attribute_targets)[0]:
+        only1_ids = [int(x) for x in load_only1_mintmark_ids(paths)] if query.get("use_only1", False) else []
+        count, error = count_combinations(candidates.attr_values, candidates.ids, candidates.class_codes,
+                                          candidates.description_codes, np.isin(candidates.ids, only1_ids),
+                                          attribute_targets, symmetric=query.get("symmetric", False))
+    return {"count": count, "exact": error is None, "error": error, "candidates": len(candidates)}
+
+
+# 执行一次完整的查询：初步过滤、“置0”过滤、去除被压制的刻印、组合搜索和验证
+# mintmark_list 最好是预先构建的刻印表（见 MintmarkTable），给出刻印列表时先转换；各过滤阶段只传递刻印下标
+# 返回 (结果数组, 统计信息)；progress_callback 见 find_initial_combinations；
+# metrics 为 QueryMetrics 时记录各阶段耗时、各项过滤淘汰的刻印数和各条规则淘汰的组合数；限1刻印 ID 从 paths 读取
+# 给出 top_k 时只返回得分最高的 top_k 个组合（见 find_top_combinations），此时不使用 engine、workers 和 index_cache；
+# 给出 pareto_attrs（属性下标的列表）时只返回在这些属性上的 Pareto 前沿组合（见 pareto_front）；
+# 统计信息中的 "feasible" 和 "ranges" 为可行性预检查的结果（见 check_feasibility），不可行时不进行组合搜索
+def run_query(mintmark_list, attribute_targets, monster_id_filter=None, quality_filter=None, filter_low_values=False,
+              total_sum_filter=None, improve_efficiency=False, top_n=200, symmetric=False, use_only1=False,
+              keep_dominated=True, engine="numpy", workers=1, index_cache=None, progress_callback=None,
+              metrics=None, paths=DEFAULT_PATHS, top_k=None, weights=None, pareto_attrs=None):
+    table = as_mintmark_table(mintmark_list)
+    with _metric_stage(metrics, "initial_filtering"):
+        indices = initial_filtering(table, monster_id_filter=monster_id_filter, quality_filter=quality_filter,
+                                    filter_low_values=filter_low_values, total_sum_filter=total_sum_filter,
+                                    attribute_targets=attribute_targets, improve_efficiency=improve_efficiency,
+                                    top_n=top_n)
+    filtered_count = len(indices)
+    with _metric_stage(metrics, "filter_zero_requirements"):
+        indices = filter_zero_requirements(table, indices, attribute_targets)
+    candidate_count = len(indices)
+    if not keep_dominated:
+        with _metric_stage(metrics, "filter_dominated_mintmarks"):
+            indices = filter_dominated_mintmarks(table, indices, attribute_targets, use_only1=use_only1, paths=paths)
+    candidates = table.subset(indices)
+
+    # 可行性预检查：一定没有满足条件的组合时跳过组合搜索
+    with _metric_stage(metrics, "feasibility"):
+        feasible, ranges = check_feasibility(candidates.attr_values, attribute_targets)
+    if not feasible:
+        results = np.empty(0, dtype=RESULT_DTYPE)
+    elif top_k is not None:
+        results = find_top_combinations(candidates, attribute_targets, top_k, weights=weights,
+                                        symmetric=symmetric, use_only1=use_only1,
+                                        progress_callback=progress_callback, metrics=metrics, paths=paths)
+    else:
+        results = find_initial_combinations(candidates, attribute_targets, symmetric=symmetric,
+                                            use_only1=use_only1, engine=engine, progress_callback=progress_callback,
+                                            workers=workers, index_cache=index_cache, metrics=metrics, paths=paths)
+    with _metric_stage(metrics, "validate"):
+        valid_combinations = validate_combinations(results, attribute_targets, ATTRIBUTES)
+    valid_count = len(valid_combinations)
+    if pareto_attrs:
+        with _metric_stage(metrics, "pareto"):
+            valid_combinations = pareto_front(valid_combinations, pareto_attrs)
+
+    if metrics is not None:
+        metrics.count("initial_filtering", len(table) - filtered_count)
+        metrics.count("zero_requirements", filtered_count - candidate_count)
+        metrics.count("dominated", candidate_count - len(candidates))
+
+        only1_ids = [int(x) for x in load_only1_mintmark_ids(paths)] if use_only1 else []
+        rejections, remaining = count_rule_rejections(candidates.ids, candidates.class_codes,
+                                                      np.isin(candidates.ids, only1_ids), symmetric)
+        for name, value in rejections.items():
+            metrics.count(name, value)
+        metrics.count("attribute_bounds" if top_k is None else "top_k", remaining - valid_count)
+        if pareto_attrs:
+            metrics.count("pareto", valid_count - len(valid_combinations))
+
+    stats = {
+        "candidates": len(candidates),
+        "removed": candidate_count - len(candidates),
+        "results": len(valid_combinations),
+        "feasible": feasible,
+        "ranges": ranges,
+    }
+    return valid_combinations, stats
+
+
+# 数据版本：二进制目录的版本标记（源 JSON 和缺失刻印 ID）加上限1系列和限1刻印 ID 文件的内容
+def catalog_version(paths=DEFAULT_PATHS):
+    digest = hashlib.sha256(compute_catalog_stamp(paths).encode('utf-8'))
+    for file_path in (paths.only1_class_file, paths.only1_ids_file):
+        try:
+            with open(file_path, 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+# 将查询参数规范化为可以稳定序列化的形式，作为缓存键的一部分
+# 搜索引擎和并行进程数不影响结果，不参与缓存键；只有勾选提升效率时 top_n 才有意义
+def normalize_query(query):
+    def bound(value):
+        return str(value) if value in (float('inf'), float('-inf')) else int(value)
+
+    attribute_targets = query.get("attribute_targets") or {}
+    return {
+        "attribute_targets": sorted([int(attr_index), bound(target_min), bound(target_max)]
+                                    for attr_index, (target_min, target_max) in attribute_targets.items()),
+        "monster_id_filter": query.get("monster_id_filter") or None,
+        "quality_filter": sorted(query.get("quality_filter") or []),
+        "total_sum_filter": sorted(query.get("total_sum_filter") or []),
+        "filter_low_values": bool(query.get("filter_low_values", False)),
+        "improve_efficiency": bool(query.get("improve_efficiency", False)),
+        "top_n": int(query.get("top_n", 200)) if query.get("improve_efficiency") else None,
+        "symmetric": bool(query.get("symmetric", False)),
+        "use_only1": bool(query.get("use_only1", False)),
+        "keep_dominated": bool(query.get("keep_dominated", True)),
+        "top_k": int(query["top_k"]) if query.get("top_k") is not None else None,
+        "weights": sorted([int(attr_index), float(weight)] for attr_index, weight in query["weights"].items())
+        if query.get("top_k") is not None and query.get("weights") else None,
+        "pareto_attrs": sorted(int(attr_index) for attr_index in query["pareto_attrs"])
+        if query.get("pareto_attrs") else None,
+    }
+
+
+# 查询结果缓存：内存中的 LRU，加上可选的磁盘缓存（按修改时间淘汰，总大小有上限）
+# 缓存键由规范化的查询参数和数据版本组成；数据版本变化时清空全部缓存
+class QueryCache:
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, max_rows=QUERY_CACHE_MAX_ROWS, disk_dir=None,
+                 disk_limit=QUERY_CACHE_DISK_LIMIT, disk_max_rows=QUERY_CACHE_DISK_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.disk_dir = disk_dir
+        self.disk_limit = disk_limit
+        self.disk_max_rows = disk_max_rows
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(query, version):
+        payload = json.dumps([normalize_query(query), version], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # 数据版本变化时清空内存和磁盘缓存
+    def check_version(self, version):
+        if version != self._version:
+            if self._version is not None:
+                self.clear()
+            self._version = version
+
+    def clear(self):
+        self._entries.clear()
+        self._rows = 0
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def get(self, query, version):
+        self.check_version(version)
+        key = self.make_key(query, version)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        entry = self._load_from_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, query, version, results, stats):
+        self.check_version(version)
+        key = self.make_key(query, version)
+        entry = (results, stats)
+        self._remember(key, entry)
+        self._save_to_disk(key, entry)
+
+    def _remember(self, key, entry):
+        if len(entry[0]) > self.max_rows:
+            return
+        if key in self._entries:
+            self._rows -= len(self._entries.pop(key)[0])
+        self._entries[key] = entry
+        self._rows += len(entry[0])
+        while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+            _, (results, _) = self._entries.popitem(last=False)
+            self._rows -= len(results)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".npz")
+
+    def _load_from_disk(self, key):
+        if not self.disk_dir:
+            return None
+        file_path = self._disk_path(key)
+        try:
+            with np.load(file_path) as data:
+                results = np.empty(len(data["ID1"]), dtype=RESULT_DTYPE)
+                for column in RESULT_DTYPE.names:
+                    results[column] = data[column]
+                stats = json.loads(str(data["stats"]))
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        os.utime(file_path)  # 更新修改时间，用于按最近使用淘汰
+        return results, stats
+
+    def _save_to_disk(self, key, entry):
+        results, stats = entry
+        if not self.disk_dir or len(results) > self.disk_max_rows:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        columns = {
+            column: results[column].astype(str) if RESULT_DTYPE[column] == object else results[column]
+            for column in RESULT_DTYPE.names
+        }
+        temp_file = self._disk_path(key) + ".tmp.npz"
+        np.savez(temp_file, stats=np.array(json.dumps(stats)), **columns)
+        os.replace(temp_file, self._disk_path(key))
+        self._trim_disk()
+
+    # 磁盘缓存超过大小上限时，从最久未使用的文件开始删除
+    def _trim_disk(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".npz"):
+                file_path = os.path.join(self.disk_dir, name)
+                stat = os.stat(file_path)
+                files.append((stat.st_mtime, stat.st_size, file_path))
+        total = sum(size for _, size, _ in files)
+        for _, size, file_path in sorted(files):
+            if total <= self.disk_limit:
+                break
+            os.remove(file_path)
+            total -= size
+
+
+# 通过缓存执行查询：命中时直接返回缓存的结果，否则读取刻印目录、执行查询并写入缓存
+# query 为 run_query 的关键字参数（不含 mintmark_list 和 progress_callback）
+def run_cached_query(query, cache=None, progress_callback=None, paths=DEFAULT_PATHS, metrics=None):
+    version = catalog_version(paths) if cache is not None else None
+    if cache is not None:
+        with _metric_stage(metrics, "cache"):
+            entry = cache.get(query, version)
+        if entry is not None:
+            results, stats = entry
+            return results, dict(stats, cached=True)
+
+    with _metric_stage(metrics, "load"):
+        mintmark_table = load_catalog_mintmark_table(paths)
+    results, stats = run_query(mintmark_table, progress_callback=progress_callback, metrics=metrics, paths=paths,
+                               **query)
+    if cache is not None:
+        with _metric_stage(metrics, "cache"):
+            cache.put(query, version, results, stats)
+    return results, stats
+
+
+# 判断新查询能否直接在上一次查询的结果中筛选得到：
+# 除属性范围外的条件全部相同，且每个属性的新范围都包含在旧范围内（未给出的属性视为无限制）。
+# 勾选提升效率时候选刻印取决于属性范围，前 K 名和 Pareto 前沿模式下收紧范围后需要补充新的组合，都不能复用；
+# 去除被压制的刻印时各属性的支配方向也必须不变
+def query_refines(previous_query, query):
+    previous = normalize_query(previous_query)
+    current = normalize_query(query)
+    if any(previous[key] != current[key] for key in current if key != "attribute_targets"):
+        return False
+    if current["improve_efficiency"] or current["top_k"] is not None or current["pareto_attrs"]:
+        return False
+
+    previous_targets = previous_query.get("attribute_targets") or {}
+    targets = query.get("attribute_targets") or {}
+    if not current["keep_dominated"] and dominance_directions(previous_targets) != dominance_directions(targets):
+        return False
+
+    unbounded = (float('-inf'), float('inf'))
+    for attr_index in set(previous_targets) | set(targets):
+        previous_min, previous_max = previous_targets.get(attr_index, unbounded)
+        target_min, target_max = targets.get(attr_index, unbounded)
+        if target_min < previous_min or target_max > previous_max:
+            return False
+    return True
+
+
+# 在上一次查询的结果中筛选出满足新属性范围的组合，并按新的受限属性重新计算“选项总和”
+# 新增的“置0”要求还需要三枚刻印各自的该项属性都为 0，attr_lookup 为返回 (排序后的 ID, 对应的属性矩阵) 的函数，
+# 只在需要时调用
+def refine_results(results, previous_query, query, attr_lookup=None):
+    previous_targets = previous_query.get("attribute_targets") or {}
+    targets = query.get("attribute_targets") or {}
+    valid = np.ones(len(results), dtype=bool)
+
+    for attr_index, (target_min, target_max) in targets.items():
+        column = results[ATTRIBUTES[attr_index]]
+        valid &= (target_min <= column) & (column <= target_max)
+
+        # 与 filter_zero_requirements 一致：每枚刻印的该项属性都必须为 0
+        if (target_min, target_max) == (0, 0) and previous_targets.get(attr_index) != (0, 0):
+            sorted_ids, attr_values = attr_lookup()
+            for id_column in ("ID1", "ID2", "ID3"):
+                rows = np.searchsorted(sorted_ids, results[id_column])
+                valid &= attr_values[rows, attr_index] == 0
+
+    refined = results[valid]
+    summed_attrs = [attr_index for attr_index in targets if targets[attr_index] != (0, 0)]
+    refined["选项总和"] = sum((refined[ATTRIBUTES[attr_index]] for attr_index in summed_attrs),
+                          np.zeros(len(refined), dtype=np.int64))
+    return refined
+
+
+# 一个用户的连续查询：新查询只是收紧了上一次的属性范围时，直接在上一次的结果中筛选，
+# 否则通过缓存（如果有）执行完整查询。给出 metrics_log 时每次查询的计时和计数追加到该 JSON Lines 文件
+class QuerySession:
+    def __init__(self, cache=None, paths=DEFAULT_PATHS, metrics_log=None):
+        self.cache = cache
+        self.paths = paths
+        self.metrics_log = metrics_log
+        self._last = None  # (数据版本, 查询参数, 结果数组, 统计信息)
+        self._table = None  # (数据版本, 刻印表)，在上次结果中筛选时使用
+
+    # 统计信息中的 "metrics" 为本次查询的 QueryMetrics
+    def run(self, query, progress_callback=None):
+        metrics = QueryMetrics()
+        results, stats = self._run(query, progress_callback, metrics)
+        if self.metrics_log:
+            write_metrics_log(self.metrics_log, query, stats, metrics)
+        return results, dict(stats, metrics=metrics)
+
+    def _run(self, query, progress_callback, metrics):
+        version = catalog_version(self.paths)
+        if self._last is not None:
+            last_version, last_query, last_results, last_stats = self._last
+            if last_version == version and query_refines(last_query, query):
+                mintmark_table = self._load_table(version, metrics)
+                with metrics.stage("refine"):
+                    results = refine_results(last_results, last_query, query,
+                                             lambda: self._attr_lookup(mintmark_table))
+                metrics.count("attribute_bounds", len(last_results) - len(results))
+                # 可行性预检查按收紧后的范围重新计算，范围无法满足时与完整查询一样给出提示
+                with metrics.stage("feasibility"):
+                    feasible, ranges = query_feasibility(mintmark_table, query)
+                stats = dict(last_stats, results=len(results), refined=True, feasible=feasible, ranges=ranges)
+                stats.pop("cached", None)
+                self._last = (version, query, results, stats)
+                return results, stats
+
+        results, stats = run_cached_query(query, cache=self.cache, progress_callback=progress_callback,
+                                          paths=self.paths, metrics=metrics)
+        self._last = (version, query, results, stats)
+        return results, stats
+
+    # 读取刻印表，数据版本不变时复用上次读取的结果
+    def _load_table(self, version, metrics):
+        if self._table is None or self._table[0] != version:
+            with metrics.stage("load"):
+                self._table = (version, load_catalog_mintmark_table(self.paths))
+        return self._table[1]
+
+    # 刻印 ID 到六项属性的查找表，只在新增“置0”要求时才需要
+    @staticmethod
+    def _attr_lookup(mintmark_table):
+        order = np.argsort(mintmark_table.ids, kind='stable')
+        return mintmark_table.ids[order], mintmark_table.attr_values[order]
+
+
+# 批量查询的缺省参数，与界面的默认勾选一致
+BATCH_QUERY_DEFAULTS = {
+    "monster_id_filter": "",
+    "quality_filter": ["5"],
+    "total_sum_filter": [">220"],
+    "filter_low_values": True,
+    "improve_efficiency": False,
+    "top_n": 200,
+    "symmetric": False,
+    "use_only1": True,
+    "keep_dominated": False,
+}
+
+
+# 批量查询和查询服务中字段的简写
+BATCH_QUERY_ALIASES = {
+    "monster_id": "monster_id_filter",
+    "quality": "quality_filter",
+    "total_sum": "total_sum_filter",
+    "only1": "use_only1",
+}
+
+
+# 将属性名或属性下标转换为属性下标，无法识别时抛出 ValueError
+def _attribute_index(attr, prefix=""):
+    if str(attr).isdigit() and int(attr) < len(ATTRIBUTES):
+        return int(attr)
+    if attr in ATTRIBUTES:
+        return ATTRIBUTES.index(attr)
+    raise ValueError(f"{prefix}未知属性 {attr}。")
+
+
+# 将字段值转换为整数，无法转换时抛出带有字段名的 ValueError
+def _to_int(value, label, prefix=""):
+    if isinstance(value, bool):
+        raise ValueError(f"{prefix}{label} 必须是整数。")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{prefix}{label} 必须是整数。")
+
+
+# 解析前 K 名模式的属性权重：JSON 对象 {"速度": 2, "体力": 0.5}（属性名或下标），
+# 或文本 "速度=2;体力=0.5"（分号或空格分隔）；返回 {属性下标: 权重}，无法解析时抛出 ValueError
+def parse_weights(value, name=""):
+    prefix = f"{name}: " if name else ""
+    if isinstance(value, str):
+        items = []
+        for item in value.replace(";", " ").replace(",", " ").split():
+            attr, separator, weight = item.partition("=")
+            if not separator:
+                raise ValueError(f"{prefix}无法识别的权重 {item}。")
+            items.append((attr.strip(), weight))
+    elif isinstance(value, dict):
+        items = list(value.items())
+    else:
+        raise ValueError(f"{prefix}weights 必须是 JSON 对象或“属性=权重”形式的文本。")
+
+    weights = {}
+    for attr, weight in items:
+        attr_index = _attribute_index(attr, prefix)
+        try:
+            weights[attr_index] = float(weight)
+        except (TypeError, ValueError):
+            raise ValueError(f"{prefix}{ATTRIBUTES[attr_index]} 的权重无效。")
+    return weights
+
+
+# 解析 Pareto 前沿比较的属性：列表 ["攻击", "速度"]（属性名或下标）或文本 "攻击;速度"，返回属性下标的列表
+def parse_attribute_list(value, name=""):
+    prefix = f"{name}: " if name else ""
+    if isinstance(value, str):
+        value = value.replace(";", " ").replace(",", " ").split()
+    elif not isinstance(value, (list, tuple)):
+        raise ValueError(f"{prefix}pareto_attrs 必须是属性列表或以分号分隔的文本。")
+
+    attr_indexes = []
+    for attr in value:
+        attr_index = _attribute_index(attr, prefix)
+        if attr_index not in attr_indexes:
+            attr_indexes.append(attr_index)
+    return attr_indexes
+
+
+# 将批量查询中的一条记录（JSON 对象或 CSV 的一行）转换为 (查询名称, run_query 的关键字参数)
+# 属性范围可以写成 "attribute_targets": {"速度": [129, null]}（属性名或下标），也可以写成 "速度_min"、"速度_max" 两列；
+# 其余字段与 run_query 的参数同名（或使用 BATCH_QUERY_ALIASES 中的简写），列表字段在 CSV 中用分号分隔，
+# weights 见 parse_weights，pareto_attrs 见 parse_attribute_list；未给出的字段使用 BATCH_QUERY_DEFAULTS
+def parse_batch_query(record, index=0):
+    def is_blank(value):
+        return value is None or (isinstance(value, str) and not value.strip())
+
+    def to_bool(value):
+        if isinstance(value, str):
+            return value.strip().lower() in ("1", "true", "yes", "y", "是")
+        return bool(value)
+
+    def to_list(key, value):
+        if isinstance(value, str):
+            return [item for item in value.replace(",", ";").split(";") if item.strip()]
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"{name}: {key} 必须是列表或以分号分隔的文本。")
+        return [str(item) for item in value]
+
+    record = {BATCH_QUERY_ALIASES.get(key, key): value for key, value in record.items()}
+    name = str(record.get("name") or f"query_{index + 1}")
+    query = dict(BATCH_QUERY_DEFAULTS)
+
+    targets = record.get("attribute_targets") or {}
+    if not isinstance(targets, dict):
+        raise ValueError(f"{name}: attribute_targets 必须是 {{属性: [最小值, 最大值]}} 形式的对象。")
+    ranges = {}
+    for attr, bounds in targets.items():
+        attr_index = _attribute_index(attr, f"{name}: ")
+        if not isinstance(bounds, (list, tuple)) or len(bounds) != 2:
+            raise ValueError(f"{name}: {ATTRIBUTES[attr_index]} 的范围必须是 [最小值, 最大值]。")
+        ranges[attr_index] = tuple(bounds)
+    for attr_index, attr in enumerate(ATTRIBUTES):
+        if f"{attr}_min" in record or f"{attr}_max" in record:
+            ranges[attr_index] = (record.get(f"{attr}_min"), record.get(f"{attr}_max"))
+
+    # 与界面相同：只给下限或上限时另一侧视为无限制
+    attribute_targets = {}
+    for attr_index, (min_value, max_value) in sorted(ranges.items()):
+        if is_blank(min_value) and is_blank(max_value):
+            continue
+        attr = ATTRIBUTES[attr_index]
+        min_value = float('-inf') if is_blank(min_value) else _to_int(min_value, f"{attr} 的最小值", f"{name}: ")
+        max_value = float('inf') if is_blank(max_value) else _to_int(max_value, f"{attr} 的最大值", f"{name}: ")
+        if min_value > max_value:
+            raise ValueError(f"{name}: {ATTRIBUTES[attr_index]} 的最小值不能大于最大值。")
+        attribute_targets[attr_index] = (min_value, max_value)
+    query["attribute_targets"] = attribute_targets
+
+    for key in ("filter_low_values", "improve_efficiency", "symmetric", "use_only1", "keep_dominated"):
+        if not is_blank(record.get(key)):
+            query[key] = to_bool(record[key])
+    for key in ("quality_filter", "total_sum_filter"):
+        if record.get(key) is not None:
+            query[key] = to_list(key, record[key])
+    if not is_blank(record.get("monster_id_filter")):
+        query["monster_id_filter"] = str(record["monster_id_filter"]).strip()
+    for key in ("top_n", "top_k"):
+        if not is_blank(record.get(key)):
+            query[key] = _to_int(record[key], key, f"{name}: ")
+    if not is_blank(record.get("weights")):
+        query["weights"] = parse_weights(record["weights"], name)
+    if not is_blank(record.get("pareto_attrs")):
+        query["pareto_attrs"] = parse_attribute_list(record["pareto_attrs"], name)
+    return name, query
+
+
+# 读取批量查询文件：.csv 按表头解析，其它扩展名按 JSONL（每行一个 JSON 对象）解析
+def load_batch_queries(file_path):
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if file_path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    return [parse_batch_query(record, index) for index, record in enumerate(records)]
+
+
+# 批量查询子进程中的刻印表和配对和索引缓存，由进程初始化函数加载一次
+_batch_context = {}
+
+
+def _init_batch_worker(paths):
+    _batch_context["paths"] = paths
+    _batch_context["mintmark_table"] = load_catalog_mintmark_table(paths)
+    _batch_context["index_cache"] = PairIndexCache()
+
+
+def _run_batch_query(query, engine):
+    metrics = QueryMetrics()
+    start = time.perf_counter()
+    results, stats = run_query(_batch_context["mintmark_table"], engine=engine,
+                               index_cache=_batch_context["index_cache"], metrics=metrics,
+                               paths=_batch_context["paths"], **query)
+    return results, stats, time.perf_counter() - start, metrics
+
+
+# 批量执行查询：刻印目录只加载一次，候选刻印相同的查询共用配对和索引；workers > 1 时用多个进程并行执行。
+# 每条查询的结果写入 output_dir 下的 <名称>.csv，和/或追加到 combined_file（首列为查询名称），
+# 按查询顺序边算边写。返回每条查询的名称、结果数、候选刻印数、耗时和各阶段耗时；
+# 给出 metrics_log 时每条查询的计时和计数追加到该 JSON Lines 文件
+def run_batch(queries, output_dir=None, combined_file=None, workers=1, engine="pair_index", paths=DEFAULT_PATHS,
+              log=print, metrics_log=None):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_batch_worker, initargs=(paths,))
+        outcomes = executor.map(_run_batch_query, [query for _, query in queries], [engine] * len(queries))
+    else:
+        _init_batch_worker(paths)
+        outcomes = (_run_batch_query(query, engine) for _, query in queries)
+
+    timings = []
+    combined = None
+    try:
+        if combined_file:
+            combined = open(combined_file, 'w', newline='', encoding='utf-8-sig')
+            combined_writer = csv.writer(combined, lineterminator=os.linesep)
+            combined_writer.writerow(["查询"] + RESULT_COLUMNS)
+
+        for index, ((name, query), (results, stats, seconds, metrics)) in enumerate(zip(queries, outcomes), 1):
+            if output_dir:
+                write_result_rows(iter_result_rows(results), os.path.join(output_dir, f"{name}.csv"))
+            if combined is not None:
+                combined_writer.writerows([name] + list(row) for row in iter_result_rows(results))
+
+            timing = {"name": name, "results": len(results), "candidates": stats["candidates"],
+                      "seconds": round(seconds, 4), "stages": metrics.as_dict()["timings"]}
+            timings.append(timing)
+            if metrics_log:
+                write_metrics_log(metrics_log, query, stats, metrics)
+            if log:
+                log(f"[{index}/{len(queries)}] {name}: {len(results)} 个组合，候选刻印 {stats['candidates']} 个，"
+                    f"耗时 {seconds:.3f} 秒")
+    finally:
+        if combined is not None:
+            combined.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return timings
+
+
+# 查询服务的常驻引擎：刻印表、配对和索引和查询结果缓存常驻内存，由处理请求的各个线程共用；
+# 数据版本变化时重新加载刻印表并丢弃旧的索引
+class QueryEngine:
+    def __init__(self, cache=None, engine="pair_index", paths=DEFAULT_PATHS, metrics_log=None):
+        self.cache = cache if cache is not None else QueryCache()
+        self.engine = engine
+        self.paths = paths
+        self.metrics_log = metrics_log
+        self._lock = threading.Lock()
+        self._version = None
+        self._mintmark_table = None
+        self._index_cache = None
+
+    def _load(self, metrics=None):
+        version = catalog_version(self.paths)
+        if version != self._version:
+            with _metric_stage(metrics, "load"):
+                self._mintmark_table = load_catalog_mintmark_table(self.paths)
+            self._index_cache = PairIndexCache()
+            self._version = version
+        return version, self._mintmark_table, self._index_cache
+
+    def status(self):
+        with self._lock:
+            version, mintmark_table, index_cache = self._load()
+            return {"catalog_version": version, "mintmarks": len(mintmark_table),
+                    "cached_queries": len(self.cache), "pair_indexes": len(index_cache)}
+
+    def run(self, query):
+        metrics = QueryMetrics()
+        with self._lock:
+            version, mintmark_table, index_cache = self._load(metrics)
+            with metrics.stage("cache"):
+                entry = self.cache.get(query, version)
+        if entry is not None:
+            results, stats = entry
+            stats = dict(stats, cached=True)
+        else:
+            results, stats = run_query(mintmark_table, engine=self.engine, index_cache=index_cache, metrics=metrics,
+                                       paths=self.paths, **query)
+            with self._lock, metrics.stage("cache"):
+                self.cache.put(query, version, results, stats)
+
+        if self.metrics_log:
+            write_metrics_log(self.metrics_log, query, stats, metrics)
+        return results, dict(stats, metrics=metrics.as_dict())
+
+    # 统计查询的结果数（见 query_count），不进行组合搜索
+    def count(self, query):
+        with self._lock:
+            _, mintmark_table, _ = self._load()
+        return query_count(mintmark_table, query, paths=self.paths)
+
+
+# 查询服务的请求处理：
+#   GET  /health  返回数据版本、刻印数和缓存情况
+#   POST /query   请求体为 JSON 查询（字段同批量查询），另可给出 offset、limit 分页；
+#                 给出 "stream": true 时以 JSON Lines 逐行返回从 offset 开始的全部结果
+#   POST /count   请求体同 /query，只返回结果数（见 query_count），不进行组合搜索
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MintmarkCalculator/1.0"
+
+    def send_json(self, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            self.send_json(404, {"error": f"未知路径 {self.path}"})
+            return
+        self.send_json(200, self.server.engine.status())
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if path not in ("/query", "/count"):
+            self.send_json(404, {"error": f"未知路径 {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            record = json.loads(self.rfile.read(length).decode('utf-8') or "{}")
+            if not isinstance(record, dict):
+                raise ValueError("请求体必须是 JSON 对象。")
+            name, query = parse_batch_query(record)
+            offset = max(_to_int(record.get("offset", 0), "offset"), 0)
+            limit = min(max(_to_int(record.get("limit", SERVICE_PAGE_SIZE), "limit"), 0), SERVICE_MAX_PAGE_SIZE)
+        except (ValueError, TypeError, AttributeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        if path == "/count":
+            self.send_json(200, dict(self.server.engine.count(query), name=name))
+            return
+        results, stats = self.server.engine.run(query)
+        header = {"name": name, "total": len(results), "columns": RESULT_COLUMNS, "stats": stats}
+
+        if record.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n")
+            for row in iter_result_rows(results[offset:]):
+                self.wfile.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b"\n")
+            return
+
+        page = results[offset:offset + limit]
+        next_offset = offset + len(page) if offset + len(page) < len(results) else None
+        self.send_json(200, dict(header, offset=offset, limit=limit, next_offset=next_offset,
+                                 rows=[list(row) for row in iter_result_rows(page)]))
+
+
+# 服务繁忙时的请求处理：照常读取请求行、请求头和请求体后返回 503。
+# 不读取请求就关闭连接时，仍在发送请求体的客户端会收到 Broken pipe 而不是 503
+class BusyRequestHandler(QueryRequestHandler):
+    timeout = SERVICE_REJECT_TIMEOUT
+
+    def reject(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        if length > 0:
+            self.rfile.read(length)
+        self.send_json(503, {"error": "服务繁忙，请稍后重试。"}, headers=[("Retry-After", "1")])
+
+    do_GET = reject
+    do_POST = reject
+
+
+# 查询服务：用固定数量的线程处理请求，排队的请求超过 queue_size 时直接返回 503
+class QueryHTTPServer(HTTPServer):
+    def __init__(self, server_address, engine, threads=SERVICE_THREADS, queue_size=SERVICE_QUEUE_SIZE):
+        super().__init__(server_address, QueryRequestHandler)
+        self.engine = engine
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._slots = threading.BoundedSemaphore(threads + queue_size)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                BusyRequestHandler(request, client_address, self)
+            except OSError:
+                pass
+            finally:
+                self.shutdown_request(request)
+            return
+        self._executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+# 启动查询服务，阻塞直到 Ctrl+C
+def serve(host="127.0.0.1", port=SERVICE_PORT, threads=SERVICE_THREADS, queue_size=SERVICE_QUEUE_SIZE,
+          engine="pair_index", metrics_log=None, paths=DEFAULT_PATHS):
+    server = QueryHTTPServer((host, port), QueryEngine(engine=engine, paths=paths, metrics_log=metrics_log),
+                             threads=threads, queue_size=queue_size)
+    print(f"查询服务已启动：http://{host}:{server.server_address[1]}/（POST /query，GET /health）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# 命令行参数：界面、批量查询和查询服务共用
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="刻印筛选工具")
+    parser.add_argument("--data-dir", default=FOLDER_PATH, help="数据文件夹")
+    parser.add_argument("--batch", metavar="QUERIES", help="批量查询文件（JSONL 或 CSV），给出时不启动界面；默认去除被同系列刻印完全压制的刻印"
+                             "（keep_dominated 为 false），需要完整结果时在查询中写 keep_dominated: true")
+    parser.add_argument("--output-dir", help="每条查询的结果写入该目录下的 <名称>.csv（默认 batch_results）")
+    parser.add_argument("--combined", metavar="FILE", help="把所有查询的结果写入同一个 CSV 文件")
+    parser.add_argument("--workers", type=int, default=1, help="并行执行查询的进程数")
+    parser.add_argument("--engine", default="pair_index", choices=["pair_index", "branch_bound", "numpy", "python"],
+                        help="组合搜索引擎")
+    parser.add_argument("--serve", action="store_true", help="不启动界面，启动本地 JSON 查询服务")
+    parser.add_argument("--host", default="127.0.0.1", help="查询服务监听的地址")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="查询服务监听的端口")
+    parser.add_argument("--threads", type=int, default=SERVICE_THREADS, help="查询服务处理请求的线程数")
+    parser.add_argument("--queue-size", type=int, default=SERVICE_QUEUE_SIZE, help="查询服务排队等待的请求数上限")
+    parser.add_argument("--metrics-log", metavar="FILE", help="把每次查询的各阶段耗时和淘汰计数追加到 JSON Lines 文件")
+    parser.add_argument("--profile", metavar="FILE", help="在 cProfile 下执行批量查询，统计结果保存到该文件")
+    return parser
+
+
+# 不启动界面的命令行入口：执行批量查询或启动查询服务；两者都没有给出时返回 False
+def run_headless(args, paths=None):
+    paths = paths or DataPaths(args.data_dir)
+    if args.batch:
+        prepare_data(paths)
+        output_dir = args.output_dir or (None if args.combined else "batch_results")
+        queries = load_batch_queries(args.batch)
+        start = time.perf_counter()
+        batch = partial(run_batch, queries, output_dir=output_dir, combined_file=args.combined, workers=args.workers,
+                        engine=args.engine, paths=paths, metrics_log=args.metrics_log)
+        if args.profile:
+            profile_call(args.profile, batch)
+        else:
+            batch()
+        print(f"共 {len(queries)} 条查询，总耗时 {time.perf_counter() - start:.3f} 秒")
+        return True
+    if args.serve:
+        prepare_data(paths)
+        serve(args.host, args.port, threads=args.threads, queue_size=args.queue_size, engine=args.engine,
+              metrics_log=args.metrics_log, paths=paths)
+        return True
+    return False
+
+
+if __name__ == "__main__":
+    if not run_headless(build_arg_parser().parse_args()):
+        print("请使用 --batch 或 --serve；启动界面请运行 calculator.py。")
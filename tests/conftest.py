@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import write_mintmark_data  # noqa: E402
+
+
+# 随机刻印行（字段与 mintmark_data.csv 相同）：每枚刻印随机两到四项属性非零，系列从 1 到 classes 中选取
+def random_mintmark_rows(count, seed=0, classes=6, low=10, high=120, start_id=50001):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for k in range(count):
+        values = [0] * 6
+        for attr_index in rng.choice(6, size=int(rng.integers(2, 5)), replace=False):
+            values[attr_index] = int(rng.integers(low, high))
+        rows.append({
+            "id": str(start_id + k),
+            "quality": "5",
+            "description": f"刻印{k}",
+            "total_attr_value": " ".join(str(value) for value in values),
+            "total_sum": str(sum(values)),
+            "monster_id": "",
+            "mintmark_class": str(int(rng.integers(1, classes + 1))),
+        })
+    return rows
+
+
+@pytest.fixture
+def mintmark_rows():
+    return random_mintmark_rows
+
+
+# 由 40 枚随机刻印生成的数据文件夹（JSON、CSV 和二进制目录）
+@pytest.fixture
+def data_paths(tmp_path):
+    return write_mintmark_data(random_mintmark_rows(40, seed=1), str(tmp_path / "data"))
+
+
+# 把限1刻印 ID 写入数据文件夹，返回该 DataPaths
+@pytest.fixture
+def with_only1_ids():
+    def write(paths, ids):
+        os.makedirs(paths.folder, exist_ok=True)
+        with open(paths.only1_ids_file, 'w', encoding='utf-8-sig') as f:
+            f.writelines(f"{mintmark_id}\n" for mintmark_id in ids)
+        return paths
+    return write
@@ -0,0 +1,32 @@
+from math import comb
+
+import benchmark
+import mintmark_core
+
+INF = float('inf')
+
+
+# 各阶段的输入等于上一阶段的输出；组合搜索的输入是刻印数，三元组总数单独记录
+def test_stage_counts_chain(data_paths):
+    query = {"attribute_targets": {0: (40, INF), 5: (60, 330)}, "keep_dominated": False}
+    stages = benchmark.run_stages(data_paths, query, "pair_index")
+    assert list(stages) == benchmark.STAGES
+    for previous, stage in zip(benchmark.STAGES[1:], benchmark.STAGES[2:]):
+        assert stages[stage]["in"] == stages[previous]["out"]
+
+    search = stages["find_initial_combinations"]
+    assert search["theoretical_triples"] == comb(search["in"] + 2, 3)
+    results, _ = mintmark_core.run_query(mintmark_core.load_catalog_mintmark_table(data_paths), paths=data_paths,
+                                         **query)
+    assert stages["validate_combinations"]["out"] == len(results)
+
+
+def test_compare_with_baseline_reports_regressions():
+    def report(rows, seconds):
+        stages = {stage: {"seconds": seconds, "peak_bytes": 1000} for stage in benchmark.STAGES}
+        return {"results": [{"scale": 1, "query": "q", "rows": rows, "stages": stages}]}
+
+    assert benchmark.compare_with_baseline(report(10, 1.0), report(10, 1.0)) == []
+    assert benchmark.compare_with_baseline(report(10, 1.1), report(10, 1.0)) == []
+    assert len(benchmark.compare_with_baseline(report(10, 1.5), report(10, 1.0))) == len(benchmark.STAGES)
+    assert len(benchmark.compare_with_baseline(report(11, 1.0), report(10, 1.0))) == 1
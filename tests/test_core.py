@@ -0,0 +1,56 @@
+import numpy as np
+
+import mintmark_core
+
+
+def table_columns(table):
+    return (table.ids.tolist(), table.qualities.tolist(), table.descriptions.tolist(),
+            table.mintmark_classes.tolist(), table.monster_ids.tolist(), table.total_sums.tolist(),
+            table.attr_values.tolist(), table.class_codes.tolist(), table.description_codes.tolist())
+
+
+# 二进制目录与 CSV 文件得到相同的刻印列表和刻印表
+def test_catalog_matches_csv(data_paths):
+    csv_list = mintmark_core.load_mintmark_list(data_paths.data_file)
+    assert mintmark_core.load_catalog_mintmark_list(data_paths) == csv_list
+    assert table_columns(mintmark_core.load_catalog_mintmark_table(data_paths)) == \
+        table_columns(mintmark_core.build_mintmark_table(csv_list))
+
+
+def test_table_round_trip(mintmark_rows):
+    rows = mintmark_rows(20, seed=5)
+    rows[3]["mintmark_class"] = ""
+    rows[4]["monster_id"] = "3001"
+    table = mintmark_core.build_mintmark_table(rows)
+    assert table.to_mintmark_list() == rows
+    assert table_columns(mintmark_core.build_mintmark_table(table.to_mintmark_list())) == table_columns(table)
+
+
+def test_build_skips_unparsable_rows(mintmark_rows):
+    rows = mintmark_rows(5, seed=6)
+    rows[1]["total_attr_value"] = "1 2 3"
+    rows[2]["id"] = "abc"
+    rows[3]["total_sum"] = ""
+    table = mintmark_core.build_mintmark_table(rows)
+    assert table.ids.tolist() == [int(rows[0]["id"]), int(rows[4]["id"])]
+    assert table.attr_values.shape == (2, 6)
+    assert len(mintmark_core.build_mintmark_table([])) == 0
+
+
+# 系列编码和描述编码只表示相等关系；子表保留原表的编码
+def test_codes_and_subset(mintmark_rows):
+    rows = mintmark_rows(12, seed=8, classes=3)
+    rows[5]["description"] = rows[0]["description"]
+    table = mintmark_core.build_mintmark_table(rows)
+    for i in range(len(rows)):
+        for j in range(len(rows)):
+            assert (table.class_codes[i] == table.class_codes[j]) == \
+                (rows[i]["mintmark_class"] == rows[j]["mintmark_class"])
+            assert (table.description_codes[i] == table.description_codes[j]) == \
+                (rows[i]["description"] == rows[j]["description"])
+
+    indices = np.array([5, 0, 7])
+    subset = table.subset(indices)
+    assert subset.to_mintmark_list() == [rows[index] for index in indices]
+    assert subset.class_codes.tolist() == table.class_codes[indices].tolist()
+    assert subset.description_codes[0] == subset.description_codes[1]
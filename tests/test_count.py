@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import mintmark_core
+
+INF = float('inf')
+
+TARGETS = [
+    {0: (80, INF), 4: (60, INF)},
+    {1: (-INF, 90), 5: (100, 260)},
+    {3: (0, 0), 0: (50, INF)},
+]
+
+
+def count_arrays(table):
+    return (table.attr_values, table.ids, table.class_codes, table.description_codes,
+            np.zeros(len(table), dtype=bool))
+
+
+# 小表直接枚举，较大的表用直方图计数，两种精确路径都与完整搜索的结果数一致
+@pytest.mark.parametrize("count", [30, 120])
+@pytest.mark.parametrize("symmetric", [False, True])
+@pytest.mark.parametrize("use_only1", [False, True])
+def test_exact_count_equals_full_search(mintmark_rows, with_only1_ids, tmp_path, count, symmetric, use_only1):
+    rows = mintmark_rows(count, seed=count, classes=4)
+    for row in rows[::11]:
+        row["description"] = "同名刻印"
+    paths = with_only1_ids(mintmark_core.DataPaths(str(tmp_path)), [row["id"] for row in rows[::6]])
+    table = mintmark_core.build_mintmark_table(rows)
+
+    for attribute_targets in TARGETS:
+        query = dict(attribute_targets=attribute_targets, symmetric=symmetric, use_only1=use_only1,
+                     keep_dominated=True)
+        results, _ = mintmark_core.run_query(table, paths=paths, **query)
+        counted = mintmark_core.query_count(table, query, paths=paths)
+        assert counted["exact"]
+        assert counted["count"] == len(results)
+
+
+# 抽样估计（把网格上限设为 1 强制抽样）：固定种子的估计值与真实结果数之差不超过报告的误差
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_sampled_estimate_brackets_true_count(mintmark_rows, tmp_path, seed):
+    table = mintmark_core.build_mintmark_table(mintmark_rows(150, seed=7, classes=5))
+    attribute_targets = {0: (80, INF), 4: (40, INF), 5: (-INF, 250)}
+    results, _ = mintmark_core.run_query(table, attribute_targets, keep_dominated=True,
+                                         paths=mintmark_core.DataPaths(str(tmp_path)))
+
+    estimate, error = mintmark_core.count_combinations(*count_arrays(table), attribute_targets, max_cells=1,
+                                                       seed=seed)
+    assert error is not None and error > 0
+    assert abs(estimate - len(results)) <= error
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import mintmark_core
+
+INF = float('inf')
+
+TARGETS = [
+    {0: (60, INF), 4: (40, INF)},
+    {1: (-INF, 80), 5: (70, INF)},
+    {0: (40, INF), 5: (100, 300)},
+    {2: (30, INF), 3: (0, 0)},
+]
+
+
+# 在各受限属性上 q 不差于 p：只给下限时不小于，只给上限时不大于，上下限都给出时相等
+def weakly_dominates(pruned, row, directions):
+    ok = np.ones(len(pruned), dtype=bool)
+    for attr_index, direction in directions.items():
+        column = np.asarray(pruned[mintmark_core.ATTRIBUTES[attr_index]])
+        value = row[mintmark_core.ATTRIBUTES[attr_index]]
+        ok &= column >= value if direction == 1 else column <= value if direction == -1 else column == value
+    return ok.any()
+
+
+# 去除被压制的刻印是安全的：完整结果中的每个组合都被去除后的结果中的某个组合弱压制
+@pytest.mark.parametrize("symmetric", [False, True])
+@pytest.mark.parametrize("use_only1", [False, True])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_pruned_results_weakly_dominate_full_results(mintmark_rows, with_only1_ids, tmp_path, symmetric, use_only1,
+                                                     seed):
+    rows = mintmark_rows(45, seed=seed, classes=3)
+    # 同名刻印不能作为压制者，否则换入后可能组成三枚同名的组合
+    for row in rows[::6]:
+        row["description"] = "同名刻印"
+    paths = with_only1_ids(mintmark_core.DataPaths(str(tmp_path)), [row["id"] for row in rows[::8]])
+    table = mintmark_core.build_mintmark_table(rows)
+
+    for attribute_targets in TARGETS:
+        query = dict(symmetric=symmetric, use_only1=use_only1, paths=paths)
+        full, _ = mintmark_core.run_query(table, attribute_targets, keep_dominated=True, **query)
+        pruned, _ = mintmark_core.run_query(table, attribute_targets, keep_dominated=False, **query)
+        directions = mintmark_core.dominance_directions(attribute_targets)
+
+        assert set(map(tuple, pruned.tolist())) <= set(map(tuple, full.tolist()))
+        assert len(pruned) > 0 or len(full) == 0
+        for row in full:
+            assert weakly_dominates(pruned, row, directions)
+
+
+def test_batch_default_prunes_dominated_mintmarks():
+    assert mintmark_core.BATCH_QUERY_DEFAULTS["keep_dominated"] is False
+    assert "keep_dominated" in mintmark_core.build_arg_parser().format_help()
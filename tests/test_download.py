@@ -0,0 +1,114 @@
+import functools
+import json
+import os
+import shutil
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import mintmark_core
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def entry(mintmark_id, mintmark_class, attrs, description=None):
+    return {"ID": mintmark_id, "Type": 3, "Quality": 5, "MintmarkClass": mintmark_class,
+            "MaxAttriValue": attrs, "Des": description or f"刻印{mintmark_id}"}
+
+
+OLD_ENTRIES = [
+    entry(40001, 1, "40 0 0 0 90 100"),
+    entry(40002, 2, "0 50 0 60 0 120"),
+    entry(40003, 1, "60 0 30 0 0 140"),
+    entry(40004, 4, "0 0 70 0 80 90"),
+    {"ID": 10001, "Type": 0, "Quality": 1, "Arg": "5 0 0 0 0 0", "Des": "微型攻击刻印"},
+]
+# 新数据：删除 40002，修改 40003（属性和系列，改为限1系列），新增 40005（限1系列）
+NEW_ENTRIES = [
+    OLD_ENTRIES[0],
+    entry(40003, 4, "65 0 30 0 0 140"),
+    OLD_ENTRIES[3],
+    entry(40005, 4, "0 0 0 90 90 90"),
+    OLD_ENTRIES[4],
+]
+
+
+# 本地的刻印数据服务：version.json 指向带版本号的 mintmark JSON
+@pytest.fixture
+def mintmark_server(tmp_path):
+    root = tmp_path / "server"
+    root.mkdir()
+
+    def publish(version, entries):
+        (root / f"mintmark_{version}.json").write_text(
+            json.dumps({"MintMarks": {"MintMark": entries}}, ensure_ascii=False), encoding="utf-8")
+        (root / "version.json").write_text(json.dumps(
+            {"files": {"resource": {"config": {"xml": {"mintmark.json": f"mintmark_{version}.json"}}}}}),
+            encoding="utf-8")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    yield publish, functools.partial(mintmark_core.download_and_store_json, version_url=base_url + "version.json",
+                                     base_url=base_url)
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+# 新的数据文件夹：限1系列为 4，并已创建缺失刻印 ID 文件
+def new_paths(folder):
+    paths = mintmark_core.DataPaths(str(folder))
+    os.makedirs(paths.folder)
+    with open(paths.only1_class_file, 'w', encoding='utf-8') as f:
+        f.write("4\n")
+    mintmark_core.create_missing_mintmark_ids_file(paths)
+    return paths
+
+
+def read_file(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def test_download_skips_same_version_and_updates_by_diff(tmp_path, mintmark_server, capsys):
+    publish, download = mintmark_server
+    paths = new_paths(tmp_path / "data")
+
+    publish("v1", OLD_ENTRIES)
+    assert download(paths)
+    mintmark_core.convert_json_to_csv(paths)
+    mintmark_core.generate_only1_mintmark_ids(paths)
+    assert mintmark_core.catalog_is_current(paths)
+
+    # 版本未变：不下载，文件保持不变
+    before = read_file(paths.json_file), read_file(paths.data_file), read_file(paths.catalog_file)
+    assert not download(paths)
+    assert (read_file(paths.json_file), read_file(paths.data_file), read_file(paths.catalog_file)) == before
+
+    # 新版本：按差异更新后与由新 JSON 完整重新生成的结果一致
+    publish("v2", NEW_ENTRIES)
+    capsys.readouterr()
+    assert download(paths)
+    assert "新增 1 个，删除 1 个，修改 1 个" in capsys.readouterr().out
+    assert mintmark_core.catalog_is_current(paths)
+
+    reference = new_paths(tmp_path / "reference")
+    shutil.copyfile(paths.json_file, reference.json_file)
+    mintmark_core.convert_json_to_csv(reference)
+    mintmark_core.generate_only1_mintmark_ids(reference)
+
+    assert read_file(paths.data_file) == read_file(reference.data_file)
+    assert mintmark_core.load_only1_mintmark_ids(paths) == mintmark_core.load_only1_mintmark_ids(reference) \
+        == ["40003", "40004", "40005"]
+    with np.load(paths.catalog_file) as updated, np.load(reference.catalog_file) as regenerated:
+        assert sorted(updated.files) == sorted(regenerated.files)
+        for key in updated.files:
+            if key != "stamp":
+                assert np.array_equal(updated[key], regenerated[key]), key
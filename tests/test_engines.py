@@ -0,0 +1,48 @@
+import pytest
+
+import mintmark_core
+
+INF = float('inf')
+
+# 各引擎（以及多进程分片）与逐个组合遍历的 python 引擎比较
+ENGINES = [("numpy", 1), ("pair_index", 1), ("branch_bound", 1), ("numpy", 2), ("branch_bound", 2)]
+
+TARGETS = [
+    {0: (60, INF)},
+    {0: (40, INF), 4: (30, INF)},
+    {1: (-INF, 90), 5: (50, 220)},
+    {0: (30, INF), 2: (0, 0)},
+    {3: (-INF, INF)},
+]
+
+
+# 小规模的随机刻印：只有三个系列（容易出现三枚同系列），一部分刻印同名，另有几枚刻印的 ID 与前面的刻印重复
+def small_rows(mintmark_rows, seed):
+    rows = mintmark_rows(36, seed=seed, classes=3)
+    for row in rows[::9]:
+        row["description"] = "同名刻印"
+    for source, row in zip(rows[:4], rows[-4:]):
+        row["id"] = source["id"]
+    return rows
+
+
+@pytest.mark.parametrize("engine, workers", ENGINES)
+@pytest.mark.parametrize("symmetric", [False, True])
+@pytest.mark.parametrize("use_only1", [False, True])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_engine_matches_python(mintmark_rows, with_only1_ids, tmp_path, engine, workers, symmetric, use_only1, seed):
+    rows = small_rows(mintmark_rows, seed)
+    # 限1刻印中包括 ID 重复的刻印
+    paths = with_only1_ids(mintmark_core.DataPaths(str(tmp_path)), [row["id"] for row in rows[:6:2]])
+    table = mintmark_core.build_mintmark_table(rows)
+
+    found = 0
+    for attribute_targets in TARGETS:
+        expected = mintmark_core.find_initial_combinations(table, attribute_targets, symmetric=symmetric,
+                                                           use_only1=use_only1, engine="python", paths=paths)
+        results = mintmark_core.find_initial_combinations(table, attribute_targets, symmetric=symmetric,
+                                                          use_only1=use_only1, engine=engine, workers=workers,
+                                                          paths=paths)
+        assert results.tolist() == expected.tolist()
+        found += len(expected)
+    assert found > 0
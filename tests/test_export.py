@@ -0,0 +1,64 @@
+import csv
+import os
+
+import mintmark_core
+
+INF = float('inf')
+
+
+def read_rows(file_path):
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.reader(f))
+
+
+# 多次导出使历史记录超过上限：轮换出的旧文件不超过 backups 个，每个文件都有表头，总大小有界
+def test_export_rotates_process_history(mintmark_rows, tmp_path):
+    table = mintmark_core.build_mintmark_table(mintmark_rows(30, seed=3))
+    results, _ = mintmark_core.run_query(table, {0: (60, INF)}, keep_dominated=True,
+                                         paths=mintmark_core.DataPaths(str(tmp_path)))
+    chunks = [results[start:start + 50] for start in range(0, 500, 50)]
+    assert all(len(chunk) == 50 for chunk in chunks)
+
+    process_path = str(tmp_path / "process.csv")
+    # 单次导出写入的最大字节数（含表头）
+    chunk_size = 0
+    for chunk in chunks:
+        mintmark_core.export_results(chunk, csv_path=None, excel_path=None, process_path=process_path)
+        chunk_size = max(chunk_size, os.path.getsize(process_path))
+        os.remove(process_path)
+    max_bytes, backups = chunk_size * 2, 2
+
+    progress = []
+    for chunk in chunks:
+        mintmark_core.export_results(chunk, csv_path=None, excel_path=None, process_path=process_path,
+                                     progress_callback=lambda done, total: progress.append((done, total)),
+                                     process_max_bytes=max_bytes, process_backups=backups)
+    assert progress[-1] == (50, 50)
+
+    root = str(tmp_path / "process")
+    files = [process_path] + [f"{root}.{index}.csv" for index in range(1, backups + 1)]
+    assert all(os.path.exists(file_path) for file_path in files)
+    assert not os.path.exists(f"{root}.{backups + 1}.csv")
+    # 轮换在追加之前进行，所以每个文件最多比上限多出一次导出
+    sizes = [os.path.getsize(file_path) for file_path in files]
+    assert all(size < max_bytes + chunk_size for size in sizes)
+    assert sum(sizes) < (backups + 1) * (max_bytes + chunk_size)
+
+    # 从最旧到最新依次拼接，得到的是最近若干次导出的行，顺序不变
+    kept = []
+    for file_path in reversed(files):
+        rows = read_rows(file_path)
+        assert rows[0] == mintmark_core.RESULT_COLUMNS
+        kept += rows[1:]
+    exported = [list(map(str, row)) for row in mintmark_core.iter_result_rows(results[:500])]
+    assert kept == exported[len(exported) - len(kept):]
+    assert len(kept) < len(exported)
+
+
+def test_rotate_without_backups_discards_history(tmp_path):
+    process_path = str(tmp_path / "process.csv")
+    with open(process_path, 'w', encoding='utf-8') as f:
+        f.write("x" * 100)
+    assert not mintmark_core.rotate_process_file(process_path, max_bytes=101, backups=0)
+    assert mintmark_core.rotate_process_file(process_path, max_bytes=100, backups=0)
+    assert os.listdir(str(tmp_path)) == []
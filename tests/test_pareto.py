@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import mintmark_core
+
+
+# O(n²) 的逐对比较：q 压制 p 当且仅当 q 在每一列都不小于 p 且至少一列更大
+def brute_force_front(values):
+    no_worse = (values[None, :, :] >= values[:, None, :]).all(axis=2)
+    better = (values[None, :, :] > values[:, None, :]).any(axis=2)
+    return ~(no_worse & better).any(axis=1)
+
+
+# 值域很小的随机整数点，包含大量相同的值和完全相同的点
+@pytest.mark.parametrize("columns", [1, 2, 3, 4, 6])
+@pytest.mark.parametrize("seed", range(5))
+def test_front_matches_brute_force(columns, seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 6, size=(300, columns)).astype(np.int64)
+    values = np.concatenate([values, values[:40]])
+    expected = brute_force_front(values)
+    for block_size, segment_size in ((7, 1), (16, 3), (4096, 64)):
+        mask = mintmark_core.pareto_front_mask(values, block_size=block_size, segment_size=segment_size)
+        assert mask.tolist() == expected.tolist()
+
+
+# 负相关的点让前沿很大，跨越多个块和分段
+def test_large_front_across_blocks():
+    rng = np.random.default_rng(9)
+    first = rng.integers(0, 50, size=400)
+    values = np.column_stack([first, 50 - first + rng.integers(0, 3, size=400), rng.integers(0, 3, size=400)])
+    expected = brute_force_front(values)
+    assert expected.sum() > 20
+    mask = mintmark_core.pareto_front_mask(values.astype(np.int64), block_size=8, segment_size=2)
+    assert mask.tolist() == expected.tolist()
+
+
+def test_empty_input():
+    assert mintmark_core.pareto_front_mask(np.empty((0, 3), dtype=np.int64)).tolist() == []
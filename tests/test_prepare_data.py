@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mintmark_core  # noqa: E402
+
+MINTMARKS = [
+    {"ID": 40001, "Type": 3, "Quality": 2, "MaxAttriValue": "0 0 32 0 0 70", "MintmarkClass": 1, "Des": "睿智"},
+    {"ID": 40002, "Type": 3, "Quality": 2, "MaxAttriValue": "32 0 0 0 0 70", "MintmarkClass": 1, "Des": "狂战"},
+    {"ID": 40003, "Type": 3, "Quality": 5, "MaxAttriValue": "40 0 0 0 90 60", "ExtraAttriValue": "5 0 0 0 5 5",
+     "MintmarkClass": 2, "Des": "迅捷"},
+    {"ID": 10001, "Type": 0, "Quality": 1, "Arg": "5 0 0 0 0 0", "Des": "微型攻击刻印"},
+]
+
+
+# 首次安装：空的数据文件夹在 prepare_data 之后应当得到与当前文件一致的二进制目录
+def test_prepare_data_on_empty_folder_leaves_catalog_current(tmp_path, monkeypatch):
+    server = tmp_path / "server"
+    server.mkdir()
+    (server / "mintmark_abc123.json").write_text(
+        json.dumps({"MintMarks": {"MintMark": MINTMARKS}}, ensure_ascii=False), encoding="utf-8")
+    (server / "version.json").write_text(
+        json.dumps({"files": {"resource": {"config": {"xml": {"mintmark.json": "mintmark_abc123.json"}}}}}),
+        encoding="utf-8")
+    monkeypatch.setattr(mintmark_core, "download_and_store_json",
+                        partial(mintmark_core.download_and_store_json,
+                                version_url=(server / "version.json").as_uri(),
+                                base_url=server.as_uri() + "/"))
+
+    paths = mintmark_core.DataPaths(str(tmp_path / "data"))
+    mintmark_core.prepare_data(paths)
+
+    assert os.path.exists(paths.missing_ids_file)
+    assert os.path.exists(paths.only1_class_file)
+    assert mintmark_core.catalog_is_current(paths)
+    assert sorted(int(row["id"]) for row in mintmark_core.load_catalog_mintmark_list(paths)) == [40001, 40002, 40003]
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import mintmark_core
+
+INF = float('inf')
+
+
+@pytest.fixture
+def results(mintmark_rows, tmp_path):
+    table = mintmark_core.build_mintmark_table(mintmark_rows(30, seed=4))
+    results, _ = mintmark_core.run_query(table, {0: (60, INF)}, keep_dominated=True,
+                                         paths=mintmark_core.DataPaths(str(tmp_path)))
+    assert len(results) > 200
+    return results
+
+
+def query(minimum):
+    return {"attribute_targets": {0: (minimum, INF)}}
+
+
+def test_memory_tier_evicts_least_recently_used(results):
+    cache = mintmark_core.QueryCache(max_entries=2, max_rows=10 ** 6)
+    cache.put(query(1), "v", results[:10], {})
+    cache.put(query(2), "v", results[:20], {})
+    assert cache.get(query(1), "v") is not None  # query(1) 变为最近使用
+    cache.put(query(3), "v", results[:30], {})
+    assert len(cache) == 2
+    assert cache.get(query(2), "v") is None
+    assert len(cache.get(query(1), "v")[0]) == 10
+    assert len(cache.get(query(3), "v")[0]) == 30
+
+
+def test_memory_tier_row_limit(results):
+    cache = mintmark_core.QueryCache(max_entries=10, max_rows=100)
+    cache.put(query(1), "v", results[:60], {})
+    cache.put(query(2), "v", results[:60], {})
+    assert cache.get(query(1), "v") is None and cache.get(query(2), "v") is not None
+    # 单个结果超过行数上限时不放入内存
+    cache.put(query(3), "v", results[:101], {})
+    assert cache.get(query(3), "v") is None
+
+
+def test_disk_tier_round_trip_and_size_cap(results, tmp_path):
+    disk_dir = str(tmp_path / "cache")
+    cache = mintmark_core.QueryCache(max_entries=1, disk_dir=disk_dir, disk_limit=10 ** 9)
+    cache.put(query(1), "v", results, {"results": len(results)})
+    entry = mintmark_core.QueryCache(disk_dir=disk_dir).get(query(1), "v")
+    assert entry is not None
+    assert entry[0].tolist() == results.tolist() and entry[1] == {"results": len(results)}
+
+    size = os.path.getsize(os.path.join(disk_dir, os.listdir(disk_dir)[0]))
+    cache = mintmark_core.QueryCache(max_entries=1, disk_dir=disk_dir, disk_limit=int(size * 2.5))
+    for minimum in range(2, 7):
+        cache.put(query(minimum), "v", results, {})
+    files = [os.path.join(disk_dir, name) for name in os.listdir(disk_dir)]
+    assert len(files) == 2
+    assert sum(os.path.getsize(file_path) for file_path in files) <= size * 2.5
+    # 保留的是最近写入的两个查询
+    fresh = mintmark_core.QueryCache(disk_dir=disk_dir)
+    assert fresh.get(query(6), "v") is not None and fresh.get(query(5), "v") is not None
+    assert fresh.get(query(2), "v") is None
+
+
+def test_disk_tier_skips_large_results(results, tmp_path):
+    disk_dir = str(tmp_path / "cache")
+    cache = mintmark_core.QueryCache(disk_dir=disk_dir, disk_max_rows=100)
+    cache.put(query(1), "v", results[:100], {})
+    cache.put(query(2), "v", results[:101], {})
+    assert len(os.listdir(disk_dir)) == 1
+    fresh = mintmark_core.QueryCache(disk_dir=disk_dir)
+    assert fresh.get(query(1), "v") is not None and fresh.get(query(2), "v") is None
+
+
+def test_invalidation_on_query_and_catalog_change(data_paths, tmp_path):
+    cache = mintmark_core.QueryCache(disk_dir=str(tmp_path / "cache"))
+    base = dict(query(60), keep_dominated=True)
+    first, stats = mintmark_core.run_cached_query(base, cache=cache, paths=data_paths)
+    assert not stats.get("cached")
+    assert mintmark_core.run_cached_query(base, cache=cache, paths=data_paths)[1].get("cached")
+
+    # 查询参数变化（包括只影响结果的字段）时不命中
+    for changed in (query(61), dict(base, symmetric=True), dict(base, keep_dominated=False)):
+        assert not mintmark_core.run_cached_query(changed, cache=cache, paths=data_paths)[1].get("cached")
+
+    # 缺失刻印 ID 文件变化后二进制目录的版本标记改变，内存和磁盘缓存都被清空
+    removed_id = str(mintmark_core.load_catalog_mintmark_table(data_paths).ids[0])
+    with open(data_paths.missing_ids_file, 'w', encoding='utf-8') as f:
+        f.write(removed_id + "\n")
+    results, stats = mintmark_core.run_cached_query(base, cache=cache, paths=data_paths)
+    assert not stats.get("cached")
+    assert int(removed_id) not in set(results["ID1"]) | set(results["ID2"]) | set(results["ID3"])
+    assert len(os.listdir(str(tmp_path / "cache"))) == 1
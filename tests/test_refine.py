@@ -0,0 +1,67 @@
+import pytest
+
+import mintmark_core
+
+INF = float('inf')
+BASE_TARGETS = {0: (40, INF), 5: (60, 330)}
+
+
+def fresh_results(paths, query):
+    results, _ = mintmark_core.run_query(mintmark_core.load_catalog_mintmark_table(paths), paths=paths, **query)
+    return results
+
+
+# 先执行较宽的查询，再执行收紧后的查询；返回第二次查询的结果和统计信息
+def run_twice(paths, first_targets, second_targets, keep_dominated):
+    session = mintmark_core.QuerySession(paths=paths)
+    first = dict(attribute_targets=first_targets, keep_dominated=keep_dominated, use_only1=True)
+    second = dict(first, attribute_targets=second_targets)
+    session.run(first)
+    results, stats = session.run(second)
+    return results, stats, fresh_results(paths, second)
+
+
+@pytest.mark.parametrize("keep_dominated", [True, False])
+@pytest.mark.parametrize("second_targets", [
+    {0: (70, INF), 5: (60, 330)},
+    {0: (60, INF), 5: (90, 300)},
+])
+def test_tightened_bounds_match_fresh_query(data_paths, keep_dominated, second_targets):
+    results, stats, expected = run_twice(data_paths, BASE_TARGETS, second_targets, keep_dominated)
+    assert stats.get("refined")
+    assert len(expected) > 0
+    assert results.tolist() == expected.tolist()
+
+
+# 新增属性要求（包括“置0”）改变了被压制刻印的判断方向，只在保留被压制刻印时能在结果中筛选
+@pytest.mark.parametrize("second_targets", [
+    {**BASE_TARGETS, 4: (20, INF)},
+    {**BASE_TARGETS, 3: (0, 0)},
+    {**BASE_TARGETS, 1: (0, 0), 2: (-INF, 100)},
+])
+def test_new_requirements_match_fresh_query(data_paths, second_targets):
+    results, stats, expected = run_twice(data_paths, BASE_TARGETS, second_targets, True)
+    assert stats.get("refined")
+    assert results.tolist() == expected.tolist()
+
+    results, stats, expected = run_twice(data_paths, BASE_TARGETS, second_targets, False)
+    assert not stats.get("refined")
+    assert results.tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("second_targets", [
+    {0: (20, INF), 5: (60, 330)},
+    {0: (40, INF), 5: (60, 400)},
+    {0: (40, INF)},
+])
+def test_loosened_bounds_run_full_search(data_paths, second_targets):
+    results, stats, expected = run_twice(data_paths, BASE_TARGETS, second_targets, True)
+    assert not stats.get("refined")
+    assert results.tolist() == expected.tolist()
+
+
+def test_infeasible_refinement_reports_feasibility(data_paths):
+    results, stats, expected = run_twice(data_paths, BASE_TARGETS, {0: (900, INF), 5: (60, 330)}, True)
+    assert stats.get("refined")
+    assert len(results) == len(expected) == 0
+    assert stats["feasible"] is False
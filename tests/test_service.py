@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import mintmark_core
+
+QUERY = {"attribute_targets": {"攻击": [60, None]}, "total_sum": [], "filter_low_values": False,
+         "only1": False, "keep_dominated": True}
+
+
+@pytest.fixture
+def server(data_paths):
+    server = mintmark_core.QueryHTTPServer(("127.0.0.1", 0), mintmark_core.QueryEngine(paths=data_paths),
+                                           threads=1, queue_size=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+# 发送 POST 请求，返回 (状态码, JSON 响应)
+def post(server, path, payload):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}{path}", data=body,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_query_returns_all_rows(server, data_paths):
+    status, payload = post(server, "/query", dict(QUERY, limit=10000))
+    name, query = mintmark_core.parse_batch_query(QUERY)
+    expected, _ = mintmark_core.run_query(mintmark_core.load_catalog_mintmark_table(data_paths), paths=data_paths,
+                                          **query)
+    assert status == 200
+    assert payload["total"] == len(expected) > 10
+    assert payload["rows"] == [list(row) for row in mintmark_core.iter_result_rows(expected)]
+    assert payload["next_offset"] is None
+
+
+def test_pagination_covers_results_once(server):
+    _, full = post(server, "/query", dict(QUERY, limit=10000))
+    rows, offset = [], 0
+    while offset is not None:
+        status, page = post(server, "/query", dict(QUERY, offset=offset, limit=7))
+        assert status == 200 and len(page["rows"]) <= 7
+        rows.extend(page["rows"])
+        offset = page["next_offset"]
+    assert rows == full["rows"]
+
+
+def test_count_matches_query(server):
+    _, full = post(server, "/query", QUERY)
+    status, count = post(server, "/count", QUERY)
+    assert status == 200
+    assert count["exact"] and count["count"] == full["total"]
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({"quality": 5}, "quality_filter"),
+    ({"attribute_targets": {"攻击": "高"}}, "攻击"),
+    ({"attribute_targets": {"攻击": ["x", None]}}, "攻击 的最小值"),
+    ({"top_k": "十"}, "top_k"),
+    (dict(QUERY, limit="all"), "limit"),
+    (b"[1, 2]", "JSON"),
+    (b"{not json", ""),
+])
+def test_bad_input_returns_400(server, payload, message):
+    status, response = post(server, "/query", payload)
+    assert status == 400
+    assert message in response["error"]
+    assert "object is not" not in response["error"]
+
+
+def test_saturated_server_returns_503(server, monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+    run = server.engine.run
+
+    def blocking_run(query):
+        entered.set()
+        release.wait(10)
+        return run(query)
+
+    monkeypatch.setattr(server.engine, "run", blocking_run)
+    # 第一个请求占用唯一的线程，第二个请求占用唯一的排队位置
+    accepted = []
+    clients = [threading.Thread(target=lambda: accepted.append(post(server, "/query", QUERY))) for _ in range(2)]
+    clients[0].start()
+    try:
+        assert entered.wait(10)
+        clients[1].start()
+        time.sleep(0.5)
+        # 被拒绝的请求带有较大的请求体，服务端必须读完再回复，客户端才不会收到 Broken pipe
+        for _ in range(4):
+            status, response = post(server, "/query", dict(QUERY, padding="x" * 200000))
+            assert status == 503
+            assert "繁忙" in response["error"]
+    finally:
+        release.set()
+        for client in clients:
+            if client.ident is not None:
+                client.join()
+    assert [status for status, _ in accepted] == [200, 200]
+    assert post(server, "/query", QUERY)[0] == 200
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import mintmark_core
+
+ATTRIBUTE_TARGETS = {0: (40, float('inf')), 4: (30, float('inf')), 5: (float('-inf'), 260)}
+
+
+# 完整搜索的结果按得分从大到小稳定排序后取前 top_k 个
+def expected_top(results, top_k, weights):
+    if weights:
+        scores = sum(results[mintmark_core.ATTRIBUTES[attr_index]] * weight for attr_index, weight in weights.items())
+    else:
+        scores = results["选项总和"]
+    return results[np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable')[:top_k]]
+
+
+@pytest.mark.parametrize("symmetric", [False, True])
+@pytest.mark.parametrize("weights", [None, {4: 2, 5: 0.5, 0: 1}])
+@pytest.mark.parametrize("top_k", [1, 20])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_top_k_equals_sorted_full_search(mintmark_rows, with_only1_ids, tmp_path, symmetric, weights, top_k, seed):
+    rows = mintmark_rows(60, seed=seed, classes=4)
+    # 一部分刻印同名，覆盖三枚同名的规则
+    for row in rows[::7]:
+        row["description"] = "同名刻印"
+    paths = with_only1_ids(mintmark_core.DataPaths(str(tmp_path)), [row["id"] for row in rows[::5]])
+    table = mintmark_core.build_mintmark_table(rows)
+    query = dict(attribute_targets=ATTRIBUTE_TARGETS, symmetric=symmetric, use_only1=True, keep_dominated=True,
+                 paths=paths)
+
+    full, _ = mintmark_core.run_query(table, **query)
+    top, _ = mintmark_core.run_query(table, top_k=top_k, weights=weights, **query)
+
+    assert len(full) > top_k
+    expected = expected_top(full, top_k, weights)
+    for column in ("ID1", "ID2", "ID3", "选项总和"):
+        assert top[column].tolist() == expected[column].tolist()
+